@@ -1,50 +1,807 @@
 import sys
 import os
 import logging
+import threading
 import traceback
-from datetime import datetime
+from collections import OrderedDict
 import numpy as np
 import pydicom
-import uuid
-import random
-from datetime import datetime, timedelta
+import time
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QFileDialog, QTableWidget, QTableWidgetItem, QTabWidget, QListWidget,
+    QFileDialog, QTabWidget,
     QScrollArea, QWidget, QLineEdit, QHeaderView, QMessageBox, QGridLayout,
-    QTextEdit, QProgressBar, QSlider
+    QTextEdit, QProgressBar, QSlider, QListView, QSpinBox, QInputDialog, QTreeView
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal,QTimer
-from PyQt6.QtGui import QImage, QPixmap ,QIcon
+from PyQt6.QtCore import Qt, QThread, pyqtSignal,QTimer, QRectF, QAbstractListModel, QAbstractItemModel, QModelIndex, QSize, QSortFilterProxyModel
+from PyQt6.QtGui import QImage, QPixmap ,QIcon, QPainter, QColor
+from PyQt6 import sip
+
+import dicom_index
+import volume
+import dataset_cache
+import rendering
+import thumbnails
+import mpr
+import cine
+import anonymize
+import metadata
+import metadata_export
+import search_index
+import frames
+import perf
+import memory
 
 # Logging Configuration
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Number of files before and after the current one to load in the background
+PREFETCH_NEIGHBOURS = 4
+
+# Images with a side longer than this open fitted to the window instead of at 1:1
+LARGE_IMAGE_SIZE = 8192
+
+# Number of frames the cine renderer may prepare ahead of playback
+CINE_BUFFER_FRAMES = 16
+
 class DICOMWorker(QThread):
-    """Thread for loading DICOM files asynchronously."""
+    """Thread for indexing DICOM files asynchronously (headers only)."""
+    files_found = pyqtSignal(int)
+    records_loaded = pyqtSignal(list)
     files_loaded = pyqtSignal(list)
 
-    def __init__(self, directory):
+    def __init__(self, directory, catalog=None, max_workers=dicom_index.DEFAULT_WORKERS):
         super().__init__()
         self.directory = directory
+        self.catalog = catalog
+        self.max_workers = max_workers
+
+    def run(self):
+        if self.catalog is not None:
+            batches = self.catalog.scan(self.directory, max_workers=self.max_workers,
+                                        should_stop=self.isInterruptionRequested,
+                                        on_found=self.files_found.emit)
+        else:
+            dicom_files = dicom_index.find_dicom_files(self.directory)
+            self.files_found.emit(len(dicom_files))
+            batches = dicom_index.scan_headers(dicom_files, max_workers=self.max_workers,
+                                               should_stop=self.isInterruptionRequested)
+        loaded_files = []
+        for batch in batches:
+            loaded_files.extend(record['path'] for record in batch)
+            self.records_loaded.emit(batch)
+        self.files_loaded.emit(loaded_files)
+
+class AnonymizationWorker(QThread):
+    """Thread that runs a batch anonymization in a process pool and reports each file."""
+    file_done = pyqtSignal(dict)
+
+    def __init__(self, file_paths, output_dir, prefix, max_workers=anonymize.DEFAULT_WORKERS, root=None):
+        super().__init__()
+        self.file_paths = file_paths
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.max_workers = max_workers
+        self.root = root
+
+    def run(self):
+        results = anonymize.anonymize_files(self.file_paths, self.output_dir, self.prefix,
+                                            max_workers=self.max_workers,
+                                            should_stop=self.isInterruptionRequested, root=self.root)
+        for result in results:
+            self.file_done.emit(result)
+
+class MetadataExportWorker(QThread):
+    """Thread that exports the metadata of many files and reports progress."""
+    progress = pyqtSignal(int)
+    export_failed = pyqtSignal(str)
+
+    def __init__(self, file_paths, output_path, tags=None):
+        super().__init__()
+        self.file_paths = file_paths
+        self.output_path = output_path
+        self.tags = tags
+
+    def run(self):
+        try:
+            metadata_export.export_metadata(self.file_paths, self.output_path, tags=self.tags,
+                                            should_stop=self.isInterruptionRequested,
+                                            on_progress=self.progress.emit)
+        except Exception as e:
+            logging.error(f"Metadata export failed: {e}")
+            self.export_failed.emit(str(e))
+
+class GroupQueryWorker(QThread):
+    """Thread that reads one group from every loaded file."""
+    query_done = pyqtSignal(object, list)
+
+    def __init__(self, file_paths, group):
+        super().__init__()
+        self.file_paths = file_paths
+        self.group = group
+
+    def run(self):
+        results = []
+        for result in metadata.group_elements_across_files(self.file_paths, self.group):
+            results.append(result)
+            if self.isInterruptionRequested():
+                break
+        self.query_done.emit(self.group, results)
+
+class VolumeWorker(QThread):
+    """Thread for stacking a series of single-slice files into a cached volume."""
+    volume_ready = pyqtSignal(str, object)
+    volume_failed = pyqtSignal(str, str)
+
+    def __init__(self, series_uid, records, cache):
+        super().__init__()
+        self.series_uid = series_uid
+        self.records = records
+        self.cache = cache
 
     def run(self):
-        dicom_files = [
-            os.path.join(root, file)
-            for root, _, files in os.walk(self.directory)
-            for file in files if file.lower().endswith('.dcm')
-        ]
-        self.files_loaded.emit(dicom_files)
+        try:
+            series_volume = self.cache.get_or_build(self.records, should_stop=self.isInterruptionRequested)
+        except InterruptedError:
+            return
+        except Exception as e:
+            logging.error(f"Failed to build volume for series {self.series_uid}: {e}")
+            self.volume_failed.emit(self.series_uid, str(e))
+            return
+        self.volume_ready.emit(self.series_uid, series_volume)
+
+class FileLoader(QThread):
+    """
+    Thread that loads the most recently requested file; older requests still waiting are dropped.
+
+    Each request carries a generation number that is sent back with its
+    results. The header is emitted first, so metadata can be shown while the
+    pixel data is still being read.
+    """
+    header_loaded = pyqtSignal(int, object)
+    dataset_loaded = pyqtSignal(int, object)
+    load_failed = pyqtSignal(int, str)
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+        self._pending = None
+        self._generation = 0
+        self._stopped = False
+        self._condition = threading.Condition()
+
+    def request(self, generation, file_path):
+        """Load file_path next, replacing any request that has not started yet."""
+        with self._condition:
+            self._pending = (generation, file_path)
+            self._generation = generation
+            self._condition.notify()
+
+    def is_current(self, generation):
+        with self._condition:
+            return generation == self._generation and not self._stopped
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation, file_path = self._pending
+                self._pending = None
+
+            try:
+                if file_path not in self.cache:
+                    with perf.span('dcmread_header', path=file_path):
+                        header = pydicom.dcmread(file_path, stop_before_pixels=True)
+                    if not self.is_current(generation):
+                        continue  # Superseded while reading; skip the pixel data
+                    self.header_loaded.emit(generation, header)
+                dicom_data = self.cache.get(file_path)
+                if self.is_current(generation):
+                    self.dataset_loaded.emit(generation, dicom_data)
+            except Exception as e:
+                logging.error(f"Failed to load {file_path}: {e}")
+                if self.is_current(generation):
+                    self.load_failed.emit(generation, str(e))
+
+class DisplayVolumeWorker(QThread):
+    """Thread for windowing a volume into a contiguous uint8 display volume."""
+    volume_ready = pyqtSignal(int, object)
+
+    def __init__(self, generation, image_data, dicom_data, window=None):
+        super().__init__()
+        self.generation = generation
+        self.image_data = image_data
+        self.dicom_data = dicom_data
+        self.window = window
+
+    def run(self):
+        try:
+            low, high = self.window or volume.display_window(self.image_data, self.dicom_data)
+            with memory.accountant.reserve(int(np.prod(self.image_data.shape)), 'display volume') as reservation:
+                # Past the memory limit the display volume is written to a scratch file instead of RAM
+                out = None if reservation else memory.scratch_array(self.image_data.shape, np.uint8)
+                with perf.span('display_volume'):
+                    display_data = volume.build_display_volume(self.image_data, low, high,
+                                                               should_stop=self.isInterruptionRequested, out=out)
+                reservation.track('display volume', display_data)
+        except InterruptedError:
+            return
+        except Exception as e:
+            logging.error(f"Failed to build display volume: {e}")
+            return
+        self.volume_ready.emit(self.generation, display_data)
+
+class MPRWorker(QThread):
+    """Thread for building cached reformats of the current volume."""
+    reformat_ready = pyqtSignal(object, str)
+
+    def __init__(self, engine, orientations):
+        super().__init__()
+        self.engine = engine
+        self.orientations = orientations
+
+    def run(self):
+        for orientation in self.orientations:
+            try:
+                self.engine.reformat(orientation, should_stop=self.isInterruptionRequested)
+            except InterruptedError:
+                return
+            except Exception as e:
+                logging.error(f"Failed to build {orientation} reformat: {e}")
+                continue
+            self.reformat_ready.emit(self.engine, orientation)
+
+class PyramidWorker(QThread):
+    """Thread for building the pyramid levels of a large image down to a given level."""
+    level_ready = pyqtSignal(object)
+
+    def __init__(self, pyramid, level):
+        super().__init__()
+        self.pyramid = pyramid
+        self.level = level
+
+    def run(self):
+        for level in range(self.pyramid.built_level() + 1, self.level + 1):
+            if self.isInterruptionRequested():
+                return
+            try:
+                self.pyramid.level(level)
+            except Exception as e:
+                logging.error(f"Failed to build pyramid level {level}: {e}")
+                return
+        self.level_ready.emit(self.pyramid)
+
+def array_to_qimage(array):
+    """
+    Wrap a uint8 array (H x W grayscale or H x W x 3 RGB) in a QImage without copying.
+
+    Lifetime rule: the QImage reads the array's memory directly, so the array is
+    attached to it as ``qimage.array`` and must not be modified while the QImage
+    is in use. QPixmap.fromImage takes its own copy, after which both can go.
+    Row-strided views (e.g. a crop of a larger image) are wrapped as-is.
+    """
+    if array.ndim == 2:
+        image_format = QImage.Format.Format_Grayscale8
+    elif array.ndim == 3 and array.shape[2] == 3:
+        image_format = QImage.Format.Format_RGB888
+    else:
+        raise ValueError(f"Unsupported image shape for display: {array.shape}")
+    # Rows may be strided, but pixels within a row must be packed
+    pixel_stride = 3 if array.ndim == 3 else 1
+    if array.dtype != np.uint8 or array.strides[0] <= 0 or array.strides[1] != pixel_stride \
+            or array.strides[-1] != 1:
+        array = np.ascontiguousarray(array, dtype=np.uint8)
+    height, width = array.shape[:2]
+    qimage = QImage(sip.voidptr(array.ctypes.data), width, height, array.strides[0], image_format)
+    qimage.array = array
+    return qimage
+
+class CineRenderThread(QThread):
+    """
+    Thread that renders upcoming cine frames into a FrameRingBuffer.
+
+    Frames are converted and scaled to the display size here as QImages;
+    only the cheap QImage -> QPixmap upload is left for the GUI thread
+    (QPixmap itself may only be used on the GUI thread).
+    """
+
+    def __init__(self, frames, ring, display_size):
+        super().__init__()
+        self.frames = frames
+        self.ring = ring
+        self.display_size = display_size
+
+    def run(self):
+        frame_count = self.frames.shape[0]
+        while not self.isInterruptionRequested() and not self.ring.closed:
+            counter = self.ring.next_counter()
+            with perf.span('cine_frame', frame=counter % frame_count):
+                frame = self.frames[counter % frame_count]
+            if frame.dtype != np.uint8:
+                frame = DICOMMetadataViewer.normalize_image(frame)
+            with perf.span('qimage'):
+                qimage = array_to_qimage(frame)
+            if qimage.size() != self.display_size:
+                with perf.span('scale'):
+                    qimage = qimage.scaled(self.display_size, Qt.AspectRatioMode.KeepAspectRatio,
+                                           Qt.TransformationMode.SmoothTransformation)
+            self.ring.put(counter, qimage)
+
+class ImageView(QWidget):
+    """
+    Zoomed image surface that only renders and scales the part being painted.
+
+    The widget is as large as the zoomed image, but paintEvent renders just the
+    source region under the exposed rectangle, taken from the pyramid level that
+    matches the zoom. Repaint cost follows the viewport size, not the image size
+    or the zoom factor. Missing levels are built in a PyramidWorker; until then
+    the next finer built level is drawn, or a placeholder if that is finer still.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.renderer = None
+        self.contrast = 1.0
+        self.brightness = 0
+        self.zoom = 1.0
+        self.pyramid_worker = None
+        self.retired_workers = []  # Interrupted workers, kept referenced until their current level is done
+
+    def set_image(self, renderer, contrast, brightness, zoom):
+        """
+        :param renderer: rendering.LutRenderer of the image to show.
+        """
+        self.renderer = renderer
+        self.contrast, self.brightness = contrast, brightness
+        self.zoom = zoom
+        self.resize(max(1, int(renderer.width * zoom)), max(1, int(renderer.height * zoom)))
+        self.update()
+
+    def build_pyramid_level(self, pyramid, level):
+        """Build pyramid levels down to level in the background, then repaint."""
+        worker = self.pyramid_worker
+        if worker is not None and worker.isRunning():
+            if worker.pyramid is pyramid and worker.level >= level:
+                return
+            worker.requestInterruption()
+            self.retired_workers.append(worker)
+            worker.finished.connect(lambda worker=worker: self.retired_workers.remove(worker))
+        self.pyramid_worker = PyramidWorker(pyramid, level)
+        self.pyramid_worker.level_ready.connect(self.on_pyramid_level_ready)
+        self.pyramid_worker.start()
+
+    def stop_pyramid_workers(self):
+        for worker in [self.pyramid_worker] + self.retired_workers:
+            if worker is not None:
+                worker.requestInterruption()
+                worker.wait()
+
+    def on_pyramid_level_ready(self, pyramid):
+        if self.renderer is not None and pyramid is self.renderer.pyramid:
+            self.update()
+
+    def paintEvent(self, event):
+        if self.renderer is None:
+            return
+        pyramid = self.renderer.pyramid
+        wanted = pyramid.level_for_zoom(self.zoom)
+        level = min(wanted, pyramid.built_level())
+        if level < wanted:
+            self.build_pyramid_level(pyramid, wanted)
+            if level < wanted - 1:
+                # Rendering from a level this fine would stall the GUI; wait for the worker
+                painter = QPainter(self)
+                painter.fillRect(event.rect(), QColor(40, 40, 40))
+                painter.end()
+                return
+        row_scale, col_scale = self.renderer.pyramid.level_scale(level)
+        level_height, level_width = self.renderer.pyramid.level(level).shape
+        zoom_x, zoom_y = self.zoom / col_scale, self.zoom / row_scale
+
+        exposed = event.rect()
+        x0 = max(0, int(exposed.left() / zoom_x) - 1)
+        y0 = max(0, int(exposed.top() / zoom_y) - 1)
+        x1 = min(level_width, int((exposed.right() + 1) / zoom_x) + 2)
+        y1 = min(level_height, int((exposed.bottom() + 1) / zoom_y) + 2)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        with perf.span('lut', level=level):
+            region = self.renderer.render(self.contrast, self.brightness, (slice(y0, y1), slice(x0, x1)), level)
+        with perf.span('qimage'):
+            qimage = array_to_qimage(region)
+        target = QRectF(x0 * zoom_x, y0 * zoom_y, (x1 - x0) * zoom_x, (y1 - y0) * zoom_y)
+
+        with perf.span('draw', zoom=self.zoom):
+            painter = QPainter(self)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, zoom_x != 1.0 or zoom_y != 1.0)
+            painter.drawImage(target, qimage)
+            painter.end()
+        perf.frame_done()
+
+class ImageCanvas(QWidget):
+    """Persistent image viewport: the image is swapped in place and the scroll position kept."""
+    zoom_in_requested = pyqtSignal()
+    zoom_out_requested = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.scroll_area = QScrollArea()
+        self.scroll_area.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.image_view = ImageView()
+        self.scroll_area.setWidget(self.image_view)
+
+        zoom_in_button = QPushButton("Zoom In")
+        zoom_in_button.clicked.connect(self.zoom_in_requested)
+        zoom_out_button = QPushButton("Zoom Out")
+        zoom_out_button.clicked.connect(self.zoom_out_requested)
+
+        zoom_button_layout = QHBoxLayout()
+        zoom_button_layout.addWidget(zoom_in_button)
+        zoom_button_layout.addWidget(zoom_out_button)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.scroll_area)
+        layout.addLayout(zoom_button_layout)
+
+    def set_image(self, renderer, contrast, brightness, zoom, zoom_ratio=1.0):
+        """
+        Show an image, keeping the scroll position.
+
+        :param zoom_ratio: Scale change since the previous image; the point at the
+            viewport centre stays put so zooming does not jump back to the corner.
+        """
+        h_bar = self.scroll_area.horizontalScrollBar()
+        v_bar = self.scroll_area.verticalScrollBar()
+        viewport = self.scroll_area.viewport().size()
+        center_x = (h_bar.value() + viewport.width() / 2) * zoom_ratio
+        center_y = (v_bar.value() + viewport.height() / 2) * zoom_ratio
+
+        self.image_view.set_image(renderer, contrast, brightness, zoom)
+
+        if zoom_ratio != 1.0:
+            h_bar.setValue(int(center_x - viewport.width() / 2))
+            v_bar.setValue(int(center_y - viewport.height() / 2))
+
+class PerfOverlay(QLabel):
+    """Translucent label over the image area showing fps and the latest time of each traced stage."""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: #7CFC00; "
+                           "font-family: monospace; padding: 4px;")
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def start(self):
+        self.refresh()
+        self.show()
+        self.refresh_timer.start(250)
+
+    def stop(self):
+        self.refresh_timer.stop()
+        self.hide()
+
+    def refresh(self):
+        lines = [f"{perf.tracer.fps():.1f} fps"]
+        for name, (last, mean) in sorted(perf.tracer.summary().items()):
+            lines.append(f"{name:<16}{last:8.2f} ms  avg {mean:8.2f} ms")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.move(8, 8)
+        self.raise_()
+
+class MetadataNode:
+    """
+    One row of the metadata tree: a dataset element, or an item of a sequence.
+
+    Children are listed the first time they are asked for and value text is
+    formatted the first time it is displayed.
+    """
+
+    def __init__(self, parent, row, dataset=None, tag=None, label=None):
+        self.parent = parent
+        self.row = row
+        self.dataset = dataset  # Dataset owning tag, or the item dataset for sequence items
+        self.tag = tag
+        self.label = label
+        self.text = None
+        self._children = None
+
+    @property
+    def element(self):
+        return self.dataset[self.tag] if self.tag is not None else None
+
+    def has_children(self):
+        if self.tag is None:
+            return len(self.dataset) > 0
+        element = self.element
+        return element.VR == 'SQ' and bool(element.value)
+
+    def children(self):
+        if self._children is None:
+            if self.tag is None:
+                self._children = [MetadataNode(self, row, self.dataset, tag)
+                                  for row, tag in enumerate(self.dataset.keys())]
+            elif self.has_children():
+                self._children = [MetadataNode(self, row, item, label=f"Item {row + 1}")
+                                  for row, item in enumerate(self.element.value)]
+            else:
+                self._children = []
+        return self._children
+
+    def display(self, column):
+        if self.tag is None:
+            return self.label if column == 0 else f"{len(self.dataset)} elements"
+        element = self.element
+        if column == 0:
+            return metadata.element_label(element)
+        if self.text is None:
+            self.text = metadata.format_value(element)
+        return self.text
+
+    def tooltip(self, column):
+        if self.tag is None:
+            return None
+        element = self.element
+        if column == 0:
+            return f"({element.tag.group:04X},{element.tag.element:04X}) {element.name} [{element.VR}]"
+        return metadata.format_value(element, max_length=4096)
+
+    def matches(self, term):
+        """Whether the tag or value text contains term; binary and deferred values are not read for this."""
+        if term in metadata.tag_label(self.tag).lower():
+            return True
+        return not metadata.has_unread_value(self.dataset, self.tag) and term in self.display(1).lower()
+
+class MetadataModel(QAbstractItemModel):
+    """
+    Tree model over a dataset's elements; sequences expand into their items.
+
+    Only rows the view asks for are created and formatted, so showing a file
+    costs time proportional to the visible rows rather than the dataset size.
+    """
+    HEADERS = ["Tag", "Value"]
+
+    def __init__(self):
+        super().__init__()
+        self.root = None
+
+    def set_dataset(self, dicom_data):
+        self.beginResetModel()
+        self.root = MetadataNode(None, 0, dicom_data) if dicom_data is not None else None
+        self.endResetModel()
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None or not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children()[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() and parent.column() != 0:
+            return 0
+        node = self.node(parent)
+        return len(node.children()) if node is not None else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None or (parent.isValid() and parent.column() != 0):
+            return False
+        return node.has_children()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return node.display(index.column())
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return node.tooltip(index.column())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+class ThumbnailModel(QAbstractListModel):
+    """
+    List model of slice/frame thumbnails, generated on demand.
+
+    A thumbnail is only requested when the view asks for an item's decoration,
+    which QListView does for visible items only. Finished thumbnails are kept
+    as pixmaps in a bounded in-memory LRU on top of the persistent disk cache.
+    """
+    thumbnail_ready = pyqtSignal(int, int, object)
+    MAX_PIXMAPS = 2000
+
+    def __init__(self):
+        super().__init__()
+        self.items = []  # dicts with label, path, frame, variant and loader
+        self.pixmaps = OrderedDict()
+        self.placeholder = QPixmap(thumbnails.THUMBNAIL_SIZE, thumbnails.THUMBNAIL_SIZE)
+        self.placeholder.fill(QColor(40, 40, 40))
+        self.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.pool = thumbnails.ThumbnailPool(self.thumbnail_ready.emit)
+
+    def set_items(self, items):
+        self.beginResetModel()
+        self.pool.clear()
+        self.items = items
+        self.pixmaps.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self.items[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return item['label']
+        if role == Qt.ItemDataRole.DecorationRole:
+            pixmap = self.pixmaps.get(index.row())
+            if pixmap is not None:
+                self.pixmaps.move_to_end(index.row())
+                return pixmap
+            self.pool.request(index.row(), item['path'], item['frame'], item['variant'], item['loader'])
+            return self.placeholder
+        return None
+
+    def on_thumbnail_ready(self, row, generation, thumbnail):
+        if generation != self.pool.generation or row >= len(self.items):
+            return  # Belongs to a previous set of items
+        self.pixmaps[row] = QPixmap.fromImage(array_to_qimage(thumbnail))
+        while len(self.pixmaps) > self.MAX_PIXMAPS:
+            self.pixmaps.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+class FileListModel(QAbstractListModel):
+    """List model of the indexed files: file names, with a header summary as the tooltip."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def clear(self):
+        self.beginResetModel()
+        self.records = []
+        self.endResetModel()
+
+    def add_records(self, records):
+        if not records:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.records), len(self.records) + len(records) - 1)
+        self.records.extend(records)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.records[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(record['path'])
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return DICOMMetadataViewer.describe_record(record)
+        return None
+
+class FileFilterProxy(QSortFilterProxyModel):
+    """
+    Shows only the files whose paths are in a set of search matches (None shows all).
+
+    The view updates once per search instead of once per hidden or shown row.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.matches = None
+
+    def set_matches(self, matches):
+        if matches == self.matches:
+            return
+        self.matches = matches
+        self.invalidateRowsFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.matches is None or self.sourceModel().records[source_row]['path'] in self.matches
+
+class ThumbnailStrip(QListView):
+    """Horizontal, virtualized strip of thumbnails over every slice or frame."""
+    item_selected = pyqtSignal(int)
+
+    def __init__(self):
+        super().__init__()
+        self.thumbnail_model = ThumbnailModel()
+        self.setModel(self.thumbnail_model)
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setFlow(QListView.Flow.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QListView.Movement.Static)
+        self.setUniformItemSizes(True)
+        self.setIconSize(QSize(thumbnails.THUMBNAIL_SIZE, thumbnails.THUMBNAIL_SIZE))
+        self.setFixedHeight(thumbnails.THUMBNAIL_SIZE + 50)
+        self.clicked.connect(lambda index: self.item_selected.emit(index.row()))
+
+    def set_items(self, items):
+        self.thumbnail_model.set_items(items)
+        self.scrollToTop()
 
 class DICOMMetadataViewer(QMainWindow):
     def __init__(self):
         super().__init__()
         self.dicom_files = []
+        self.dicom_directory = None  # The directory the files were loaded from
+        self.dicom_records = []
+        self.series_index = {}  # SeriesInstanceUID -> header records
+        self.search_index = search_index.SearchIndex()
+        self.group_index = None
+        self.group_query_worker = None
         self.current_file_index = 0
         self.current_dicom_data = None
         self.current_image_data = None  # Ensure this attribute exists
-
+        try:
+            self.catalog = dicom_index.DicomCatalog()
+        except Exception as e:
+            logging.warning(f"Catalog unavailable, directories will be fully rescanned: {e}")
+            self.catalog = None
+        self.volume_cache = volume.VolumeCache()
+        self.volume_worker = None
+        self.current_series_uid = None
+        self.series_volume = None
+        self.series_volume_records = []
+        self.original_image_data = None
+        self.current_view = 'axial'
+        self.display_volume_worker = None
+        self.display_volume_generation = 0
+        self.mpr_engine = None
+        self.mpr_worker = None
+        self.pending_view = None
+        self.dataset_cache = dataset_cache.DatasetCache()
+        self.prefetcher = dataset_cache.Prefetcher(self.dataset_cache)
+        self.load_generation = 0
+        self.file_loader = FileLoader(self.dataset_cache)
+        self.file_loader.header_loaded.connect(self.on_header_loaded)
+        self.file_loader.dataset_loaded.connect(self.on_dataset_loaded)
+        self.file_loader.load_failed.connect(self.on_load_failed)
+        self.file_loader.start()
+        memory.accountant.register_cache('dataset cache', lambda: self.dataset_cache.current_bytes,
+                                         self.dataset_cache.shrink, priority=0)
+        memory.accountant.register_cache('MPR reformats', self.mpr_reformats_nbytes,
+                                         self.drop_mpr_reformats, priority=1)
+        self.anonymization_worker = None
+        self.export_worker = None
 
         self.init_ui()
 
@@ -83,6 +840,17 @@ class DICOMMetadataViewer(QMainWindow):
         self.prefix_input.setPlaceholderText("Enter anonymization prefix")
         button_layout.addWidget(self.prefix_input)
 
+        button_layout.addWidget(QLabel("Workers:"))
+        self.anonymize_workers_input = QSpinBox()
+        self.anonymize_workers_input.setRange(1, max(64, anonymize.DEFAULT_WORKERS))
+        self.anonymize_workers_input.setValue(anonymize.DEFAULT_WORKERS)
+        button_layout.addWidget(self.anonymize_workers_input)
+
+        self.cancel_anonymize_btn = QPushButton("Cancel")
+        self.cancel_anonymize_btn.clicked.connect(self.cancel_anonymization)
+        self.cancel_anonymize_btn.setEnabled(False)
+        button_layout.addWidget(self.cancel_anonymize_btn)
+
         export_metadata_btn = QPushButton("Export Metadata")
         export_metadata_btn.clicked.connect(self.export_metadata)
         button_layout.addWidget(export_metadata_btn)
@@ -96,9 +864,28 @@ class DICOMMetadataViewer(QMainWindow):
 
         # Main content layout
         content_layout = QHBoxLayout()
-        self.file_list = QListWidget()
-        self.file_list.itemClicked.connect(self.on_file_selected)
-        content_layout.addWidget(self.file_list, 1)
+        file_layout = QVBoxLayout()
+        self.file_search_input = QLineEdit()
+        self.file_search_input.setPlaceholderText("Search files (e.g. mprage, ProtocolName:t1, AccessionNumber:123)")
+        self.file_search_input.setClearButtonEnabled(True)
+        self.file_search_input.textChanged.connect(lambda: self.file_search_timer.start())
+        file_layout.addWidget(self.file_search_input)
+
+        # Searches run once typing pauses briefly
+        self.file_search_timer = QTimer(self)
+        self.file_search_timer.setSingleShot(True)
+        self.file_search_timer.setInterval(150)
+        self.file_search_timer.timeout.connect(self.search_files)
+
+        self.file_model = FileListModel()
+        self.file_filter = FileFilterProxy()
+        self.file_filter.setSourceModel(self.file_model)
+        self.file_list = QListView()
+        self.file_list.setUniformItemSizes(True)
+        self.file_list.setModel(self.file_filter)
+        self.file_list.clicked.connect(self.on_file_selected)
+        file_layout.addWidget(self.file_list)
+        content_layout.addLayout(file_layout, 1)
 
         self.tab_widget = QTabWidget()
         content_layout.addWidget(self.tab_widget, 3)
@@ -108,10 +895,12 @@ class DICOMMetadataViewer(QMainWindow):
         metadata_tab = QWidget()
         metadata_layout = QVBoxLayout(metadata_tab)
 
-        self.metadata_table = QTableWidget(0, 2)
-        self.metadata_table.setHorizontalHeaderLabels(["Tag", "Value"])
-        self.metadata_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        metadata_layout.addWidget(self.metadata_table)
+        self.metadata_model = MetadataModel()
+        self.metadata_tree = QTreeView()
+        self.metadata_tree.setModel(self.metadata_model)
+        self.metadata_tree.setUniformRowHeights(True)
+        self.metadata_tree.header().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        metadata_layout.addWidget(self.metadata_tree)
 
         self.raw_metadata_text = QTextEdit()
         self.raw_metadata_text.setReadOnly(True)
@@ -144,19 +933,36 @@ class DICOMMetadataViewer(QMainWindow):
         self.image_scroll_area.setWidgetResizable(True)
         self.image_scroll_area.setWidget(grid_widget)
         self.image_layout.addWidget(self.image_scroll_area)
+        self.thumbnail_strip = ThumbnailStrip()
+        self.thumbnail_strip.item_selected.connect(self.show_slice)
+        self.thumbnail_strip.setVisible(False)
+        self.image_layout.addWidget(self.thumbnail_strip)
         self.tab_widget.addTab(self.image_tab, "Images")
+
+        # Single-image viewport, reused for every render
+        self.image_canvas = ImageCanvas()
+        self.image_canvas.zoom_in_requested.connect(self.zoom_in)
+        self.image_canvas.zoom_out_requested.connect(self.zoom_out)
+        self.current_zoom = 1.0
+        self.min_zoom = 0.2
+        self.pending_zoom_ratio = 1.0
+
+        # Slider and zoom input is coalesced to at most one render per display refresh
+        self.image_update_timer = QTimer(self)
+        self.image_update_timer.setSingleShot(True)
+        self.image_update_timer.timeout.connect(self.update_image_display)
         # Brightness and Contrast sliders
         brightness_label = QLabel("Brightness:")
         self.brightness_slider = QSlider(Qt.Orientation.Horizontal)
         self.brightness_slider.setRange(-100, 100)
         self.brightness_slider.setValue(0)
-        self.brightness_slider.valueChanged.connect(self.update_image_display)
+        self.brightness_slider.valueChanged.connect(self.request_image_update)
 
         contrast_label = QLabel("Contrast:")
         self.contrast_slider = QSlider(Qt.Orientation.Horizontal)
         self.contrast_slider.setRange(0, 200)
         self.contrast_slider.setValue(100)
-        self.contrast_slider.valueChanged.connect(self.update_image_display)
+        self.contrast_slider.valueChanged.connect(self.request_image_update)
 
         slider_layout = QVBoxLayout()
         slider_layout.addWidget(brightness_label)
@@ -175,7 +981,46 @@ class DICOMMetadataViewer(QMainWindow):
         self.stop_button.setEnabled(False)
         cine_button_layout.addWidget(self.stop_button)
 
+        cine_button_layout.addWidget(QLabel("FPS:"))
+        self.cine_fps_input = QSpinBox()
+        self.cine_fps_input.setRange(0, 240)
+        self.cine_fps_input.setSpecialValueText("Auto")  # 0 = acquired rate from FrameTime/CineRate
+        self.cine_fps_input.valueChanged.connect(self.on_cine_fps_changed)
+        cine_button_layout.addWidget(self.cine_fps_input)
+
+        self.cine_stats_label = QLabel()
+        cine_button_layout.addWidget(self.cine_stats_label)
+
+        # Stage timing: overlay on the image area and Chrome trace export
+        self.perf_button = QPushButton("Perf Overlay")
+        self.perf_button.setCheckable(True)
+        self.perf_button.toggled.connect(self.toggle_perf_overlay)
+        cine_button_layout.addWidget(self.perf_button)
+        export_trace_button = QPushButton("Export Trace")
+        export_trace_button.clicked.connect(self.export_trace)
+        cine_button_layout.addWidget(export_trace_button)
+        self.perf_overlay = PerfOverlay(self.image_scroll_area)
+        self.perf_button.setChecked(perf.tracer.enabled)  # DICOM_VIEWER_PERF=1 starts with it on
+
         self.image_layout.addLayout(cine_button_layout)
+
+        # Cine frames are shown on one persistent label
+        self.cine_label = QLabel()
+        self.cine_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        # Memory held by images and caches, against DICOM_VIEWER_MEMORY_LIMIT
+        self.memory_label = QLabel()
+        self.statusBar().addPermanentWidget(self.memory_label)
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.update_memory_usage)
+        self.memory_timer.start(1000)
+
+        self.cine_timer = QTimer(self)
+        self.cine_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.cine_timer.timeout.connect(self.cine_next_slice)
+        self.cine_render_thread = None
+        self.cine_ring = None
+        self.cine_frames = None  # The frames being played, which outlive a switch of current_image_data
+        self.cine_mode_active = False
         view_button_layout = QHBoxLayout()
         axial_button = QPushButton("Axial")
         axial_button.clicked.connect(lambda: self.switch_view('axial'))
@@ -189,6 +1034,21 @@ class DICOMMetadataViewer(QMainWindow):
         sagittal_button.clicked.connect(lambda: self.switch_view('sagittal'))
         view_button_layout.addWidget(sagittal_button)
 
+        oblique_button = QPushButton("Oblique")
+        oblique_button.clicked.connect(self.show_oblique)
+        view_button_layout.addWidget(oblique_button)
+
+        self.oblique_inputs = []
+        for label_text, value_range, suffix in (("Tilt X:", (-90, 90), "°"), ("Tilt Y:", (-90, 90), "°"),
+                                                ("Offset:", (-1000, 1000), " mm")):
+            view_button_layout.addWidget(QLabel(label_text))
+            spin_box = QSpinBox()
+            spin_box.setRange(*value_range)
+            spin_box.setSuffix(suffix)
+            spin_box.valueChanged.connect(self.on_oblique_changed)
+            view_button_layout.addWidget(spin_box)
+            self.oblique_inputs.append(spin_box)
+
         self.image_layout.addLayout(view_button_layout)
 
 
@@ -197,9 +1057,26 @@ class DICOMMetadataViewer(QMainWindow):
     def select_dicom_directory(self):
         dir_path = QFileDialog.getExistingDirectory(self, "Select DICOM Directory")
         if dir_path:
+            if hasattr(self, 'worker') and self.worker.isRunning():
+                self.worker.requestInterruption()
+                self.worker.wait()
+            self.dicom_files = []
+            self.dicom_directory = dir_path
+            self.dicom_records = []
+            self.series_index = {}
+            self.search_index = search_index.SearchIndex()
+            self.dataset_cache.clear()
+            self.load_generation += 1  # Drop loads from the previous directory
+            self.current_file_index = 0
+            self.file_model.clear()
+            self.file_filter.set_matches(None)
+            self.next_btn.setEnabled(False)
+            self.prev_btn.setEnabled(False)
             self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            self.worker = DICOMWorker(dir_path)
+            self.progress_bar.setRange(0, 0)  # Busy until the directory walk finishes
+            self.worker = DICOMWorker(dir_path, self.catalog)
+            self.worker.files_found.connect(self.on_files_found)
+            self.worker.records_loaded.connect(self.on_records_loaded)
             self.worker.files_loaded.connect(self.on_files_loaded)
             self.worker.start()
 
@@ -211,112 +1088,101 @@ class DICOMMetadataViewer(QMainWindow):
         brightness = self.brightness_slider.value()
         contrast = self.contrast_slider.value() / 100.0
 
-        # Create a copy of the original image
-        adjusted_image = self.original_image.astype(np.float32)
-
-        # Apply contrast
-        mean = np.mean(adjusted_image)
-        adjusted_image = mean + contrast * (adjusted_image - mean)
-
-        # Apply brightness
-        adjusted_image += brightness
-
-        # Clip values to valid range
-        adjusted_image = np.clip(adjusted_image, 0, 255).astype(np.uint8)
-
-        # Create QImage
-        height, width = adjusted_image.shape
-        qimage = QImage(adjusted_image.data, width, height, width, QImage.Format.Format_Grayscale8)
-
-        # Create label with the image
-        label = QLabel()
-        pixmap = QPixmap.fromImage(qimage)
-
-        # Ensure current_zoom exists
-        if not hasattr(self, 'current_zoom'):
-            self.current_zoom = 1.0
-
-        # Scale the image based on current zoom WITHOUT changing the container
-        scaled_pixmap = pixmap.scaled(
-            int(width * self.current_zoom),
-            int(height * self.current_zoom),
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
+        # Contrast (around the image mean) and brightness are applied through the lookup table,
+        # only for the region being painted
+        self.show_image_canvas()
+        self.image_canvas.set_image(
+            self.image_renderer, contrast, brightness, self.current_zoom, self.pending_zoom_ratio
         )
+        self.pending_zoom_ratio = 1.0
 
-        # Create a scroll area to enable zooming within the image
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-
-        # Create a label to hold the scaled image
-        zoom_label = QLabel()
-        zoom_label.setPixmap(scaled_pixmap)
-        zoom_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-        # Set the zoomed label in the scroll area
-        scroll_area.setWidget(zoom_label)
-
-        # Create zoom buttons
-        zoom_in_button = QPushButton("Zoom In")
-        zoom_in_button.clicked.connect(self.zoom_in)
-
-        zoom_out_button = QPushButton("Zoom Out")
-        zoom_out_button.clicked.connect(self.zoom_out)
-
-        # Layout for image and zoom buttons
-        layout = QVBoxLayout()
-        layout.addWidget(scroll_area)
-
-        zoom_button_layout = QHBoxLayout()
-        zoom_button_layout.addWidget(zoom_in_button)
-        zoom_button_layout.addWidget(zoom_out_button)
-
-        layout.addLayout(zoom_button_layout)
-
-        # Clear previous grid contents
-        for i in reversed(range(self.image_grid.count())):
-            widget = self.image_grid.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
+    def request_image_update(self):
+        """Schedule a render; requests arriving before the next display refresh are merged."""
+        if not self.image_update_timer.isActive():
+            refresh_rate = self.screen().refreshRate() if self.screen() else 60.0
+            self.image_update_timer.start(max(1, int(1000 / max(refresh_rate, 1.0))))
 
-        # Create a widget to hold the layout
-        widget = QWidget()
-        widget.setLayout(layout)
-
-        # Add to grid
-        self.image_grid.addWidget(widget, 0, 0)
+    def show_image_canvas(self):
+        """Make the persistent image canvas the only widget in the image grid."""
+        if self.image_grid.indexOf(self.image_canvas) >= 0:
+            return
+        self.clear_image_grid()
+        self.image_grid.addWidget(self.image_canvas, 0, 0)
 
     def zoom_in(self):
         """Zoom in on the image."""
-        if not hasattr(self, 'current_zoom'):
-            self.current_zoom = 1.0
-
         self.current_zoom *= 1.2  # Increase zoom by 20%
-        self.update_image_display()
+        self.pending_zoom_ratio *= 1.2
+        self.request_image_update()
 
     def zoom_out(self):
         """Zoom out on the image."""
-        if not hasattr(self, 'current_zoom'):
-            self.current_zoom = 1.0
-
-        self.current_zoom /= 1.2  # Decrease zoom by 20%
-
         # Prevent zooming out too far
-        self.current_zoom = max(0.2, self.current_zoom)
+        new_zoom = max(self.min_zoom, self.current_zoom / 1.2)  # Decrease zoom by 20%
+        self.pending_zoom_ratio *= new_zoom / self.current_zoom
+        self.current_zoom = new_zoom
+        self.request_image_update()
+
+    def on_files_found(self, total):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(0)
+
+    def on_records_loaded(self, records):
+        """Append a batch of indexed files to the file list as it arrives."""
+        if self.sender() is not self.worker:
+            return  # Batch from a scan that has since been replaced
+        first_batch = not self.dicom_files
+        for record in records:
+            self.dicom_records.append(record)
+            if record.get('SeriesInstanceUID'):
+                self.series_index.setdefault(record['SeriesInstanceUID'], []).append(record)
+            self.dicom_files.append(record['path'])
+        self.file_model.add_records(records)
+        self.search_index.add_records(records)
+        if self.file_search_input.text().strip():
+            self.file_search_timer.start()
+        self.progress_bar.setValue(len(self.dicom_files))
+        self.next_btn.setEnabled(len(self.dicom_files) > 1)
+        if first_batch and self.dicom_files:
+            self.display_dicom_file(self.dicom_files[0])
 
-        self.update_image_display()
+    def search_files(self):
+        """Show only the files whose indexed header values match the search box."""
+        query = self.file_search_input.text().strip()
+        if not query:
+            self.file_filter.set_matches(None)
+            self.statusBar().clearMessage()
+            return
+
+        start = time.perf_counter()
+        matches = set(self.search_index.search(query))
+        self.file_filter.set_matches(matches)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.statusBar().showMessage(f"{len(matches)} of {len(self.dicom_files)} files match ({elapsed_ms:.0f} ms)")
 
     def on_files_loaded(self, dicom_files):
+        if self.sender() is not self.worker:
+            return
         self.progress_bar.setVisible(False)
-        self.dicom_files = dicom_files
-        self.file_list.clear()
-        self.file_list.addItems([os.path.basename(f) for f in self.dicom_files])
-        if self.dicom_files:
-            self.display_dicom_file(self.dicom_files[0])
-            self.next_btn.setEnabled(len(self.dicom_files) > 1)
+        self.progress_bar.setRange(0, 100)
+        logging.info(f"Indexed {len(dicom_files)} DICOM files")
 
-    def on_file_selected(self, item):
-        index = self.file_list.row(item)
+    @staticmethod
+    def describe_record(record):
+        """Format an indexed header record as a short multi-line summary."""
+        if record.get('error'):
+            return f"Unreadable header: {record['error']}"
+        frames = record.get('NumberOfFrames') or 1
+        return "\n".join([
+            f"Patient: {record.get('PatientName')} ({record.get('PatientID')})",
+            f"Study: {record.get('StudyInstanceUID')}",
+            f"Series: {record.get('SeriesInstanceUID')}",
+            f"Instance: {record.get('InstanceNumber')}",
+            f"Size: {record.get('Columns')}x{record.get('Rows')}x{frames}",
+        ])
+
+    def on_file_selected(self, proxy_index):
+        index = self.file_filter.mapToSource(proxy_index).row()
         self.current_file_index = index
         self.display_dicom_file(self.dicom_files[index])
 
@@ -331,132 +1197,196 @@ class DICOMMetadataViewer(QMainWindow):
             self.display_dicom_file(self.dicom_files[self.current_file_index])
 
     def display_dicom_file(self, file_path):
+        """Load file_path in the background: its metadata is shown first, then its images."""
+        self.load_generation += 1
+        self.file_loader.request(self.load_generation, file_path)
+        self.statusBar().showMessage(f"Loading {os.path.basename(file_path)}...")
+        self.prefetch_neighbours()
+
+    def on_header_loaded(self, generation, header):
+        if generation != self.load_generation:
+            return  # A newer file was selected meanwhile
+        self.current_dicom_data = header
+        self.populate_metadata_table(header)
+
+    def on_dataset_loaded(self, generation, dicom_data):
+        if generation != self.load_generation:
+            return
+        self.statusBar().clearMessage()
         try:
-            dicom_data = pydicom.dcmread(file_path)
             self.current_dicom_data = dicom_data
             self.populate_metadata_table(dicom_data)
             self.visualize_dicom_images(dicom_data)
+            self.load_series_volume(dicom_data)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load file: {e}")
 
+    def on_load_failed(self, generation, error):
+        if generation != self.load_generation:
+            return
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Error", f"Failed to load file: {error}")
+
+    def mpr_reformats_nbytes(self):
+        return self.mpr_engine.reformats_nbytes() if self.mpr_engine is not None else 0
+
+    def drop_mpr_reformats(self, nbytes):
+        if self.mpr_engine is not None:
+            self.mpr_engine.drop_reformats()
+
+    def update_memory_usage(self):
+        """Re-account the images the viewer holds, enforce the memory limit and refresh the status bar."""
+        accountant = memory.accountant
+        accountant.track('series volume', self.series_volume)
+        accountant.track('3D volume', self.original_image_data)
+        accountant.track('current images', self.current_image_data)
+        renderer = getattr(self, 'image_renderer', None)
+        accountant.track('displayed image', getattr(self, 'original_image', None),
+                         *(renderer.pyramid.levels if renderer is not None else ()))
+        pixmap = self.cine_label.pixmap()
+        accountant.track_bytes('cine frame', 0 if pixmap is None or pixmap.isNull()
+                               else pixmap.width() * pixmap.height() * 4)
+        accountant.enforce()
+
+        report = accountant.report()
+        used = sum(nbytes for _, nbytes in report)
+        self.memory_label.setText(f"Memory: {memory.format_size(used)} / {memory.format_size(accountant.limit)}")
+        self.memory_label.setToolTip("\n".join(f"{name}: {memory.format_size(nbytes)}" for name, nbytes in report)
+                                     or "No images loaded")
+
+    def closeEvent(self, event):
+        self.stop_cine_mode()
+        self.file_loader.stop()
+        self.image_canvas.image_view.stop_pyramid_workers()
+        self.prefetcher.shutdown()
+        super().closeEvent(event)
+
+    def prefetch_neighbours(self):
+        """Warm the dataset cache with the files around the current one, nearest first."""
+        neighbours = []
+        for offset in range(1, PREFETCH_NEIGHBOURS + 1):
+            for index in (self.current_file_index + offset, self.current_file_index - offset):
+                if 0 <= index < len(self.dicom_files):
+                    neighbours.append(self.dicom_files[index])
+        self.prefetcher.schedule(neighbours)
+
+    def load_series_volume(self, dicom_data):
+        """Assemble the single-slice series of dicom_data into a volume in the background."""
+        if int(getattr(dicom_data, 'NumberOfFrames', 1) or 1) > 1:
+            return  # Multi-frame files already carry their own volume
+        series_uid = getattr(dicom_data, 'SeriesInstanceUID', None)
+        if series_uid is not None and series_uid == self.current_series_uid:
+            return  # Already built or building
+
+        if self.volume_worker is not None and self.volume_worker.isRunning():
+            self.volume_worker.requestInterruption()
+            self.volume_worker.wait()
+        self.current_series_uid = series_uid
+        self.series_volume = None
+        self.series_volume_records = []
+        self.original_image_data = None
+        self.mpr_engine = None
+        self.pending_view = None
+
+        records = volume.volume_records(self.series_index.get(series_uid, []))
+        if len(records) < 2:
+            return
+        records = volume.sort_series_records(records)
+        self.series_volume_records = records
+        self.statusBar().showMessage(f"Assembling series volume from {len(records)} slices...")
+        self.volume_worker = VolumeWorker(series_uid, records, self.volume_cache)
+        self.volume_worker.volume_ready.connect(self.on_series_volume_ready)
+        self.volume_worker.volume_failed.connect(
+            lambda uid, error: self.statusBar().showMessage(f"Series volume unavailable: {error}")
+        )
+        self.volume_worker.start()
+
+    def on_series_volume_ready(self, series_uid, series_volume):
+        if series_uid != self.current_series_uid:
+            return
+        self.series_volume = series_volume
+        self.build_display_volume(series_volume, self.current_dicom_data, self.on_series_display_volume_ready)
+
+    def on_series_display_volume_ready(self, display_data):
+        self.set_mpr_volume(display_data, volume.series_spacing(self.series_volume_records))
+        self.statusBar().showMessage(
+            f"Series volume ready ({display_data.shape[0]} slices): use Axial/Coronal/Sagittal to browse"
+        )
+
     def populate_metadata_table(self, dicom_data):
-        self.metadata_table.setRowCount(0)
-        for tag in dicom_data.dir():
-            value = getattr(dicom_data, tag, 'N/A')
-            row = self.metadata_table.rowCount()
-            self.metadata_table.insertRow(row)
-            self.metadata_table.setItem(row, 0, QTableWidgetItem(tag))
-            self.metadata_table.setItem(row, 1, QTableWidgetItem(str(value)))
+        self.metadata_model.set_dataset(dicom_data)
+        if self.search_input.text().strip():
+            self.search_metadata()
 
     # Additional methods (search, reset, anonymize, export, visualize, etc.) continue here...
     def search_metadata(self):
         search_term = self.search_input.text().lower().strip()
-        for row in range(self.metadata_table.rowCount()):
-            is_visible = False
-            for col in range(2):
-                item = self.metadata_table.item(row, col)
-                if item and search_term in item.text().lower():
-                    is_visible = True
-                    break
-            self.metadata_table.setRowHidden(row, not is_visible)
+        root = QModelIndex()
+        nodes = self.metadata_model.root.children() if self.metadata_model.root is not None else []
+        for row, node in enumerate(nodes):
+            self.metadata_tree.setRowHidden(row, root, not node.matches(search_term))
 
     def reset_metadata_search(self):
         self.search_input.clear()
-        for row in range(self.metadata_table.rowCount()):
-            self.metadata_table.setRowHidden(row, False)
+        for row in range(self.metadata_model.rowCount()):
+            self.metadata_tree.setRowHidden(row, QModelIndex(), False)
 
     def anonymize_all_dicom(self):
         prefix = self.prefix_input.text().strip()
         if not prefix:
             QMessageBox.warning(self, "Invalid Input", "Please enter a prefix for anonymization.")
             return
+        if self.anonymization_worker is not None and self.anonymization_worker.isRunning():
+            QMessageBox.warning(self, "Busy", "An anonymization is already running.")
+            return
         output_dir = QFileDialog.getExistingDirectory(self, "Select Output Directory")
         if not output_dir:
             return
 
-        for idx, file_path in enumerate(self.dicom_files):
-            try:
-                dicom_data = pydicom.dcmread(file_path)
-                self.anonymize_dicom_data(dicom_data, prefix)
-                anonymized_filename = os.path.join(output_dir, f"ANON_{os.path.basename(file_path)}")
-                dicom_data.save_as(anonymized_filename)
-                logging.info(f"Anonymized and saved: {anonymized_filename}")
-            except Exception as e:
-                logging.error(f"Failed to anonymize {file_path}: {e}")
-
-            self.progress_bar.setValue(int((idx + 1) / len(self.dicom_files) * 100))
-
-        QMessageBox.information(self, "Success", "All files anonymized successfully!")
+        # Existing outputs are complete (written atomically), so a rerun resumes where it stopped
+        self.anonymization_results = {'done': 0, 'skipped': 0, 'error': 0}
+        self.anonymization_errors = []
+        self.progress_bar.setRange(0, len(self.dicom_files))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.cancel_anonymize_btn.setEnabled(True)
+
+        self.anonymization_worker = AnonymizationWorker(list(self.dicom_files), output_dir, prefix,
+                                                        max_workers=self.anonymize_workers_input.value(),
+                                                        root=self.dicom_directory)
+        self.anonymization_worker.file_done.connect(self.on_file_anonymized)
+        self.anonymization_worker.finished.connect(self.on_anonymization_finished)
+        self.anonymization_worker.start()
+
+    def on_file_anonymized(self, result):
+        self.anonymization_results[result['status']] += 1
+        if result['status'] == 'error':
+            self.anonymization_errors.append(result)
+            logging.error(f"Failed to anonymize {result['path']}: {result['error']}")
+        self.progress_bar.setValue(self.progress_bar.value() + 1)
+
+    def cancel_anonymization(self):
+        if self.anonymization_worker is not None:
+            self.anonymization_worker.requestInterruption()
+            self.cancel_anonymize_btn.setEnabled(False)
+
+    def on_anonymization_finished(self):
+        worker = self.anonymization_worker
+        self.anonymization_worker = None
+        self.cancel_anonymize_btn.setEnabled(False)
         self.progress_bar.setVisible(False)
-
-    import uuid
-    import random
-    from datetime import datetime, timedelta
-
-    def anonymize_dicom_data(self, dicom_data, prefix):
-
-        identifier_replacements = {
-            'PatientName': f"{prefix}_Patient_{uuid.uuid4().hex[:8]}",
-            'PatientID': f"{prefix}_ID_{uuid.uuid4().hex[:8]}",
-            'PatientAddress': f"{prefix}_Anonymous_Address",
-            'ReferringPhysicianName': f"{prefix}_Dr_Anonymous",
-            'InstitutionName': f"{prefix}_Anonymous_Institution"
-        }
-
-        # Fields to clear
-        fields_to_clear = [
-            'PatientTelephoneNumbers', 'PatientEmailAddresses',
-            'OtherPatientIDs', 'OtherPatientNames', 'PatientComments'
-        ]
-
-        # Fields for date shifting
-        date_fields = ['PatientBirthDate', 'StudyDate', 'SeriesDate', 'AcquisitionDate', 'ContentDate']
-
-        # Replace identifiers with prefixed random values
-        for tag, replacement in identifier_replacements.items():
-            if hasattr(dicom_data, tag):
-                setattr(dicom_data, tag, replacement)
-
-        # Clear optional sensitive fields
-        for tag in fields_to_clear:
-            if hasattr(dicom_data, tag):
-                setattr(dicom_data, tag, '')
-
-        # Shift dates by a random number of days, with prefix included
-        date_shift = random.randint(-365, 365)  # Random shift within one year
-        for date_tag in date_fields:
-            if hasattr(dicom_data, date_tag) and getattr(dicom_data, date_tag):
-                original_date = getattr(dicom_data, date_tag)
-                try:
-                    shifted_date = self.shift_date_with_prefix(original_date, date_shift, prefix)
-                    setattr(dicom_data, date_tag, shifted_date)
-                except ValueError:
-                    logging.warning(f"Invalid date format for {date_tag}: {original_date}")
-
-        # Anonymize UIDs with prefix
-        uid_fields = ['StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID']
-        for uid_field in uid_fields:
-            if hasattr(dicom_data, uid_field):
-                setattr(dicom_data, uid_field, f"{prefix}_{uuid.uuid4().urn}")
-
-        logging.info("Anonymization with prefixed IDs and date shifting complete.")
-
-    @staticmethod
-    def shift_date_with_prefix(original_date, days_shift, prefix):
-        """
-        Shifts a DICOM date by a given number of days and adds a prefix.
-
-        :param original_date: Original date as a string in 'YYYYMMDD' format.
-        :param days_shift: Number of days to shift the date.
-        :param prefix: The prefix to include in the shifted date.
-        :return: Shifted date as a string in 'YYYYMMDD_Prefix' format.
-        """
-        try:
-            date_obj = datetime.strptime(original_date, "%Y%m%d")
-            shifted_date = date_obj + timedelta(days=days_shift)
-            return f"{shifted_date.strftime('%Y%m%d')}_{prefix}"
-        except ValueError:
-            raise ValueError(f"Invalid date format: {original_date}")
+        self.progress_bar.setRange(0, 100)
+
+        counts = self.anonymization_results
+        summary = f"{counts['done']} anonymized, {counts['skipped']} already done, {counts['error']} failed"
+        logging.info(f"Anonymization finished: {summary}")
+        if worker is not None and worker.isInterruptionRequested():
+            QMessageBox.information(self, "Cancelled", f"Anonymization cancelled: {summary}.")
+        elif self.anonymization_errors:
+            failed = "\n".join(os.path.basename(r['path']) for r in self.anonymization_errors[:10])
+            QMessageBox.warning(self, "Anonymization Errors", f"{summary}.\n\n{failed}")
+        else:
+            QMessageBox.information(self, "Success", "All files anonymized successfully!")
 
     def add_group_display_buttons(self, layout):
         # Predefined groups
@@ -469,21 +1399,34 @@ class DICOMMetadataViewer(QMainWindow):
         # Custom group input
         custom_group_layout = QHBoxLayout()
         self.custom_group_input = QLineEdit()
-        self.custom_group_input.setPlaceholderText("Enter group number (hex)")
+        self.custom_group_input.setPlaceholderText("Group (0010), tag range (00100010-00100030) or creator:NAME")
         custom_group_layout.addWidget(self.custom_group_input)
 
         custom_group_btn = QPushButton("Show Custom Group")
         custom_group_btn.clicked.connect(self.show_custom_group)
         custom_group_layout.addWidget(custom_group_btn)
 
+        all_files_group_btn = QPushButton("Show Group in All Files")
+        all_files_group_btn.clicked.connect(self.show_group_in_all_files)
+        custom_group_layout.addWidget(all_files_group_btn)
+
         layout.addLayout(custom_group_layout)
 
+    def current_group_index(self):
+        """Return the group index of the current dataset, building it on first use."""
+        if self.group_index is None or self.group_index.dataset is not self.current_dicom_data:
+            self.group_index = metadata.GroupIndex(self.current_dicom_data)
+        return self.group_index
+
     def show_group_elements(self, group):
         if not self.current_dicom_data:
             QMessageBox.warning(self, "No File", "No DICOM file selected.")
             return
 
-        elements = self.get_group_elements(group, self.current_dicom_data)
+        elements = metadata.get_group_elements(group, self.current_dicom_data, self.current_group_index())
+        self.show_elements(elements, f"group {group}")
+
+    def show_elements(self, elements, description):
         if elements:
             # Format the output with consistent spacing
             formatted_output = []
@@ -492,180 +1435,216 @@ class DICOMMetadataViewer(QMainWindow):
                 formatted_output.append(f"{str(k):<{max_key_length}} : {v}")
             self.raw_metadata_text.setText("\n".join(formatted_output))
         else:
-            self.raw_metadata_text.setText(f"No elements found for group {group}")
+            self.raw_metadata_text.setText(f"No elements found for {description}")
 
     def show_custom_group(self):
         group_text = self.custom_group_input.text().strip()
         if not group_text:
             QMessageBox.warning(self, "Invalid Input", "Please enter a group number")
             return
+        if not self.current_dicom_data:
+            QMessageBox.warning(self, "No File", "No DICOM file selected.")
+            return
 
         try:
-            # Handle both decimal and hexadecimal input
-            if group_text.startswith('0x'):
-                group_number = int(group_text, 16)
+            if group_text.lower().startswith('creator:'):
+                creator = group_text.split(':', 1)[1].strip()
+                elements = self.current_group_index().private_elements(creator)
+                self.show_elements(metadata.describe_elements(elements), f"private creator {creator}")
+            elif '-' in group_text:
+                first, last = (metadata.parse_tag(tag) for tag in group_text.split('-', 1))
+                elements = self.current_group_index().tag_range(first, last)
+                self.show_elements(metadata.describe_elements(elements), f"tags {group_text}")
             else:
-                group_number = int(group_text, 16 if any(c in 'abcdefABCDEF' for c in group_text) else 10)
-            self.show_group_elements(group_number)
+                group_number = metadata.parse_group(group_text)
+                self.show_group_elements(group_number)
         except ValueError:
-            QMessageBox.warning(self, "Invalid Input", "Please enter a valid hexadecimal or decimal number")
-
-    def get_group_elements(self, group, dicom_data):
-
-        # Predefined groups mapping
-        group_mappings = {
-            'Patient': 0x0010,
-            'Study': 0x0008,
-            'Series': 0x0020,
-            'Image': 0x0028,
-            'Equipment': 0x0018,
-            'Modality': 0x0008,  # Modality is typically in Study group
-            'Physician': 0x0032  # Physician information
-        }
-
-        elements = {}
+            QMessageBox.warning(self, "Invalid Input", "Please enter a hexadecimal group number, e.g. 0010")
 
+    def show_group_in_all_files(self):
+        """Run the custom group query over every loaded file in the background."""
+        group_text = self.custom_group_input.text().strip()
+        if not self.dicom_files or not group_text:
+            QMessageBox.warning(self, "Invalid Input", "Load a directory and enter a group number")
+            return
         try:
-            # Convert string group names to their corresponding numbers
-            if isinstance(group, str) and group in group_mappings:
-                group_number = group_mappings[group]
-            elif isinstance(group, (int, str)):
-                # If it's already a number or hex string, convert to int
-                group_number = int(str(group), 16) if isinstance(group, str) else group
-            else:
-                logging.error(f"Invalid group identifier: {group}")
-                return elements
-
-            # Iterate through all elements in the DICOM dataset
-            for elem in dicom_data:
-                tag_group = elem.tag.group
-
-                # If this element belongs to the requested group
-                if tag_group == group_number:
-                    try:
-                        # Get element name if available, otherwise use tag string
-                        name = elem.name if hasattr(elem, 'name') else f"({elem.tag.group:04x},{elem.tag.element:04x})"
-
-                        # Handle different types of values
-                        if elem.VR == "SQ":
-                            value = "Sequence"
-                        elif elem.VR == "UN":
-                            value = "Unknown"
-                        elif elem.VR in ["OB", "OW"]:
-                            value = f"Binary data of length {len(elem.value)}"
-                        else:
-                            value = elem.value
-
-                        elements[name] = str(value)
-                    except Exception as e:
-                        logging.warning(f"Error processing element {elem.tag}: {str(e)}")
-                        elements[f"Tag-{elem.tag}"] = "Error reading value"
-
-            # Add some helpful derived information for certain groups
-            if isinstance(group, str):
-                if group == 'Patient':
-                    if 'PatientAge' not in elements and 'PatientBirthDate' in elements:
-                        try:
-                            birth_date = datetime.strptime(elements['PatientBirthDate'], "%Y%m%d")
-                            study_date = datetime.strptime(getattr(dicom_data, 'StudyDate', '19700101'), "%Y%m%d")
-                            age = study_date.year - birth_date.year
-                            elements['Calculated PatientAge'] = f"{age}Y"
-                        except:
-                            pass
-                elif group == 'Image':
-                    if 'PixelSpacing' in elements:
-                        elements['Image Size'] = f"{dicom_data.Rows}x{dicom_data.Columns} pixels"
-                        try:
-                            spacing = dicom_data.PixelSpacing
-                            elements['Pixel Spacing'] = f"{spacing[0]}mm x {spacing[1]}mm"
-                        except:
-                            pass
+            group_number = metadata.parse_group(group_text)
+        except ValueError:
+            QMessageBox.warning(self, "Invalid Input", "Please enter a hexadecimal group number, e.g. 0010")
+            return
 
-        except Exception as e:
-            logging.error(f"Error processing group {group}: {str(e)}")
-            return {'Error': f"Failed to process group: {str(e)}"}
+        if self.group_query_worker is not None and self.group_query_worker.isRunning():
+            self.group_query_worker.requestInterruption()
+            self.group_query_worker.wait()
+        self.raw_metadata_text.setText(f"Reading group {group_number:04X} from {len(self.dicom_files)} files...")
+        self.group_query_worker = GroupQueryWorker(list(self.dicom_files), group_number)
+        self.group_query_worker.query_done.connect(self.on_group_query_done)
+        self.group_query_worker.start()
 
-        return elements
+    def on_group_query_done(self, group, results):
+        if self.sender() is not self.group_query_worker:
+            return
+        sections = []
+        for path, elements in results:
+            lines = [f"{name} : {value}" for name, value in elements.items()] or ["(no elements)"]
+            sections.append("\n".join([f"== {os.path.basename(path)} =="] + lines))
+        self.raw_metadata_text.setText("\n\n".join(sections))
+        self.statusBar().showMessage(f"Group {group:04X} read from {len(results)} files")
 
     def get_available_groups(self):
         if not self.current_dicom_data:
             return []
-
-        groups = set()
-        for elem in self.current_dicom_data:
-            groups.add(elem.tag.group)
-        return sorted(list(groups))
+        return self.current_group_index().groups()
 
     def export_metadata(self):
-        if not self.current_dicom_data:
-            QMessageBox.warning(self, "No File", "No DICOM file selected.")
+        if not self.dicom_files:
+            QMessageBox.warning(self, "No Files", "Load a DICOM directory first.")
+            return
+        if self.export_worker is not None and self.export_worker.isRunning():
+            QMessageBox.warning(self, "Busy", "An export is already running.")
             return
 
-        export_file_path, _ = QFileDialog.getSaveFileName(self, "Export Metadata", "", "CSV Files (*.csv)")
+        export_file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Metadata", "", "CSV Files (*.csv);;Parquet Files (*.parquet);;Arrow Files (*.arrow)"
+        )
         if not export_file_path:
             return
-
         try:
-            with open(export_file_path, 'w') as f:
-                for row in range(self.metadata_table.rowCount()):
-                    tag = self.metadata_table.item(row, 0).text()
-                    value = self.metadata_table.item(row, 1).text()
-                    f.write(f"{tag},{value}\n")
+            metadata_export.format_for_path(export_file_path)
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid File", str(e))
+            return
+
+        tags_text, ok = QInputDialog.getText(
+            self, "Export Metadata", "Tags to export, comma-separated (leave empty for all tags):"
+        )
+        if not ok:
+            return
+        tags = [tag.strip() for tag in tags_text.split(',') if tag.strip()] or None
+        unknown = metadata_export.unknown_keywords(tags or [])
+        if unknown:
+            QMessageBox.warning(self, "Unknown Tags", f"Not DICOM keywords: {', '.join(unknown)}\n"
+                                                      f"Keywords are case-sensitive, e.g. PatientID.")
+            return
+
+        self.progress_bar.setRange(0, len(self.dicom_files))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.export_worker = MetadataExportWorker(list(self.dicom_files), export_file_path, tags)
+        self.export_worker.progress.connect(self.progress_bar.setValue)
+        self.export_worker.export_failed.connect(
+            lambda error: QMessageBox.critical(self, "Error", f"Failed to export metadata: {error}")
+        )
+        self.export_worker.finished.connect(self.on_export_finished)
+        self.export_worker.start()
+
+    def on_export_finished(self):
+        self.progress_bar.setVisible(False)
+        self.progress_bar.setRange(0, 100)
+        if self.progress_bar.value() == len(self.dicom_files):
             QMessageBox.information(self, "Success", "Metadata exported successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to export metadata: {e}")
+        self.export_worker = None
+
+    def set_mpr_volume(self, display_data, spacing, prebuild=True):
+        """
+        Make display_data the current 3D volume and prebuild its reformats in the background.
+
+        :param prebuild: False builds each reformat only when its view is first shown.
+        """
+        if self.mpr_worker is not None and self.mpr_worker.isRunning():
+            self.mpr_worker.requestInterruption()
+            self.mpr_worker.wait()
+        self.original_image_data = display_data
+        self.mpr_engine = mpr.MPREngine(display_data, spacing)
+        self.mpr_worker = MPRWorker(self.mpr_engine, ['coronal', 'sagittal'] if prebuild else [])
+        self.mpr_worker.reformat_ready.connect(self.on_reformat_ready)
+        self.mpr_worker.start()
+        self.update_memory_usage()
+
+    def on_reformat_ready(self, engine, orientation):
+        if engine is self.mpr_engine and orientation == self.pending_view:
+            self.pending_view = None
+            self.statusBar().clearMessage()
+            self.switch_view(orientation)
 
     def switch_view(self, view_type):
         """Switch between axial, coronal, and sagittal views."""
         if not hasattr(self, 'original_image_data') or self.original_image_data is None:
             QMessageBox.warning(self, "No Image", "No 3D image data available.")
             return
+        if view_type not in mpr.ORIENTATIONS:
+            QMessageBox.warning(self, "Invalid View", "Invalid plane specified.")
+            return
 
         try:
-            if view_type == 'axial':
-                self.current_image_data = self.original_image_data
-            elif view_type == 'coronal':
-                self.current_image_data = np.transpose(self.original_image_data, (1, 0, 2))
-            elif view_type == 'sagittal':
-                self.current_image_data = np.transpose(self.original_image_data, (2, 0, 1))
-            else:
-                QMessageBox.warning(self, "Invalid View", "Invalid plane specified.")
+            reformat = self.mpr_engine.cached(view_type)
+            if reformat is None:
+                # Still being built in the background; show it as soon as it is ready
+                self.pending_view = view_type
+                self.statusBar().showMessage(f"Building {view_type} view...")
+                if not self.mpr_worker.isRunning():
+                    self.mpr_worker = MPRWorker(self.mpr_engine, [view_type])
+                    self.mpr_worker.reformat_ready.connect(self.on_reformat_ready)
+                    self.mpr_worker.start()
                 return
 
+            self.current_view = view_type
+            self.current_image_data = reformat
+
             # Update the display with the new orientation
             self.display_m2d_images(self.current_image_data)
         except Exception as e:
             QMessageBox.warning(self, "View Switch Error", f"Could not switch view: {str(e)}")
 
+    def show_oblique(self):
+        """Show an oblique plane through the current volume, tilted by the oblique inputs."""
+        if self.mpr_engine is None or self.original_image_data is None:
+            QMessageBox.warning(self, "No Image", "No 3D image data available.")
+            return
+        angle_x, angle_y, offset = (spin_box.value() for spin_box in self.oblique_inputs)
+        first_oblique = self.current_view != 'oblique'
+        self.current_view = 'oblique'
+        self.thumbnail_strip.setVisible(False)
+        self.display_single_image(self.mpr_engine.oblique(angle_x, angle_y, offset), reset_zoom=first_oblique)
+
+    def on_oblique_changed(self):
+        if self.current_view == 'oblique':
+            self.show_oblique()
+
     def visualize_dicom_images(self, dicom_data):
         """Load and visualize DICOM image data."""
+        self.stop_cine_mode()
         for i in reversed(range(self.image_grid.count())):
             widget = self.image_grid.itemAt(i).widget()
             if widget:
                 widget.setParent(None)
+        self.thumbnail_strip.setVisible(False)
+        self.current_view = 'axial'
 
         try:
-            if hasattr(dicom_data, 'pixel_array'):
-                pixel_data = dicom_data.pixel_array
+            mapped_pixels = getattr(dicom_data, 'mapped_pixels', None)
+            if frames.frame_count(dicom_data) > 1 and (mapped_pixels is not None or 'PixelData' in dicom_data):
+                self.visualize_frames(dicom_data)
+                return
 
-                normalized_data = self.normalize_image(pixel_data)
+            if mapped_pixels is not None or hasattr(dicom_data, 'pixel_array'):
+                pixel_data = mapped_pixels if mapped_pixels is not None else dicom_data.pixel_array
 
+                if pixel_data.ndim == 2 and pixel_data.dtype in (np.uint16, np.int16):
+                    # 16-bit slices are windowed by the lookup table, no float normalization needed
+                    self.current_image_data = pixel_data
+                    self.display_single_image(pixel_data)
+                    return
+
+                if pixel_data.ndim >= 3:
+                    # Volumes and cine loops are windowed once, off the GUI thread
+                    self.build_display_volume(pixel_data, dicom_data, self.show_display_volume)
+                    return
+
+                normalized_data = self.normalize_image(pixel_data)
                 if normalized_data.ndim == 2:
                     self.current_image_data = normalized_data
                     self.display_single_image(normalized_data)
-                elif normalized_data.ndim == 3:
-                    if normalized_data.shape[0] < max(normalized_data.shape[1:]):
-                        # Likely a 3D image with multiple slices
-                        self.original_image_data = normalized_data  # Store original 3D data
-                        self.current_image_data = normalized_data
-                        self.display_m2d_images(normalized_data)
-                    else:
-                        # Likely an M2D image (video/cine)
-                        self.display_m2d_images_as_video(normalized_data)
-                elif normalized_data.ndim == 4:
-                    # 4D image (multiple series of 3D images)
-                    self.display_m2d_images_as_video(normalized_data)
-
                 else:
                     QMessageBox.warning(self, "Unsupported Image", "Unsupported image dimensions.")
             else:
@@ -673,22 +1652,74 @@ class DICOMMetadataViewer(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to display image: {str(e)}")
 
-    def enable_tile_navigation(self, enable):
-        """Dynamically show or hide tile navigation buttons."""
-        if not hasattr(self, 'tile_navigation_buttons'):
-            self.tile_navigation_buttons = QHBoxLayout()
-            self.tile_previous_btn = QPushButton("Previous 7 Tiles")
-            self.tile_previous_btn.clicked.connect(self.show_previous_tile_set)
-            self.tile_navigation_buttons.addWidget(self.tile_previous_btn)
+    def visualize_frames(self, dicom_data):
+        """
+        Show a multi-frame file starting from its first frame, decoding frames only as they are needed.
 
-            self.tile_next_btn = QPushButton("Next 7 Tiles")
-            self.tile_next_btn.clicked.connect(self.show_next_tile_set)
-            self.tile_navigation_buttons.addWidget(self.tile_next_btn)
+        Cine loops are played straight from the frame accessor. Volumes are browsable
+        at once; their full display volume (needed for MPR) is built in the background.
+        Memory-mapped pixel data is used in place, so only the frames a view touches
+        are read from disk.
+        """
+        mapped_pixels = getattr(dicom_data, 'mapped_pixels', None)
+        frame_source = mapped_pixels if mapped_pixels is not None else frames.FrameAccessor(dicom_data)
+        window = (0, 255)  # 8-bit frames are shown as stored
+        display_frames = frame_source
+        if frame_source.dtype != np.uint8:
+            window = frames.sample_window(frame_source, dicom_data)
+            display_frames = frames.WindowedFrames(frame_source, *window)
+
+        if frame_source.ndim == 3 and frame_source.shape[0] < max(frame_source.shape[1:]):
+            # Likely a 3D image with multiple slices
+            self.display_m2d_images(display_frames)
+            if mapped_pixels is not None:
+                # Reformats read the whole file, so only build them when asked for
+                self.set_mpr_volume(display_frames, mpr.dataset_spacing(dicom_data), prebuild=False)
+            else:
+                self.build_display_volume(frame_source, dicom_data, self.on_frames_display_volume_ready, window)
+        else:
+            # Likely an M2D image (video/cine)
+            self.display_m2d_images_as_video(display_frames)
 
-            self.image_layout.addLayout(self.tile_navigation_buttons)
+    def on_frames_display_volume_ready(self, display_data):
+        self.set_mpr_volume(display_data, mpr.dataset_spacing(self.current_dicom_data))
+        if self.current_view == 'axial' and isinstance(self.current_image_data, frames.WindowedFrames):
+            self.current_image_data = display_data  # Same window, already decoded
+            self.update_tiles()
 
-        self.tile_previous_btn.setVisible(enable)
-        self.tile_next_btn.setVisible(enable)
+    def build_display_volume(self, image_data, dicom_data, on_ready, window=None):
+        """Window image_data into a shared uint8 display volume in the background, then call on_ready."""
+        if self.display_volume_worker is not None and self.display_volume_worker.isRunning():
+            self.display_volume_worker.requestInterruption()
+            self.display_volume_worker.wait()
+        self.display_volume_generation += 1
+        generation = self.display_volume_generation
+
+        def deliver(worker_generation, display_data):
+            if worker_generation == self.display_volume_generation:
+                self.statusBar().clearMessage()
+                on_ready(display_data)
+
+        self.statusBar().showMessage(f"Preparing display volume {image_data.shape}...")
+        self.display_volume_worker = DisplayVolumeWorker(generation, image_data, dicom_data, window)
+        self.display_volume_worker.volume_ready.connect(deliver)
+        self.display_volume_worker.start()
+
+    def show_display_volume(self, display_data):
+        """Show a windowed uint8 volume as slices or as a cine loop."""
+        try:
+            if display_data.ndim == 3 and display_data.shape[0] < max(display_data.shape[1:]):
+                # Likely a 3D image with multiple slices
+                self.set_mpr_volume(display_data, mpr.dataset_spacing(self.current_dicom_data))
+                self.current_image_data = display_data
+                self.display_m2d_images(display_data)
+            elif display_data.ndim in (3, 4):
+                # Likely an M2D image (video/cine), or multiple series of 3D images
+                self.display_m2d_images_as_video(display_data)
+            else:
+                QMessageBox.warning(self, "Unsupported Image", "Unsupported image dimensions.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to display image: {str(e)}")
 
     def show_previous_tile(self):
         if hasattr(self, 'current_tile_index') and self.current_tile_index > 0:
@@ -700,97 +1731,75 @@ class DICOMMetadataViewer(QMainWindow):
             self.current_tile_index += 1
             self.display_single_image(self.current_image_data[self.current_tile_index])
 
-    def display_single_image(self, image_data):
-        # Ensure image is uint8
-        if image_data.dtype != np.uint8:
-            image_data = (image_data - image_data.min()) / (image_data.max() - image_data.min()) * 255
-            image_data = image_data.astype(np.uint8)
+    def display_single_image(self, image_data, reset_zoom=True):
+        # A still image replaces any cine loop that is playing
+        self.stop_cine_mode()
+
+        # 8 and 16-bit integer images are rendered through a lookup table; anything else becomes uint8 first
+        if not rendering.LutRenderer.supports(image_data):
+            image_data = rendering.to_uint8(image_data)
 
         # Store the original image for manipulation
-        self.original_image = image_data.copy()
+        self.original_image = image_data
+        self.image_renderer = rendering.LutRenderer(image_data)
+        self.update_memory_usage()
 
-        # Reset zoom
+        if not reset_zoom:
+            self.request_image_update()
+            return
+
+        # Reset zoom; very large images start fitted to the window, drawn from a downsampled level
         self.current_zoom = 1.0
+        self.min_zoom = 0.2
+        if max(image_data.shape) > LARGE_IMAGE_SIZE:
+            viewport = self.image_scroll_area.viewport().size()
+            self.current_zoom = min(viewport.width() / image_data.shape[1],
+                                    viewport.height() / image_data.shape[0], 1.0)
+            self.min_zoom = min(self.min_zoom, self.current_zoom)
+        self.pending_zoom_ratio = 1.0
 
         # Create the initial display
+        self.image_update_timer.stop()
         self.update_image_display()
 
     def display_m2d_images(self, image_data):
-        """Display 3D images as tiles, 7 at a time."""
-        self.current_tile_index = 0  # Start at the first tile
+        """Display 3D images as a thumbnail strip of every slice, with the selected slice in the canvas."""
+        self.current_tile_index = 0  # Start at the first slice
         self.current_image_data = image_data  # Store the 3D image data
-        self.tiles_per_page = 7  # Number of tiles to display per page
         self.update_tiles()
+        self.display_single_image(image_data[0])
 
     def update_tiles(self):
-        """Update the displayed tiles based on the current tile index."""
-        for i in reversed(range(self.image_grid.count())):
-            widget = self.image_grid.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-
-        start_index = self.current_tile_index
-        end_index = min(start_index + self.tiles_per_page, self.current_image_data.shape[0])
-
-        for i in range(start_index, end_index):
-            slice_data = self.current_image_data[i]
-            normalized = self.normalize_image(slice_data)
-            qimage = QImage(
-                normalized.tobytes(),
-                normalized.shape[1],
-                normalized.shape[0],
-                normalized.shape[1],
-                QImage.Format.Format_Grayscale8
-            )
-            label = QLabel()
-            label.setPixmap(QPixmap.fromImage(qimage).scaled(200, 200, Qt.AspectRatioMode.KeepAspectRatio))
-            row, col = divmod(i - start_index, 3)
-            self.image_grid.addWidget(label, row, col)
-
-        self.enable_tile_navigation(True)
+        """Point the thumbnail strip at every slice of the current image data."""
+        view = getattr(self, 'current_view', 'axial')
+        source_path = getattr(self.current_dicom_data, 'filename', None)
+        if not isinstance(source_path, str):
+            source_path = None
+        image_data = self.current_image_data
+        slice_records = None
+        if image_data is self.original_image_data and self.series_volume is not None and view == 'axial':
+            slice_records = self.series_volume_records  # One file per slice: key thumbnails by file
+        self.thumbnail_strip.set_items([
+            {
+                'label': f"{view.capitalize()} {i + 1}",
+                'path': slice_records[i]['path'] if slice_records else source_path,
+                'frame': 0 if slice_records else i,
+                'variant': view if slice_records else f"{view}:{image_data.shape}",
+                'loader': lambda i=i: image_data[i],
+            }
+            for i in range(image_data.shape[0])
+        ])
+        self.thumbnail_strip.setVisible(True)
+
+    def show_slice(self, index):
+        """Show one slice of the current 3D data in the canvas, keeping zoom and scroll."""
+        self.stop_cine_mode()
+        self.current_tile_index = index
+        self.display_single_image(self.current_image_data[index], reset_zoom=False)
 
     def play_images(self):
         """Automatically play through the slices of the current plane."""
-        if not hasattr(self, 'current_image_data') or self.current_image_data is None:
-            QMessageBox.warning(self, "No Image", "No 3D image data available.")
-            return
-
-        self.playing = True
-        self.current_play_index = 0  # Start at the first slice
-
-        def update_slice():
-            if not self.playing or self.current_play_index >= self.current_image_data.shape[0]:
-                self.playing = False
-                self.timer.stop()
-                return
-
-            slice_data = self.current_image_data[self.current_play_index]
-            normalized = self.normalize_image(slice_data)
-            qimage = QImage(
-                normalized.tobytes(),
-                normalized.shape[1],
-                normalized.shape[0],
-                normalized.shape[1],
-                QImage.Format.Format_Grayscale8
-            )
-            self.image_label.setPixmap(QPixmap.fromImage(qimage).scaled(512, 512, Qt.AspectRatioMode.KeepAspectRatio))
-            self.current_play_index += 1
-
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(update_slice)
-        self.timer.start(100)  # Adjust the speed of playback as needed
-
-    def show_next_tile_set(self):
-        """Show the next set of tiles."""
-        if self.current_tile_index + self.tiles_per_page < self.current_image_data.shape[0]:
-            self.current_tile_index += self.tiles_per_page
-            self.update_tiles()
-
-    def show_previous_tile_set(self):
-        """Show the previous set of tiles."""
-        if self.current_tile_index > 0:
-            self.current_tile_index -= self.tiles_per_page
-            self.update_tiles()
+        self.start_cine_mode()
 
     def display_m2d_images_as_video(self, image_data):
         """Display M2D images as a video (cine mode)."""
@@ -801,25 +1810,11 @@ class DICOMMetadataViewer(QMainWindow):
             logging.error(f"Invalid M2D image data shape: {image_data.shape}")
             return
 
-        # Check all slices for validity
-        for i, frame in enumerate(image_data):
-            if frame.ndim < 2:
-                logging.error(f"Invalid frame at index {i}: Shape: {frame.shape}")
-                QMessageBox.warning(self, "Invalid Frame", f"Frame {i} has invalid shape {frame.shape}.")
-                return
 
-        self.cine_mode_active = True
-        self.cine_index = 0
         self.current_image_data = image_data
 
         logging.info(f"Starting M2D cine mode. Image data shape: {image_data.shape}")
-
-        self.play_button.setEnabled(False)
-        self.stop_button.setEnabled(True)
-
-        self.cine_timer = QTimer(self)
-        self.cine_timer.timeout.connect(self.cine_next_slice)
-        self.cine_timer.start(100)  # Adjust playback speed
+        self.start_cine_playback()
 
     def start_cine_mode(self):
         """Start cine mode playback."""
@@ -831,42 +1826,111 @@ class DICOMMetadataViewer(QMainWindow):
             QMessageBox.warning(self, "Invalid Data", "Cine mode requires multiple frames.")
             return
 
+        self.start_cine_playback()
+
+    def cine_frame_rate(self):
+        """User-set frames per second, or the acquired rate of the current file."""
+        return self.cine_fps_input.value() or cine.frame_rate(self.current_dicom_data)
+
+    def start_cine_playback(self):
+        """Start rendering frames ahead into the ring buffer and showing them on time."""
+        self.stop_cine_mode()
+        frames = self.current_image_data
+
+        # Render at native size, shrunk to fit the viewport if needed
+        frame_size = QSize(frames.shape[2], frames.shape[1])
+        viewport = self.image_scroll_area.viewport().size()
+        display_size = frame_size.scaled(viewport, Qt.AspectRatioMode.KeepAspectRatio) \
+            if frame_size.width() > viewport.width() or frame_size.height() > viewport.height() else frame_size
+
+        self.cine_frames = frames
+        self.cine_ring = cine.FrameRingBuffer(CINE_BUFFER_FRAMES)
+        self.cine_render_thread = CineRenderThread(frames, self.cine_ring, display_size)
+        self.cine_render_thread.start()
+
         self.cine_mode_active = True
-        self.cine_index = 0  # Start from the first frame
+        self.cine_index = 0
+        self.cine_fps = self.cine_frame_rate()
+        self.cine_stats = cine.PlaybackStats()
+        self.cine_start_time = time.perf_counter()
+        self.cine_start_counter = 0
+        self.cine_shown_counter = -1
+
+        self.clear_image_grid()
+        self.image_grid.addWidget(self.cine_label, 0, 0)
 
         self.play_button.setEnabled(False)
         self.stop_button.setEnabled(True)
+        # Tick twice per frame so frames are shown close to their due time
+        self.cine_timer.start(max(1, int(500 / self.cine_fps)))
 
-        self.cine_timer = QTimer(self)
-        self.cine_timer.timeout.connect(self.cine_next_slice)
-        self.cine_timer.start(100)  # Set playback speed (100ms per frame)
+    def on_cine_fps_changed(self):
+        if not self.cine_mode_active:
+            return
+        # Re-anchor the clock at the frame currently shown so playback continues smoothly
+        self.cine_start_counter = max(self.cine_shown_counter, 0)
+        self.cine_start_time = time.perf_counter()
+        self.cine_fps = self.cine_frame_rate()
+        self.cine_timer.start(max(1, int(500 / self.cine_fps)))
 
     def cine_next_slice(self):
-        """Display the next slice in cine mode."""
-        if not self.cine_mode_active or self.current_image_data is None or self.cine_index >= \
-                self.current_image_data.shape[0]:
+        """Show the frame due now, dropping frames if rendering has fallen behind."""
+        if not self.cine_mode_active or self.cine_ring is None:
             self.stop_cine_mode()
             return
 
-        # Log the current slice
-        current_slice = self.current_image_data[self.cine_index]
-        logging.info(f"Displaying slice {self.cine_index}, shape: {current_slice.shape}")
+        now = time.perf_counter()
+        target = self.cine_start_counter + int((now - self.cine_start_time) * self.cine_fps)
+        if target == self.cine_shown_counter:
+            return
 
-        # Validate and display the current slice
-        if current_slice.ndim == 2 or (current_slice.ndim == 3 and current_slice.shape[2] in [1, 3]):
-            self.display_2d_image(current_slice)
+        counter, qimage, dropped = self.cine_ring.take(target)
+        self.cine_stats.dropped += dropped
+        if qimage is not None:
+            with perf.span('qpixmap'):
+                self.cine_label.setPixmap(QPixmap.fromImage(qimage))
+            perf.frame_done()
+            self.cine_shown_counter = counter
+            self.cine_index = counter % self.cine_frames.shape[0]
+            self.cine_stats.frame_shown(now)
+            self.cine_stats_label.setText(
+                f"{self.cine_stats.achieved_fps():.1f} / {self.cine_fps:.1f} fps, "
+                f"{self.cine_stats.dropped} dropped"
+            )
+
+    def toggle_perf_overlay(self, checked):
+        """Switch stage timing on or off, with the overlay showing the live numbers."""
+        perf.tracer.enable(checked)
+        if checked:
+            self.perf_overlay.start()
         else:
-            logging.error(f"Invalid slice at index {self.cine_index}: Shape: {current_slice.shape}")
-            self.stop_cine_mode()
-            return
+            self.perf_overlay.stop()
 
-        # Move to the next slice
-        self.cine_index += 1
+    def export_trace(self):
+        """Save the recorded stage timings as a Chrome trace (open in chrome://tracing or Perfetto)."""
+        if not perf.tracer.events:
+            QMessageBox.information(self, "No Timings", "Turn on the Perf Overlay and use the viewer to record timings.")
+            return
+        trace_path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "viewer-trace.json",
+                                                    "Chrome Trace (*.json)")
+        if not trace_path:
+            return
+        try:
+            perf.tracer.export_chrome_trace(trace_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Error", f"Could not write trace: {e}")
 
     def stop_cine_mode(self):
         """Stop cine mode playback."""
-        if hasattr(self, 'cine_timer') and self.cine_timer.isActive():
-            self.cine_timer.stop()
+        self.cine_timer.stop()
+        if self.cine_ring is not None:
+            self.cine_ring.close()
+            self.cine_ring = None
+        if self.cine_render_thread is not None:
+            self.cine_render_thread.requestInterruption()
+            self.cine_render_thread.wait()
+            self.cine_render_thread = None
+        self.cine_frames = None
 
         self.cine_mode_active = False
         self.play_button.setEnabled(True)
@@ -874,7 +1938,8 @@ class DICOMMetadataViewer(QMainWindow):
 
     def display_2d_image(self, image_data):
         """Display a single 2D image (with enhanced quality)."""
-        normalized = self.normalize_image(image_data)
+        # Display volumes are already uint8 with one window for every frame
+        normalized = image_data if image_data.dtype == np.uint8 else self.normalize_image(image_data)
 
         # Ensure the data is at least 2D
         if normalized.ndim < 2:
@@ -882,13 +1947,9 @@ class DICOMMetadataViewer(QMainWindow):
             logging.error(f"Image data shape invalid for display: {normalized.shape}")
             return
 
-        # Convert to QImage
-        if normalized.ndim == 2:  # Grayscale image
-            qimage = QImage(normalized.tobytes(), normalized.shape[1], normalized.shape[0],
-                            QImage.Format.Format_Grayscale8)
-        elif normalized.ndim == 3 and normalized.shape[2] == 3:  # RGB image
-            qimage = QImage(normalized.tobytes(), normalized.shape[1], normalized.shape[0],
-                            normalized.shape[1] * 3, QImage.Format.Format_RGB888)
+        # Convert to QImage (grayscale or RGB), sharing the array's memory
+        if normalized.ndim == 2 or (normalized.ndim == 3 and normalized.shape[2] == 3):
+            qimage = array_to_qimage(normalized)
         else:
             QMessageBox.warning(self, "Image Error", "Unsupported image format.")
             logging.error(f"Unsupported image format: {normalized.shape}")
@@ -897,13 +1958,11 @@ class DICOMMetadataViewer(QMainWindow):
         # Create a QPixmap from QImage
         pixmap = QPixmap.fromImage(qimage)
 
-        # Add the image to the layout
-        self.clear_image_grid()
-        label = QLabel()
-        label.setPixmap(pixmap)
-        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-        self.image_grid.addWidget(label)
+        # Show it on the persistent frame label
+        if self.image_grid.indexOf(self.cine_label) < 0:
+            self.clear_image_grid()
+            self.image_grid.addWidget(self.cine_label, 0, 0)
+        self.cine_label.setPixmap(pixmap)
 
     def clear_image_grid(self):
         """Clear the image grid to show only the latest image."""
@@ -913,9 +1972,7 @@ class DICOMMetadataViewer(QMainWindow):
                 widget.setParent(None)
 
     @staticmethod
-    @staticmethod
-    @staticmethod
-    @staticmethod
+    @perf.traced('normalize')
     def normalize_image(image):
         """Normalize the image for better contrast and display quality."""
         # Handle empty images
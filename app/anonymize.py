@@ -0,0 +1,189 @@
+import os
+import uuid
+import shutil
+import random
+import logging
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import pydicom
+from pydicom.uid import DeflatedExplicitVRLittleEndian
+
+from dicom_index import common_root, mirrored_path
+
+DEFAULT_WORKERS = max(1, os.cpu_count() or 1)
+# Header elements larger than this are read from the source only when written out
+DEFER_SIZE = '1 MB'
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def anonymize_dicom_data(dicom_data, prefix):
+    """Replace identifying elements of a dataset in place with prefixed random values."""
+    identifier_replacements = {
+        'PatientName': f"{prefix}_Patient_{uuid.uuid4().hex[:8]}",
+        'PatientID': f"{prefix}_ID_{uuid.uuid4().hex[:8]}",
+        'PatientAddress': f"{prefix}_Anonymous_Address",
+        'ReferringPhysicianName': f"{prefix}_Dr_Anonymous",
+        'InstitutionName': f"{prefix}_Anonymous_Institution"
+    }
+
+    # Fields to clear
+    fields_to_clear = [
+        'PatientTelephoneNumbers', 'PatientEmailAddresses',
+        'OtherPatientIDs', 'OtherPatientNames', 'PatientComments'
+    ]
+
+    # Fields for date shifting
+    date_fields = ['PatientBirthDate', 'StudyDate', 'SeriesDate', 'AcquisitionDate', 'ContentDate']
+
+    # Replace identifiers with prefixed random values
+    for tag, replacement in identifier_replacements.items():
+        if hasattr(dicom_data, tag):
+            setattr(dicom_data, tag, replacement)
+
+    # Clear optional sensitive fields
+    for tag in fields_to_clear:
+        if hasattr(dicom_data, tag):
+            setattr(dicom_data, tag, '')
+
+    # Shift dates by a random number of days, with prefix included
+    date_shift = random.randint(-365, 365)  # Random shift within one year
+    for date_tag in date_fields:
+        if hasattr(dicom_data, date_tag) and getattr(dicom_data, date_tag):
+            original_date = getattr(dicom_data, date_tag)
+            try:
+                shifted_date = shift_date_with_prefix(original_date, date_shift, prefix)
+                setattr(dicom_data, date_tag, shifted_date)
+            except ValueError:
+                logging.warning(f"Invalid date format for {date_tag}: {original_date}")
+
+    # Anonymize UIDs with prefix
+    uid_fields = ['StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID']
+    for uid_field in uid_fields:
+        if hasattr(dicom_data, uid_field):
+            setattr(dicom_data, uid_field, f"{prefix}_{uuid.uuid4().urn}")
+
+
+def shift_date_with_prefix(original_date, days_shift, prefix):
+    """
+    Shifts a DICOM date by a given number of days and adds a prefix.
+
+    :param original_date: Original date as a string in 'YYYYMMDD' format.
+    :param days_shift: Number of days to shift the date.
+    :param prefix: The prefix to include in the shifted date.
+    :return: Shifted date as a string in 'YYYYMMDD_Prefix' format.
+    """
+    try:
+        date_obj = datetime.strptime(original_date, "%Y%m%d")
+        shifted_date = date_obj + timedelta(days=days_shift)
+        return f"{shifted_date.strftime('%Y%m%d')}_{prefix}"
+    except ValueError:
+        raise ValueError(f"Invalid date format: {original_date}")
+
+
+def write_anonymized(file_path, output, prefix):
+    """
+    Write an anonymized copy of file_path to output without loading its pixel data.
+
+    Only the header is parsed; the bytes from the pixel data element to the
+    end of the file are copied unchanged, so compressed pixel data stays
+    bit-exact and memory use does not grow with the file size. Deflated files
+    (whose whole dataset is compressed) and files without a transfer syntax are
+    read and rewritten in full instead.
+    """
+    with open(file_path, 'rb') as source:
+        dicom_data = pydicom.dcmread(source, stop_before_pixels=True, defer_size=DEFER_SIZE)
+        pixel_offset = source.tell()
+        transfer_syntax = dicom_data.file_meta.get('TransferSyntaxUID')
+        if transfer_syntax is None or transfer_syntax == DeflatedExplicitVRLittleEndian:
+            dicom_data = pydicom.dcmread(file_path)
+            anonymize_dicom_data(dicom_data, prefix)
+            dicom_data.save_as(output)
+            return
+
+        anonymize_dicom_data(dicom_data, prefix)
+        with open(output, 'wb') as target:
+            pydicom.dcmwrite(target, dicom_data, enforce_file_format=True)
+            source.seek(pixel_offset)
+            shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+
+
+def output_path(file_path, output_dir, root=None):
+    """
+    Return where the anonymized copy of file_path is written: its path relative
+    to root (default: its own directory) mirrored under output_dir, with the
+    file name prefixed ANON_. Files with the same name in different folders
+    below root therefore never share an output.
+    """
+    directory, name = os.path.split(mirrored_path(file_path, output_dir, root))
+    return os.path.join(directory, f"ANON_{name}")
+
+
+def anonymize_file(file_path, output_dir, prefix, overwrite=False, root=None):
+    """
+    Anonymize one file into output_dir, at output_path(file_path, output_dir, root).
+
+    The output is written to a temporary file and renamed into place, so an
+    existing output is always complete and is skipped unless overwrite is set.
+
+    :return: Dict with path, output, status ('done', 'skipped' or 'error') and error.
+    """
+    output = output_path(file_path, output_dir, root)
+    result = {'path': file_path, 'output': output, 'status': 'done', 'error': None}
+    if not overwrite and os.path.exists(output):
+        result['status'] = 'skipped'
+        return result
+
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        write_anonymized(file_path, tmp_path, prefix)
+        os.replace(tmp_path, output)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        result['status'], result['error'] = 'error', str(e)
+    return result
+
+
+def anonymize_files(file_paths, output_dir, prefix, max_workers=DEFAULT_WORKERS, should_stop=None,
+                    overwrite=False, root=None):
+    """
+    Anonymize files in a process pool, yielding anonymize_file results as they finish.
+
+    Only a few files per worker are queued at a time, so stopping (should_stop()
+    returning True) takes effect after the files already in progress.
+
+    :param root: Directory whose layout is mirrored under output_dir; defaults
+        to the deepest directory containing every file.
+    """
+    file_paths = list(file_paths)
+    root = root or common_root(file_paths)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = iter(file_paths)
+    in_flight = max_workers * 4
+    # Spawned workers do not inherit the GUI's threads and locks
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        pending = set()
+        stopped = False
+        while True:
+            while not stopped and len(pending) < in_flight:
+                if should_stop is not None and should_stop():
+                    stopped = True
+                    break
+                path = next(paths, None)
+                if path is None:
+                    break
+                pending.add(executor.submit(anonymize_file, path, output_dir, prefix, overwrite, root))
+            if not pending:
+                return
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            if not stopped and should_stop is not None and should_stop():
+                stopped = True
+                for future in pending:
+                    future.cancel()
+                pending = {future for future in pending if not future.cancelled()}
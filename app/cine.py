@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import deque
+
+DEFAULT_FRAME_RATE = 10.0
+
+
+def frame_rate(dicom_data, default=DEFAULT_FRAME_RATE):
+    """
+    Return the acquired playback rate in frames per second.
+
+    Checks FrameTime (ms per frame), then CineRate and
+    RecommendedDisplayFrameRate, then the mean of FrameTimeVector.
+    """
+    if dicom_data is None:
+        return default
+    try:
+        frame_time = float(getattr(dicom_data, 'FrameTime', 0) or 0)
+        if frame_time > 0:
+            return 1000.0 / frame_time
+        for keyword in ('CineRate', 'RecommendedDisplayFrameRate'):
+            rate = float(getattr(dicom_data, keyword, 0) or 0)
+            if rate > 0:
+                return rate
+        vector = [float(t) for t in getattr(dicom_data, 'FrameTimeVector', [])[1:] if float(t) > 0]
+        if vector:
+            return 1000.0 * len(vector) / sum(vector)
+    except (TypeError, ValueError):
+        pass
+    return default
+
+
+class FrameRingBuffer:
+    """
+    Bounded producer/consumer buffer of pre-rendered frames.
+
+    Frames are tagged with a monotonically increasing counter (frame index =
+    counter % frame count, so playback loops). The consumer asks for the frame
+    due at a given counter; older buffered frames are dropped, and when the
+    producer has fallen behind it is moved ahead so it renders frames that can
+    still be shown in time.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._frames = deque()
+        self._next = 0  # Counter the producer renders next
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def next_counter(self):
+        with self._condition:
+            return self._next
+
+    def put(self, counter, frame):
+        """Add a rendered frame, waiting while the buffer is full. False if it was superseded."""
+        with self._condition:
+            while len(self._frames) >= self.capacity and not self._closed and counter == self._next:
+                self._condition.wait()
+            if self._closed or counter != self._next:
+                return False
+            self._frames.append((counter, frame))
+            self._next += 1
+            self._condition.notify_all()
+            return True
+
+    def take(self, target):
+        """
+        Return (counter, frame, dropped) for the newest buffered frame due by target.
+
+        counter and frame are None if nothing is ready yet. dropped counts frames
+        that were discarded or skipped without being shown.
+        """
+        with self._condition:
+            shown, dropped = (None, None), 0
+            while self._frames and self._frames[0][0] <= target:
+                if shown[0] is not None:
+                    dropped += 1
+                shown = self._frames.popleft()
+            if not self._frames and self._next <= target:
+                # Producer is behind: skip it past the frames that are already late
+                dropped += target + 1 - self._next
+                self._next = target + 1
+            self._condition.notify_all()
+            return shown[0], shown[1], dropped
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._frames.clear()
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class PlaybackStats:
+    """Tracks achieved frame rate over a sliding window and dropped frames."""
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.shown = deque()
+        self.dropped = 0
+
+    def frame_shown(self, now=None):
+        now = time.perf_counter() if now is None else now
+        self.shown.append(now)
+        while self.shown and now - self.shown[0] > self.window:
+            self.shown.popleft()
+
+    def achieved_fps(self):
+        if len(self.shown) < 2:
+            return 0.0
+        span = self.shown[-1] - self.shown[0]
+        return (len(self.shown) - 1) / span if span > 0 else 0.0
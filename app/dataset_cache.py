@@ -0,0 +1,221 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pydicom
+
+import frames
+import perf
+import memory
+
+DEFAULT_CACHE_BYTES = int(os.environ.get('DICOM_VIEWER_DATASET_CACHE_BYTES', 512 * 1024 ** 2))
+DEFAULT_PREFETCH_WORKERS = 2
+# Files at least this large have uncompressed pixel data memory-mapped instead of read
+MEMMAP_MIN_BYTES = int(os.environ.get('DICOM_VIEWER_MEMMAP_BYTES', 64 * 1024 ** 2))
+# Values at least this large are read only once there is room for them
+DEFER_BYTES = 1024 ** 2
+
+
+def decoded_nbytes(dicom_data):
+    """Estimate the size of a dataset's decoded pixel array from its pixel module."""
+    try:
+        return (int(dicom_data.Rows) * int(dicom_data.Columns) * int(getattr(dicom_data, 'SamplesPerPixel', 1))
+                * max(1, int(dicom_data.BitsAllocated) // 8) * frames.frame_count(dicom_data))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+def _read_mapped(file_path):
+    try:
+        return frames.read_mapped(file_path)
+    except Exception as e:
+        logging.warning(f"Could not memory-map pixel data of {file_path}: {e}")
+        return None
+
+
+def _read_dataset(file_path, evict=True):
+    """
+    Read a dataset as load_dataset does, returning it with the reservation holding its memory.
+
+    The header is read first, with large values deferred, so the memory the
+    pixel data needs is known and reserved before it is read or decoded.
+
+    :param evict: False never shrinks other caches to make room; a load that
+        does not fit then raises MemoryError instead of falling back.
+    """
+    if os.path.getsize(file_path) >= MEMMAP_MIN_BYTES:
+        dicom_data = _read_mapped(file_path)
+        if dicom_data is not None:
+            return dicom_data, memory.Reservation(memory.accountant)
+
+    with perf.span('dcmread', path=file_path):
+        dicom_data = pydicom.dcmread(file_path, defer_size=DEFER_BYTES)
+    if 'PixelData' not in dicom_data:
+        return dicom_data, memory.Reservation(memory.accountant)
+
+    decode = frames.frame_count(dicom_data) == 1
+    # Raw pixel data, plus the decoded array of single-frame files
+    nbytes = os.path.getsize(file_path) + (decoded_nbytes(dicom_data) if decode else 0)
+    reservation = memory.accountant.reserve(nbytes, f"loading {file_path}", evict=evict)
+    if not reservation:
+        if not evict:
+            raise MemoryError(f"No room within the memory limit for {file_path}")
+        mapped = _read_mapped(file_path)
+        if mapped is not None:
+            return mapped, reservation
+
+    if decode:
+        try:
+            with perf.span('decode', path=file_path):
+                dicom_data.pixel_array  # pydicom keeps the decoded array on the dataset
+        except Exception as e:
+            logging.warning(f"Could not decode pixel data of {file_path}: {e}")
+    return dicom_data, reservation
+
+
+def load_dataset(file_path):
+    """
+    Read a dataset and decode its pixel data so later pixel_array accesses are free.
+
+    Multi-frame pixel data is left encoded: the viewer decodes it frame by
+    frame (frames.FrameAccessor), so the first frame never waits on the rest.
+    Large files with uncompressed pixel data are not read whole: their header
+    is returned with the pixels memory-mapped as its mapped_pixels attribute.
+    So are smaller ones whose decoded pixels would not fit in the memory limit.
+    """
+    dicom_data, reservation = _read_dataset(file_path)
+    reservation.release()
+    return dicom_data
+
+
+def dataset_nbytes(dicom_data):
+    """
+    Estimate the memory held by a dataset: its raw pixel data, plus the decoded
+    array of single-frame datasets (mapped pixels are not held).
+    """
+    nbytes = 64 * 1024  # Rough allowance for the header elements
+    if 'PixelData' in dicom_data:
+        nbytes += len(dicom_data.PixelData)
+    decoded = getattr(dicom_data, '_pixel_array', None)
+    if decoded is not None and frames.frame_count(dicom_data) == 1:
+        nbytes += decoded.nbytes
+    return nbytes
+
+
+class DatasetCache:
+    """
+    Thread-safe LRU cache of parsed datasets and their decoded pixel arrays.
+
+    Entries are evicted least-recently-used first once the total estimated
+    size exceeds max_bytes. Entries are keyed by path and invalidated when the
+    file's mtime or size changes.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # path -> (stamp, dataset, nbytes)
+        self._loading = {}  # path -> threading.Event for loads in progress
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(file_path):
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def __contains__(self, file_path):
+        with self._lock:
+            return file_path in self._entries
+
+    def get(self, file_path, evict=True):
+        """
+        Return the dataset for file_path, loading and caching it on a miss.
+
+        :param evict: False never evicts cached data to make room (see _read_dataset).
+        """
+        stamp = self._stamp(file_path)
+        while True:
+            with self._lock:
+                entry = self._entries.get(file_path)
+                if entry is not None and entry[0] == stamp:
+                    self._entries.move_to_end(file_path)
+                    return entry[1]
+                pending = self._loading.get(file_path)
+                if pending is None:
+                    pending = self._loading[file_path] = threading.Event()
+                    break
+            pending.wait()  # Another thread (usually the prefetcher) is loading it
+
+        try:
+            dicom_data, reservation = _read_dataset(file_path, evict)
+            with reservation:  # Held until the cache accounts for the dataset
+                self.put(file_path, dicom_data, stamp)
+            return dicom_data
+        finally:
+            with self._lock:
+                self._loading.pop(file_path).set()
+
+    def put(self, file_path, dicom_data, stamp=None):
+        nbytes = dataset_nbytes(dicom_data)
+        with self._lock:
+            old = self._entries.pop(file_path, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            if nbytes > self.max_bytes:
+                return  # Larger than the whole budget; never cache it
+            self._entries[file_path] = (stamp or self._stamp(file_path), dicom_data, nbytes)
+            self.current_bytes += nbytes
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            evicted, (_, _, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            logging.debug(f"Evicted {evicted} from dataset cache")
+
+    def shrink(self, nbytes):
+        """Evict least-recently-used entries until at least nbytes are freed (or the cache is empty)."""
+        with self._lock:
+            target = max(0, self.current_bytes - nbytes)
+            while self.current_bytes > target and self._entries:
+                _, (_, _, entry_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= entry_bytes
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict_locked()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+class Prefetcher:
+    """Warms a DatasetCache in background threads; newer requests supersede older ones."""
+
+    def __init__(self, cache, max_workers=DEFAULT_PREFETCH_WORKERS):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._futures = []
+
+    def schedule(self, file_paths):
+        """Queue file_paths (nearest first) for loading, dropping any not-yet-started requests."""
+        for future in self._futures:
+            future.cancel()
+        self._futures = [
+            self._executor.submit(self._warm, path)
+            for path in file_paths if path not in self.cache
+        ]
+
+    def _warm(self, file_path):
+        try:
+            self.cache.get(file_path, evict=False)  # Never push out what the user may step back to
+        except Exception as e:
+            logging.debug(f"Prefetch of {file_path} failed: {e}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,226 @@
+"""
+Headless batch mode for the DICOM viewer.
+
+Runs the viewer's indexing, metadata export, anonymization and thumbnail
+code without Qt. Every command writes one JSON object per line.
+
+    python app/dicom_cli.py index /data/dicom
+    python app/dicom_cli.py export /data/dicom --results metadata.jsonl --group Patient
+    python app/dicom_cli.py export /data/dicom -o metadata.parquet --tags PatientID,Modality
+    python app/dicom_cli.py anonymize /data/dicom -o /data/anon --prefix STUDY1
+    python app/dicom_cli.py thumbnails /data/dicom -o /data/thumbs --size 256
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pydicom
+import pydicom.pixels
+
+import dicom_index
+import anonymize
+import metadata
+import metadata_export
+import thumbnails
+
+DEFAULT_PROCESSES = max(1, os.cpu_count() or 1)
+
+
+def collect_files(inputs):
+    """Expand directories into the .dcm files below them; other inputs are taken as files."""
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(entry[0] for entry in dicom_index.find_dicom_files_with_stat(path))
+        else:
+            files.append(path)
+    return files
+
+
+class Progress:
+    """Writes 'done/total' to stderr, rewriting one line."""
+
+    def __init__(self, total, enabled):
+        self.total = total
+        self.enabled = enabled
+        self.done = 0
+
+    def advance(self, count=1):
+        self.done += count
+        if self.enabled:
+            sys.stderr.write(f"\r{self.done}/{self.total}")
+            sys.stderr.flush()
+
+    def finish(self):
+        if self.enabled:
+            sys.stderr.write("\n")
+
+
+def export_file(file_path, groups=None):
+    """Read the header of one file into {path, metadata, error}; grouped by name when groups are given."""
+    result = {'path': file_path, 'metadata': None, 'error': None}
+    try:
+        dicom_data = pydicom.dcmread(file_path, stop_before_pixels=True, force=True)
+        if groups:
+            result['metadata'] = {group: metadata.get_group_elements(group, dicom_data) for group in groups}
+        else:
+            result['metadata'] = dict(metadata.metadata_items(dicom_data))
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def render_thumbnail(file_path, output_dir, size=thumbnails.THUMBNAIL_SIZE, root=None):
+    """
+    Decode the first frame of one file and write it as <name>.png into output_dir,
+    in the file's folder relative to root so same-named files do not collide.
+    """
+    output = f"{os.path.splitext(dicom_index.mirrored_path(file_path, output_dir, root))[0]}.png"
+    result = {'path': file_path, 'output': output, 'error': None}
+    try:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        thumbnails.write_png(output, thumbnails.make_thumbnail(pydicom.pixels.pixel_array(file_path, index=0), size))
+    except Exception as e:
+        result['output'], result['error'] = None, str(e)
+    return result
+
+
+def run_index(args, out):
+    catalog = dicom_index.DicomCatalog(args.db)
+    failed = 0
+    for directory in args.inputs:
+        progress = Progress(0, args.progress)
+
+        def on_found(count, progress=progress):
+            progress.total = count
+
+        for batch in catalog.scan(directory, max_workers=args.workers, on_found=on_found):
+            for record in batch:
+                failed += record['error'] is not None
+                write_line(out, record)
+            progress.advance(len(batch))
+        progress.finish()
+    return failed
+
+
+def run_pool(args, out, function, *extra, files=None):
+    """Map function over the input files (or files) in a process pool, writing results in input order."""
+    if files is None:
+        files = collect_files(args.inputs)
+    progress = Progress(len(files), args.progress)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(function, files, *[[value] * len(files) for value in extra], chunksize=16):
+            failed += result['error'] is not None
+            write_line(out, result)
+            progress.advance()
+    progress.finish()
+    return failed
+
+
+def keyword_list(text):
+    """argparse type for --tags: comma-separated DICOM keywords."""
+    tags = [tag.strip() for tag in text.split(',') if tag.strip()]
+    unknown = metadata_export.unknown_keywords(tags)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown DICOM keywords: {', '.join(unknown)}")
+    return tags
+
+
+def run_export(args, out):
+    if not args.output:
+        return run_pool(args, out, export_file, args.group)
+
+    files = collect_files(args.inputs)
+    progress = Progress(len(files), args.progress)
+    tags = args.tags or None
+    done = metadata_export.export_metadata(files, args.output, tags=tags, max_workers=args.workers,
+                                           on_progress=lambda count: progress.advance(count - progress.done))
+    progress.finish()
+    write_line(out, {'output': args.output, 'files': done})
+    return 0
+
+
+def run_thumbnails(args, out):
+    files = collect_files(args.inputs)
+    os.makedirs(args.output, exist_ok=True)
+    return run_pool(args, out, render_thumbnail, args.output, args.size, dicom_index.common_root(files),
+                    files=files)
+
+
+def run_anonymize(args, out):
+    files = collect_files(args.inputs)
+    progress = Progress(len(files), args.progress)
+    failed = 0
+    for result in anonymize.anonymize_files(files, args.output, args.prefix, max_workers=args.workers,
+                                            overwrite=args.overwrite):
+        failed += result['status'] == 'error'
+        write_line(out, result)
+        progress.advance()
+    progress.finish()
+    return failed
+
+
+def write_line(out, value):
+    out.write(json.dumps(value, default=str) + "\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless batch mode for the DICOM viewer.")
+    parser.add_argument('--log-level', default='WARNING', help="Logging level for stderr (default: WARNING)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, help_text, handler, workers, output_help=None):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('inputs', nargs='+', help="DICOM files or directories")
+        command.add_argument('--workers', type=int, default=workers, help=f"Parallel workers (default: {workers})")
+        command.add_argument('--progress', action='store_true', help="Show progress on stderr")
+        command.add_argument('--results', help="Write the JSON lines to this file instead of stdout")
+        if output_help:
+            command.add_argument('-o', '--output', required=True, help=output_help)
+        command.set_defaults(handler=handler)
+        return command
+
+    index = add_command('index', "Index directories into the catalog and print header records",
+                        run_index, dicom_index.DEFAULT_WORKERS)
+    index.add_argument('--db', help="Catalog database (default: the viewer's catalog)")
+
+    export = add_command('export', "Export metadata of every file", run_export, DEFAULT_PROCESSES)
+    export.add_argument('--group', action='append',
+                        help=f"Only export this group ({', '.join(metadata.GROUP_MAPPINGS)} or a hex number); repeatable")
+    export.add_argument('-o', '--output',
+                        help="Write a .csv, .parquet or .arrow table instead of JSON lines")
+    export.add_argument('--tags', type=keyword_list, help="With --output: comma-separated keywords, one column each "
+                                       "(default: every element, one row per element)")
+
+    anonymize_command = add_command('anonymize', "Anonymize files into an output directory", run_anonymize,
+                                    anonymize.DEFAULT_WORKERS, "Output directory")
+    anonymize_command.add_argument('--prefix', required=True, help="Anonymization prefix")
+    anonymize_command.add_argument('--overwrite', action='store_true', help="Redo files that already have an output")
+
+    thumbnails_command = add_command('thumbnails', "Render first-frame PNG thumbnails", run_thumbnails,
+                                     DEFAULT_PROCESSES, "Output directory")
+    thumbnails_command.add_argument('--size', type=int, default=thumbnails.THUMBNAIL_SIZE,
+                                    help=f"Longest side in pixels (default: {thumbnails.THUMBNAIL_SIZE})")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s - %(levelname)s - %(message)s")
+    out = open(args.results, 'w') if args.results else sys.stdout
+    try:
+        failed = args.handler(args, out)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+import os
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pydicom
+
+# Header elements read while indexing a directory. Pixel data is never touched.
+HEADER_TAGS = [
+    'PatientName', 'PatientID', 'StudyInstanceUID', 'SeriesInstanceUID',
+    'SOPInstanceUID', 'InstanceNumber', 'Modality', 'StudyDescription',
+    'SeriesDescription', 'Rows', 'Columns', 'NumberOfFrames',
+    'ImagePositionPatient', 'ImageOrientationPatient', 'PixelSpacing',
+    'SliceThickness', 'AccessionNumber', 'StudyDate', 'BodyPartExamined',
+    'ProtocolName'
+]
+
+# Header elements with multiple values, stored as JSON text in the catalog.
+MULTI_VALUE_TAGS = {'ImagePositionPatient', 'ImageOrientationPatient', 'PixelSpacing'}
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+DEFAULT_BATCH_SIZE = 64
+
+
+def default_cache_dir(*parts):
+    """Return (and create) a directory under the viewer's local cache root."""
+    root = os.environ.get('DICOM_VIEWER_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.dicom_viewer')
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def common_root(file_paths):
+    """Return the deepest directory containing every path, so paths relative to it stay unique."""
+    directories = [os.path.dirname(os.path.abspath(path)) for path in file_paths]
+    return os.path.commonpath(directories) if directories else ''
+
+
+def mirrored_path(file_path, output_dir, root=None):
+    """Return file_path moved under output_dir, keeping its path relative to root (default: its own directory)."""
+    file_path = os.path.abspath(file_path)
+    return os.path.join(output_dir, os.path.relpath(file_path, root or os.path.dirname(file_path)))
+
+
+def touch_cache_file(path):
+    """Mark a cache file as just used, so prune_cache_dir removes it last."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_cache_dir(directory, max_bytes, suffix, target_bytes=None, keep=()):
+    """
+    Keep the cache files (ending in suffix) below directory within max_bytes.
+
+    Once they total more than max_bytes, the least recently used (oldest
+    modification time, see touch_cache_file) are deleted until at most
+    target_bytes (default max_bytes) remain. Paths in keep are never deleted.
+
+    :return: Total size in bytes of the files left.
+    """
+    entries = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(suffix):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Removed while we were walking
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return total
+
+    target = max_bytes if target_bytes is None else target_bytes
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue  # In use (e.g. mapped on Windows); try the next one
+        total -= size
+        removed += 1
+    logging.info(f"Pruned {removed} files from {directory}; {total / 1024 ** 2:.0f} MB left")
+    return total
+
+
+def find_dicom_files(directory):
+    """Return every .dcm file below directory, in walk order."""
+    return [
+        os.path.join(root, file)
+        for root, _, files in os.walk(directory)
+        for file in files if file.lower().endswith('.dcm')
+    ]
+
+
+def find_dicom_files_with_stat(directory):
+    """Return sorted (path, size, mtime_ns) tuples for every .dcm file below directory."""
+    found = []
+    pending = [directory]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError as e:
+            logging.warning(f"Cannot list directory: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.lower().endswith('.dcm'):
+                        stat = entry.stat()
+                        found.append((entry.path, stat.st_size, stat.st_mtime_ns))
+                except OSError as e:
+                    logging.warning(f"Cannot stat {entry.path}: {e}")
+    found.sort()
+    return found
+
+
+def _plain_value(value):
+    """Convert a pydicom value into a plain Python value."""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    if isinstance(value, (list, tuple, pydicom.multival.MultiValue)):
+        return [_plain_value(v) for v in value]
+    return str(value)
+
+
+def read_header_record(file_path):
+    """Read the indexed header elements of a single file into a record dict."""
+    record = {'path': file_path}
+    try:
+        dicom_data = pydicom.dcmread(
+            file_path, stop_before_pixels=True, specific_tags=HEADER_TAGS, force=True
+        )
+        for tag in HEADER_TAGS:
+            record[tag] = _plain_value(getattr(dicom_data, tag, None))
+        record['error'] = None
+    except Exception as e:
+        logging.warning(f"Failed to read header of {file_path}: {e}")
+        for tag in HEADER_TAGS:
+            record[tag] = None
+        record['error'] = str(e)
+    return record
+
+
+def scan_headers(file_paths, max_workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+                 should_stop=None):
+    """
+    Read headers of file_paths with a thread pool and yield them in batches.
+
+    Batches are yielded in the same order as file_paths.
+
+    :param file_paths: Files to read.
+    :param max_workers: Number of reader threads.
+    :param batch_size: Number of records per yielded batch.
+    :param should_stop: Optional callable; scanning stops early when it returns True.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batch = []
+        for record in executor.map(read_header_record, file_paths):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+                if should_stop is not None and should_stop():
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return
+        if batch:
+            yield batch
+
+
+class DicomCatalog:
+    """
+    Persistent SQLite catalog of indexed files.
+
+    Each row holds a file's path, size, mtime and the HEADER_TAGS values, so a
+    rescan only has to stat files and re-read headers that are new or changed.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(default_cache_dir(), 'catalog.sqlite')
+        with self._connect() as conn:
+            columns = ", ".join(f"{tag} TEXT" for tag in HEADER_TAGS)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, "
+                f"mtime_ns INTEGER, error TEXT, {columns})"
+            )
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+            missing = [tag for tag in HEADER_TAGS if tag not in existing]
+            if missing:
+                # Catalog from an older version: add the columns and re-read every file on its next scan
+                for tag in missing:
+                    conn.execute(f"ALTER TABLE files ADD COLUMN {tag} TEXT")
+                conn.execute("UPDATE files SET mtime_ns = NULL")
+            conn.execute("CREATE INDEX IF NOT EXISTS files_series ON files (SeriesInstanceUID)")
+            conn.execute("CREATE INDEX IF NOT EXISTS files_study ON files (StudyInstanceUID)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _prefix_range(directory):
+        """Return (low, high) bounds selecting every path below directory."""
+        root = os.path.join(os.path.abspath(directory), '')
+        return root, root[:-1] + chr(ord(os.sep) + 1)
+
+    @staticmethod
+    def _row_to_record(row):
+        record = {'path': row[0], 'error': row[3]}
+        for tag, value in zip(HEADER_TAGS, row[4:]):
+            if value is not None and tag in MULTI_VALUE_TAGS:
+                value = json.loads(value)
+            elif value is not None and tag in ('InstanceNumber', 'Rows', 'Columns', 'NumberOfFrames'):
+                value = int(value)
+            elif value is not None and tag == 'SliceThickness':
+                value = float(value)
+            record[tag] = value
+        return record
+
+    @staticmethod
+    def _record_to_row(record, size, mtime_ns):
+        values = []
+        for tag in HEADER_TAGS:
+            value = record.get(tag)
+            if value is not None and tag in MULTI_VALUE_TAGS:
+                value = json.dumps(value)
+            values.append(value)
+        return (record['path'], size, mtime_ns, record.get('error'), *values)
+
+    def scan(self, directory, max_workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+             should_stop=None, on_found=None):
+        """
+        Incrementally rescan directory and yield its records in batches, sorted by path.
+
+        Unchanged files (same size and mtime) come straight from the catalog;
+        only new or modified files have their headers read. Files that have
+        disappeared from disk are dropped from the catalog.
+
+        :param on_found: Optional callable receiving the total file count once the walk is done.
+        """
+        found = find_dicom_files_with_stat(os.path.abspath(directory))
+        if on_found is not None:
+            on_found(len(found))
+
+        low, high = self._prefix_range(directory)
+        conn = self._connect()
+        try:
+            cached = {
+                row[0]: row for row in conn.execute(
+                    "SELECT * FROM files WHERE path >= ? AND path < ?", (low, high)
+                )
+            }
+            stale = [
+                (path, size, mtime_ns) for path, size, mtime_ns in found
+                if path not in cached or cached[path][1] != size or cached[path][2] != mtime_ns
+            ]
+            removed = cached.keys() - {path for path, _, _ in found}
+            if removed:
+                conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+                conn.commit()
+            logging.info(f"Catalog: {len(found)} files, {len(stale)} new or changed, {len(removed)} removed")
+
+            stat_by_path = {path: (size, mtime_ns) for path, size, mtime_ns in stale}
+            fresh_records = self._scan_stale(conn, [path for path, _, _ in stale], stat_by_path,
+                                             max_workers, batch_size, should_stop)
+            batch = []
+            for path, _, _ in found:
+                if path in stat_by_path:
+                    record = next(fresh_records, None)
+                    if record is None:
+                        return  # Scan was stopped
+                else:
+                    record = self._row_to_record(cached[path])
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+                    if should_stop is not None and should_stop():
+                        return
+            if batch:
+                yield batch
+        finally:
+            conn.close()
+
+    def _scan_stale(self, conn, paths, stat_by_path, max_workers, batch_size, should_stop):
+        """Read headers of new or changed files, store them, and yield them one by one."""
+        for records in scan_headers(paths, max_workers=max_workers, batch_size=batch_size,
+                                    should_stop=should_stop):
+            conn.executemany(
+                f"INSERT OR REPLACE INTO files VALUES ({', '.join('?' * (len(HEADER_TAGS) + 4))})",
+                [self._record_to_row(r, *stat_by_path[r['path']]) for r in records]
+            )
+            conn.commit()
+            yield from records
+
+    def records(self, directory=None, **filters):
+        """
+        Return catalogued records, optionally limited to a directory and exact tag matches.
+
+        Example: ``catalog.records(SeriesInstanceUID=uid)``
+        """
+        clauses, params = [], []
+        if directory is not None:
+            clauses.append("path >= ? AND path < ?")
+            params.extend(self._prefix_range(directory))
+        for tag, value in filters.items():
+            if tag not in HEADER_TAGS:
+                raise ValueError(f"Unknown catalog column: {tag}")
+            clauses.append(f"{tag} = ?")
+            params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM files{where} ORDER BY path", params).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def series(self, directory=None):
+        """Return one summary dict per series: UID, description, modality and file count."""
+        where, params = "", []
+        if directory is not None:
+            where = " WHERE path >= ? AND path < ?"
+            params = list(self._prefix_range(directory))
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT SeriesInstanceUID, MAX(SeriesDescription), MAX(Modality), MAX(PatientID), "
+                f"COUNT(*) FROM files{where} GROUP BY SeriesInstanceUID", params
+            ).fetchall()
+        return [
+            {'SeriesInstanceUID': r[0], 'SeriesDescription': r[1], 'Modality': r[2],
+             'PatientID': r[3], 'files': r[4]}
+            for r in rows
+        ]
@@ -0,0 +1,290 @@
+import io
+import struct
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.encaps import encapsulate, get_frame, parse_fragments
+from pydicom.pixels import get_decoder
+
+import perf
+from volume import display_window
+
+DEFAULT_CACHE_FRAMES = 32
+
+# Photometric interpretations whose stored values are what pixel_array returns
+MAPPABLE_PHOTOMETRICS = {'MONOCHROME1', 'MONOCHROME2', 'RGB', 'PALETTE COLOR'}
+# VRs with a 2-byte reserved field and a 4-byte length in explicit VR encoding
+LONG_LENGTH_VRS = {b'OB', b'OW', b'OF', b'OD', b'OL', b'OV', b'UN'}
+
+# Pixel module elements a single frame needs to be decoded on its own
+PIXEL_MODULE_TAGS = [
+    'Rows', 'Columns', 'SamplesPerPixel', 'BitsAllocated', 'BitsStored', 'HighBit',
+    'PixelRepresentation', 'PhotometricInterpretation', 'PlanarConfiguration'
+]
+
+
+def frame_count(dicom_data):
+    return int(getattr(dicom_data, 'NumberOfFrames', 1) or 1)
+
+
+def _fragment_payload(buffer, position):
+    """Return the bytes of the fragment whose item tag starts at position."""
+    length = struct.unpack_from('<I', buffer, position + 4)[0]
+    return buffer[position + 8:position + 8 + length]
+
+
+class FrameAccessor:
+    """
+    Array-like view of a multi-frame dataset that decodes frames on demand.
+
+    ``frames[i]`` decodes only frame i and keeps the last few decoded frames
+    in a small LRU cache; slices stack the frames they cover. For
+    encapsulated (compressed) pixel data the fragments of every frame are
+    located once, from the Extended or Basic Offset Table or by scanning the
+    fragment items, so a frame is found without walking the ones before it.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, dicom_data, cache_frames=DEFAULT_CACHE_FRAMES):
+        self.dataset = dicom_data
+        self.count = frame_count(dicom_data)
+        self.transfer_syntax = dicom_data.file_meta.TransferSyntaxUID
+        self.decoder = get_decoder(self.transfer_syntax)
+        self.cache_frames = cache_frames
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._frame_fragments = None
+        if self.transfer_syntax.is_encapsulated:
+            self._frame_fragments = self._locate_frames(dicom_data.PixelData)
+
+        first = self[0]
+        self.frame_shape = first.shape
+        self.dtype = first.dtype
+
+    @property
+    def shape(self):
+        return (self.count,) + self.frame_shape
+
+    @property
+    def ndim(self):
+        return len(self.frame_shape) + 1
+
+    def __len__(self):
+        return self.count
+
+    def _locate_frames(self, buffer):
+        """Return, per frame, the positions of its fragments' item tags (None if they can't be told apart)."""
+        bot_length = struct.unpack_from('<I', buffer, 4)[0]
+        first = 8 + bot_length
+        stream = io.BytesIO(buffer)
+        stream.seek(first)
+        _, positions = parse_fragments(stream)
+
+        extended = getattr(self.dataset, 'ExtendedOffsetTable', None)
+        if extended:
+            offsets = np.frombuffer(extended, dtype='<u8')
+            return [[first + int(offset)] for offset in offsets]
+        if bot_length:
+            offsets = [first + offset for offset in struct.unpack_from(f'<{bot_length // 4}I', buffer, 8)]
+            bounds = offsets[1:] + [len(buffer)]
+            return [[p for p in positions if start <= p < end] for start, end in zip(offsets, bounds)]
+        if len(positions) == self.count:
+            return [[p] for p in positions]
+        if self.count == 1:
+            return [positions]
+        logging.info(f"No offset table and {len(positions)} fragments for {self.count} frames; "
+                     f"frames will be located by scanning")
+        return None
+
+    def _frame_bytes(self, index):
+        buffer = self.dataset.PixelData
+        if self._frame_fragments is None:
+            return get_frame(buffer, index, number_of_frames=self.count)
+        return b''.join(_fragment_payload(buffer, p) for p in self._frame_fragments[index])
+
+    def _decode(self, index):
+        if not self.transfer_syntax.is_encapsulated:
+            frame, _ = self.decoder.as_array(self.dataset, index=index)
+            return frame
+
+        # Decode the one frame as a single-frame dataset
+        frame_dataset = Dataset()
+        frame_dataset.file_meta = FileMetaDataset()
+        frame_dataset.file_meta.TransferSyntaxUID = self.transfer_syntax
+        for tag in PIXEL_MODULE_TAGS:
+            if tag in self.dataset:
+                setattr(frame_dataset, tag, self.dataset[tag].value)
+        frame_dataset.NumberOfFrames = 1
+        frame_dataset.PixelData = encapsulate([self._frame_bytes(index)])
+        frame, _ = self.decoder.as_array(frame_dataset, index=0)
+        return frame
+
+    def frame(self, index):
+        """Return frame index, decoding it if it is not cached."""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(f"Frame {index} out of range for {self.count} frames")
+        with self._lock:
+            cached = self._cache.get(index)
+            if cached is not None:
+                self._cache.move_to_end(index)
+                return cached
+        with perf.span('decode', frame=index):
+            frame = self._decode(index)
+        frame.flags.writeable = False  # Shared through the cache
+        with self._lock:
+            self._cache[index] = frame
+            while len(self._cache) > self.cache_frames:
+                self._cache.popitem(last=False)
+        return frame
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            first, rest = key[0], key[1:]
+            return self[first][(slice(None),) + rest if isinstance(first, slice) else rest]
+        if isinstance(key, slice):
+            indices = range(*key.indices(self.count))
+            stacked = np.empty((len(indices),) + self.frame_shape, dtype=self.dtype)
+            for i, index in enumerate(indices):
+                stacked[i] = self.frame(index)
+            return stacked
+        return self.frame(int(key))
+
+    def __array__(self, dtype=None, copy=None):
+        frames = self[:]
+        return frames if dtype is None else frames.astype(dtype)
+
+
+class WindowedFrames:
+    """Frames of a FrameAccessor or memory-mapped array mapped to uint8 through one shared (low, high) window."""
+
+    def __init__(self, frames, low, high):
+        self.frames = frames
+        self.low = low
+        self.high = high
+        self.dtype = np.dtype(np.uint8)
+
+    @property
+    def shape(self):
+        return self.frames.shape
+
+    @property
+    def ndim(self):
+        return self.frames.ndim
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _window(self, data):
+        scale = 255.0 / (self.high - self.low) if self.high > self.low else 0.0
+        windowed = (data.astype(np.float32) - self.low) * scale
+        return np.clip(windowed, 0, 255, out=windowed).astype(np.uint8)
+
+    def __getitem__(self, key):
+        return self._window(self.frames[key])
+
+    def __array__(self, dtype=None, copy=None):
+        frames = self[:]
+        return frames if dtype is None else frames.astype(dtype)
+
+
+def sample_window(frames, dicom_data=None, samples=8):
+    """
+    Return a (low, high) display window for frames without decoding all of them.
+
+    Uses the dataset's WindowCenter/WindowWidth when present, otherwise the
+    min/max of a few frames spread evenly through the file.
+    """
+    indices = np.unique(np.linspace(0, len(frames) - 1, min(samples, len(frames))).astype(int))
+    sampled = np.stack([frames[int(i)] for i in indices])
+    return display_window(sampled, dicom_data)
+
+
+def _pixel_value_position(fp, transfer_syntax):
+    """Return (offset, length) of the PixelData value whose element starts at fp's position, or None."""
+    start = fp.tell()
+    header = fp.read(12)
+    if len(header) < 12:
+        return None
+    endian = '<' if transfer_syntax.is_little_endian else '>'
+    if struct.unpack_from(f'{endian}HH', header) != (0x7FE0, 0x0010):
+        return None
+    if transfer_syntax.is_implicit_VR:
+        length, offset = struct.unpack_from(f'{endian}I', header, 4)[0], start + 8
+    elif header[4:6] in LONG_LENGTH_VRS:
+        length, offset = struct.unpack_from(f'{endian}I', header, 8)[0], start + 12
+    else:
+        length, offset = struct.unpack_from(f'{endian}H', header, 6)[0], start + 8
+    if length == 0xFFFFFFFF:
+        return None  # Undefined length: encapsulated
+    return offset, length
+
+
+def map_pixel_data(file_path, dicom_data, fp):
+    """
+    Return the uncompressed pixel data of a file as a read-only np.memmap, or None if it can't be mapped.
+
+    fp must be positioned at the PixelData element, as dcmread leaves it with
+    stop_before_pixels. The array has the shape and dtype pixel_array would
+    return; pages are read from the file only when a frame is touched.
+    Compressed, deflated, 1-bit, YBR and sign-packed data are not mapped.
+    """
+    transfer_syntax = getattr(getattr(dicom_data, 'file_meta', None), 'TransferSyntaxUID', None)
+    if (transfer_syntax is None or not transfer_syntax.is_transfer_syntax or transfer_syntax.is_encapsulated
+            or transfer_syntax.is_deflated):
+        return None
+    position = _pixel_value_position(fp, transfer_syntax)
+    if position is None:
+        return None
+    offset, length = position
+
+    try:
+        rows, columns = int(dicom_data.Rows), int(dicom_data.Columns)
+        bits_allocated = int(dicom_data.BitsAllocated)
+        bits_stored = int(getattr(dicom_data, 'BitsStored', bits_allocated))
+        signed = int(getattr(dicom_data, 'PixelRepresentation', 0)) == 1
+        samples = int(getattr(dicom_data, 'SamplesPerPixel', 1))
+        photometric = str(getattr(dicom_data, 'PhotometricInterpretation', 'MONOCHROME2')).strip()
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if bits_allocated not in (8, 16, 32) or photometric not in MAPPABLE_PHOTOMETRICS:
+        return None
+    if signed and bits_stored < bits_allocated:
+        return None  # Needs sign extension on every read
+
+    count = frame_count(dicom_data)
+    dtype = np.dtype(f"{'<' if transfer_syntax.is_little_endian else '>'}{'i' if signed else 'u'}{bits_allocated // 8}")
+    planar = samples > 1 and int(getattr(dicom_data, 'PlanarConfiguration', 0)) == 1
+    shape = (count, samples, rows, columns) if planar else (count, rows, columns, samples)
+    if length < int(np.prod(shape)) * dtype.itemsize:
+        logging.warning(f"PixelData of {file_path} is shorter than its pixel module describes")
+        return None
+
+    mapped = np.memmap(file_path, dtype=dtype, mode='r', offset=offset, shape=shape)
+    if planar:
+        mapped = mapped.transpose(0, 2, 3, 1)
+    if samples == 1:
+        mapped = mapped[..., 0]
+    return mapped if count > 1 else mapped[0]
+
+
+def read_mapped(file_path):
+    """
+    Read a file's header and memory-map its pixel data, without reading the pixels.
+
+    :return: The header dataset with the array as its mapped_pixels attribute,
+        or None if the pixel data can't be mapped.
+    """
+    with open(file_path, 'rb') as fp, perf.span('dcmread', path=file_path):
+        dicom_data = pydicom.dcmread(fp, stop_before_pixels=True)
+        mapped = map_pixel_data(file_path, dicom_data, fp)
+    if mapped is None:
+        return None
+    dicom_data.mapped_pixels = mapped
+    logging.debug(f"Memory-mapped pixel data of {file_path} {mapped.shape} {mapped.dtype}")
+    return dicom_data
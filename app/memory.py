@@ -0,0 +1,251 @@
+import os
+import mmap
+import logging
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+from dicom_index import default_cache_dir
+
+_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+FALLBACK_LIMIT = 4 * 1024 ** 3
+
+
+def parse_size(text):
+    """Parse a byte count such as '8G', '512M', '1.5G' or '1048576'."""
+    text = str(text).strip().upper().rstrip('B')
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def physical_memory():
+    """Return the machine's physical memory in bytes, or None where it can't be read."""
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_limit():
+    """DICOM_VIEWER_MEMORY_LIMIT if set, otherwise half the physical memory."""
+    configured = os.environ.get('DICOM_VIEWER_MEMORY_LIMIT')
+    if configured:
+        try:
+            return parse_size(configured)
+        except ValueError:
+            logging.warning(f"Ignoring invalid DICOM_VIEWER_MEMORY_LIMIT: {configured}")
+    total = physical_memory()
+    return total // 2 if total else FALLBACK_LIMIT
+
+
+def format_size(nbytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(nbytes) < 1024 or unit == 'GB':
+            return f"{nbytes:.0f} {unit}" if unit == 'B' else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+def _root(array):
+    """Return the array that owns the memory behind array (following views)."""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def resident_nbytes(array):
+    """Heap bytes behind an array; memory-mapped arrays hold none (their pages belong to the file cache)."""
+    if not isinstance(array, np.ndarray):
+        return 0
+    root = _root(array)
+    if isinstance(root, np.memmap) or isinstance(root.base, mmap.mmap):
+        return 0
+    return root.nbytes
+
+
+def scratch_array(shape, dtype):
+    """
+    Return a zeroed array backed by an anonymous temporary file instead of RAM.
+
+    The file is deleted by the OS once the array is garbage collected.
+    """
+    scratch_file = tempfile.TemporaryFile(dir=default_cache_dir('scratch'))
+    return np.memmap(scratch_file, dtype=dtype, mode='w+', shape=shape)
+
+
+class Reservation:
+    """
+    Memory held against the limit for an allocation that is not tracked yet.
+
+    A reservation is false when the allocation did not fit, and then holds
+    nothing. Once the allocated buffer is accounted for elsewhere, hand it to
+    track() or call release(); leaving a ``with`` block releases whatever is
+    still held.
+    """
+
+    def __init__(self, accountant, nbytes=0, granted=True):
+        self.accountant = accountant
+        self.nbytes = nbytes
+        self.granted = granted
+
+    def __bool__(self):
+        return self.granted
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def release(self):
+        self.accountant._release(self.nbytes)
+        self.nbytes = 0
+
+    def track(self, name, *arrays):
+        """Account for the allocated arrays under name and stop holding the reserved bytes."""
+        self.accountant.track(name, *arrays)
+        self.release()
+
+
+class MemoryAccountant:
+    """
+    Central account of the large buffers and caches held by the viewer, against one limit.
+
+    Buffers are tracked by name through weak references, so tracking never
+    keeps an array alive; arrays sharing memory are counted once and
+    memory-mapped arrays not at all. Caches report their own size and can be
+    asked to shrink. reserve() makes room for an allocation by shrinking
+    caches, cheapest first, and holds the room until the allocation is
+    tracked; when that is not enough, callers fall back to a downsampled or
+    memory-mapped representation instead of allocating.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit or default_limit()
+        self._buffers = {}  # name -> [(weak reference to the root array, nbytes)]
+        self._fixed = {}  # name -> nbytes, for buffers that are not arrays (e.g. pixmaps)
+        self._caches = []  # (priority, name, size function, shrink function)
+        self._reserved = 0  # Bytes held by outstanding reservations
+        self._lock = threading.Lock()
+        self._reserve_lock = threading.Lock()  # One reserve decision at a time, so two can't share the same room
+
+    def set_limit(self, limit):
+        self.limit = limit
+        self.enforce()
+
+    def track(self, name, *arrays):
+        """Account for the arrays now held under name, replacing what name held before."""
+        entries = []
+        for array in arrays:
+            nbytes = resident_nbytes(array)
+            if nbytes:
+                root = _root(array)
+                entries.append((weakref.ref(root), nbytes))
+        with self._lock:
+            if entries:
+                self._buffers[name] = entries
+            else:
+                self._buffers.pop(name, None)
+
+    def track_bytes(self, name, nbytes):
+        """Account for a non-array buffer (e.g. a pixmap) of nbytes under name."""
+        with self._lock:
+            if nbytes:
+                self._fixed[name] = nbytes
+            else:
+                self._fixed.pop(name, None)
+
+    def register_cache(self, name, size, shrink, priority=0):
+        """
+        Account for a cache that can give memory back.
+
+        :param size: Callable returning the cache's current size in bytes.
+        :param shrink: Callable asked to free at least the given number of bytes.
+        :param priority: Lower priorities are shrunk first.
+        """
+        with self._lock:
+            self._caches = [cache for cache in self._caches if cache[1] != name]
+            self._caches.append((priority, name, size, shrink))
+            self._caches.sort(key=lambda cache: cache[0])
+
+    def report(self):
+        """Return [(name, bytes)] of every tracked buffer and cache, largest first."""
+        seen = set()
+        usage = {}
+        with self._lock:
+            for name, entries in list(self._buffers.items()):
+                live = [(ref, nbytes) for ref, nbytes in entries if ref() is not None]
+                if not live:
+                    del self._buffers[name]
+                    continue
+                for ref, nbytes in live:
+                    if id(ref()) not in seen:  # Shared arrays count once, under the first name
+                        seen.add(id(ref()))
+                        usage[name] = usage.get(name, 0) + nbytes
+            usage.update(self._fixed)
+            usage['pending allocations'] = self._reserved
+            caches = list(self._caches)
+        for _, name, size, _ in caches:
+            try:
+                usage[name] = size()
+            except Exception as e:
+                logging.warning(f"Could not size cache {name}: {e}")
+        return sorted(((name, nbytes) for name, nbytes in usage.items() if nbytes), key=lambda item: -item[1])
+
+    def usage(self):
+        return sum(nbytes for _, nbytes in self.report())
+
+    def available(self):
+        return max(0, self.limit - self.usage())
+
+    def _make_room(self, nbytes, evict=True):
+        """Shrink caches, cheapest first, until nbytes more fit; return whether they do."""
+        over = self.usage() + nbytes - self.limit
+        if over <= 0:
+            return True
+        if not evict:
+            return False
+        with self._lock:
+            caches = list(self._caches)
+        for _, name, _, shrink in caches:
+            try:
+                shrink(over)
+            except Exception as e:
+                logging.warning(f"Could not shrink cache {name}: {e}")
+            over = self.usage() + nbytes - self.limit
+            if over <= 0:
+                return True
+        return False
+
+    def reserve(self, nbytes, purpose='allocation', evict=True):
+        """
+        Make room for an allocation of nbytes, shrinking caches if needed, and hold it.
+
+        :param evict: False only takes room that is free, never shrinking caches
+            (for speculative work such as prefetching).
+        :return: A Reservation holding nbytes, or a false one if they do not fit.
+        """
+        with self._reserve_lock:
+            if self._make_room(nbytes, evict):
+                with self._lock:
+                    self._reserved += nbytes
+                return Reservation(self, nbytes)
+        if evict:
+            logging.warning(f"Memory limit {format_size(self.limit)} reached: {purpose} of "
+                            f"{format_size(nbytes)} does not fit ({format_size(self.usage())} in use)")
+        return Reservation(self, granted=False)
+
+    def _release(self, nbytes):
+        with self._lock:
+            self._reserved -= nbytes
+
+    def enforce(self):
+        """Shrink caches until usage is back under the limit, where possible."""
+        with self._reserve_lock:
+            return self._make_room(0)
+
+
+accountant = MemoryAccountant()
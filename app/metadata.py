@@ -0,0 +1,261 @@
+import os
+import bisect
+import logging
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pydicom
+from pydicom.datadict import dictionary_VR, keyword_for_tag
+from pydicom.filereader import read_partial
+from pydicom.tag import Tag
+
+# Limits for value text shown in the metadata view
+MAX_VALUE_LENGTH = 256
+MAX_LISTED_VALUES = 32
+BINARY_VRS = ("OB", "OW", "OF", "OD", "OL", "OV")
+
+# Predefined groups mapping
+GROUP_MAPPINGS = {
+    'Patient': 0x0010,
+    'Study': 0x0008,
+    'Series': 0x0020,
+    'Image': 0x0028,
+    'Equipment': 0x0018,
+    'Modality': 0x0008,  # Modality is typically in Study group
+    'Physician': 0x0032  # Physician information
+}
+
+
+def element_text(elem):
+    """Return the display text of an element; sequences and binary values are summarised."""
+    if elem.VR == "SQ":
+        count = len(elem.value)
+        return f"Sequence of {count} item{'s' if count != 1 else ''}"
+    if elem.VR == "UN":
+        return "Unknown"
+    if elem.VR in BINARY_VRS:
+        return f"Binary data of length {len(elem.value) if elem.value is not None else 0}"
+    return str(elem.value)
+
+
+def element_label(elem):
+    """Return an element's keyword, or its (gggg,eeee) tag when it has none (e.g. private tags)."""
+    return elem.keyword or f"({elem.tag.group:04X},{elem.tag.element:04X})"
+
+
+def tag_label(tag):
+    """Return element_label for a tag without looking up (and so reading) the element itself."""
+    tag = Tag(tag)
+    return keyword_for_tag(tag) or f"({tag.group:04X},{tag.element:04X})"
+
+
+def has_unread_value(dataset, tag):
+    """
+    Whether an element's value is binary or still deferred on disk, decided
+    without reading it. Such values are summarised in the view, not searched.
+    """
+    elem = dataset.get_item(tag, keep_deferred=True)
+    if elem.value is None and getattr(elem, 'length', 0):
+        return True  # Deferred: reading it would load e.g. the whole PixelData
+    vr = elem.VR
+    if vr is None:
+        try:
+            vr = dictionary_VR(tag)
+        except KeyError:
+            return False
+    return vr in BINARY_VRS
+
+
+def format_value(elem, max_length=MAX_VALUE_LENGTH):
+    """
+    Return display text for an element, formatting no more than needed.
+
+    Long multi-valued elements list only their first values and any text is
+    cut to max_length characters.
+    """
+    value = elem.value
+    if elem.VR != "SQ" and isinstance(value, pydicom.multival.MultiValue) and len(value) > MAX_LISTED_VALUES:
+        shown = ", ".join(str(v) for v in value[:MAX_LISTED_VALUES])
+        text = f"[{shown}, ...] ({len(value)} values)"
+    else:
+        text = element_text(elem)
+    return text if len(text) <= max_length else f"{text[:max_length]}..."
+
+
+def metadata_items(dicom_data):
+    """Return (keyword, value text) pairs for every named element of a dataset."""
+    return [(tag, str(getattr(dicom_data, tag, 'N/A'))) for tag in dicom_data.dir()]
+
+
+def parse_group(text):
+    """Parse a group number written in hexadecimal as in DICOM notation, e.g. '0010' or '0x0010'."""
+    group = int(text.strip(), 16)
+    if not 0 <= group <= 0xFFFF:
+        raise ValueError(f"Invalid group: {text}")
+    return group
+
+
+def parse_tag(text):
+    """Parse a tag written as 'ggggeeee', 'gggg,eeee' or '(gggg,eeee)' (hexadecimal)."""
+    digits = text.strip().strip('()').replace(',', '').replace(' ', '')
+    if len(digits) != 8:
+        raise ValueError(f"Invalid tag: {text}")
+    return Tag(int(digits, 16))
+
+
+def group_number_for(group):
+    """Return the group number for a GROUP_MAPPINGS name, a number or a hexadecimal string."""
+    if isinstance(group, str) and group in GROUP_MAPPINGS:
+        return GROUP_MAPPINGS[group]
+    if isinstance(group, (int, str)):
+        # If it's already a number or hex string, convert to int
+        return int(str(group), 16) if isinstance(group, str) else group
+    raise ValueError(f"Invalid group identifier: {group}")
+
+
+class GroupIndex:
+    """
+    Group and tag lookups over one dataset, built once from its sorted tags.
+
+    Elements are only looked up (and their values parsed) when a query
+    returns them, so repeated group views do not walk the whole dataset.
+    """
+
+    def __init__(self, dicom_data):
+        self.dataset = dicom_data
+        self.tags = sorted(dicom_data.keys())
+        self._groups = {}
+        for position, tag in enumerate(self.tags):
+            start, _ = self._groups.get(tag.group, (position, position))
+            self._groups[tag.group] = (start, position + 1)
+
+    def groups(self):
+        return sorted(self._groups)
+
+    def elements(self, group):
+        """Return the elements of one group, in tag order."""
+        start, end = self._groups.get(group, (0, 0))
+        return [self.dataset[tag] for tag in self.tags[start:end]]
+
+    def tag_range(self, first, last):
+        """Return the elements with first <= tag <= last, in tag order."""
+        start = bisect.bisect_left(self.tags, Tag(first))
+        end = bisect.bisect_right(self.tags, Tag(last))
+        return [self.dataset[tag] for tag in self.tags[start:end]]
+
+    def private_creators(self):
+        """Return {(group, block): creator} for every private creator element."""
+        creators = {}
+        for group in self._groups:
+            if group % 2 == 1:
+                for elem in self.tag_range((group << 16) | 0x0010, (group << 16) | 0x00FF):
+                    creators[(group, elem.tag.element)] = str(elem.value).strip()
+        return creators
+
+    def private_elements(self, creator):
+        """Return the private elements reserved by a creator (e.g. 'SIEMENS CSA HEADER')."""
+        elements = []
+        for (group, block), name in sorted(self.private_creators().items()):
+            if name == creator:
+                elements.extend(self.tag_range((group << 16) | (block << 8), (group << 16) | (block << 8) | 0xFF))
+        return elements
+
+
+def describe_elements(elements):
+    """Return {element name: value text} for group views."""
+    described = {}
+    for elem in elements:
+        try:
+            # Get element name if available, otherwise use tag string
+            name = elem.name if hasattr(elem, 'name') else f"({elem.tag.group:04x},{elem.tag.element:04x})"
+            if elem.tag.is_private:
+                name = f"({elem.tag.group:04x},{elem.tag.element:04x}) {name}"  # Private names repeat
+
+            # Handle different types of values
+            if elem.VR == "SQ":
+                value = "Sequence"
+            elif elem.VR == "UN":
+                value = "Unknown"
+            elif elem.VR in ["OB", "OW"]:
+                value = f"Binary data of length {len(elem.value)}"
+            else:
+                value = elem.value
+
+            described[name] = str(value)
+        except Exception as e:
+            logging.warning(f"Error processing element {elem.tag}: {str(e)}")
+            described[f"Tag-{elem.tag}"] = "Error reading value"
+    return described
+
+
+def get_group_elements(group, dicom_data, index=None):
+    """
+    Return {element name: value text} for the elements of one group.
+
+    :param group: A name from GROUP_MAPPINGS, a group number or a hexadecimal string.
+    :param index: The dataset's GroupIndex, when one has already been built.
+    """
+    elements = {}
+
+    try:
+        try:
+            group_number = group_number_for(group)
+        except ValueError as e:
+            logging.error(str(e))
+            return elements
+
+        index = index or GroupIndex(dicom_data)
+        elements = describe_elements(index.elements(group_number))
+
+        # Add some helpful derived information for certain groups
+        if isinstance(group, str):
+            if group == 'Patient':
+                if 'PatientAge' not in elements and 'PatientBirthDate' in elements:
+                    try:
+                        birth_date = datetime.strptime(elements['PatientBirthDate'], "%Y%m%d")
+                        study_date = datetime.strptime(getattr(dicom_data, 'StudyDate', '19700101'), "%Y%m%d")
+                        age = study_date.year - birth_date.year
+                        elements['Calculated PatientAge'] = f"{age}Y"
+                    except:
+                        pass
+            elif group == 'Image':
+                if 'PixelSpacing' in elements:
+                    elements['Image Size'] = f"{dicom_data.Rows}x{dicom_data.Columns} pixels"
+                    try:
+                        spacing = dicom_data.PixelSpacing
+                        elements['Pixel Spacing'] = f"{spacing[0]}mm x {spacing[1]}mm"
+                    except:
+                        pass
+
+    except Exception as e:
+        logging.error(f"Error processing group {group}: {str(e)}")
+        return {'Error': f"Failed to process group: {str(e)}"}
+
+    return elements
+
+
+def _read_group(file_path, group):
+    """Read one file's header only as far as a group and return its group elements."""
+    group_number = group_number_for(group)
+    try:
+        with open(file_path, 'rb') as f:
+            # Derived Patient info needs StudyDate, which comes earlier, so stopping after the group is enough
+            dicom_data = read_partial(f, stop_when=lambda tag, vr, length: tag.group > group_number, force=True)
+        return file_path, get_group_elements(group, dicom_data)
+    except Exception as e:
+        return file_path, {'Error': f"Failed to read file: {e}"}
+
+
+def group_elements_across_files(file_paths, group, max_workers=None):
+    """
+    Yield (path, {element name: value text}) for one group in every file, in file order.
+
+    Each header is parsed in a process pool only up to the end of the group.
+    """
+    max_workers = max_workers or max(1, os.cpu_count() or 1)
+    chunksize = max(1, len(file_paths) // (max_workers * 4))
+    # Spawned workers do not inherit the GUI's threads and locks
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        yield from executor.map(_read_group, file_paths, [group] * len(file_paths), chunksize=chunksize)
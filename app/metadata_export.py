@@ -0,0 +1,148 @@
+import os
+import csv
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pydicom
+from pydicom.datadict import tag_for_keyword
+
+from metadata import element_text
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Parquet/Arrow output is optional
+    pyarrow = None
+
+DEFAULT_WORKERS = max(1, os.cpu_count() or 1)
+DEFAULT_CHUNK_SIZE = 1000
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+# Columns of the long (one row per element) format used when no tags are chosen
+LONG_COLUMNS = ['path', 'tag', 'keyword', 'value']
+
+
+def format_for_path(path):
+    """Return 'csv', 'parquet' or 'arrow' for an output file name, by extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported export format: {extension or path}")
+    return FORMATS[extension]
+
+
+def unknown_keywords(tags):
+    """Return the tags that are not DICOM keywords (keywords are case-sensitive, e.g. 'PatientID')."""
+    return [tag for tag in tags if tag_for_keyword(tag) is None]
+
+
+def read_rows(file_path, tags=None):
+    """
+    Read the header of one file into export rows.
+
+    With tags, returns one wide row [path, value per tag, error] ('' for missing tags).
+    Without, returns one long row [path, tag, keyword, value] per element.
+    """
+    try:
+        dicom_data = pydicom.dcmread(file_path, stop_before_pixels=True, force=True,
+                                     specific_tags=list(tags) if tags else None)
+    except Exception as e:
+        logging.warning(f"Failed to read header of {file_path}: {e}")
+        return [[file_path] + [''] * len(tags) + [f"Error: {e}"]] if tags else [[file_path, '', '', f"Error: {e}"]]
+
+    if tags:
+        return [[file_path] + [element_text(dicom_data[tag]) if tag in dicom_data else '' for tag in tags] + ['']]
+    return [
+        [file_path, f"({elem.tag.group:04X},{elem.tag.element:04X})", elem.keyword, element_text(elem)]
+        for elem in dicom_data
+    ]
+
+
+class CsvRowWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowRowWriter:
+    """Writes rows as string columns to Parquet or an Arrow IPC file, one record batch per chunk."""
+
+    def __init__(self, path, columns, file_format):
+        if pyarrow is None:
+            raise RuntimeError("Parquet and Arrow export need the pyarrow package")
+        self.columns = columns
+        self.schema = pyarrow.schema([(column, pyarrow.string()) for column in columns])
+        if file_format == 'parquet':
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        arrays = [pyarrow.array(list(values), type=pyarrow.string()) for values in zip(*rows)]
+        batch = pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if isinstance(self.writer, pyarrow.parquet.ParquetWriter):
+            self.writer.write_batch(batch)
+        else:
+            self.writer.write(batch)
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path, columns, file_format=None):
+    file_format = file_format or format_for_path(path)
+    if file_format == 'csv':
+        return CsvRowWriter(path, columns)
+    return ArrowRowWriter(path, columns, file_format)
+
+
+def export_metadata(file_paths, output_path, tags=None, file_format=None, max_workers=DEFAULT_WORKERS,
+                    chunk_size=DEFAULT_CHUNK_SIZE, should_stop=None, on_progress=None):
+    """
+    Export the header metadata of many files to a CSV, Parquet or Arrow file.
+
+    Headers are read in a process pool one chunk of files at a time, and each
+    chunk's rows are written before the next is read, so memory use depends on
+    chunk_size rather than on the number of files.
+
+    :param tags: Keywords to export as one column each (one row per file, plus
+        an error column); None exports every element in long format (one row per element).
+    :param file_format: 'csv', 'parquet' or 'arrow'; defaults to the output extension.
+    :param on_progress: Optional callable receiving the number of files done so far.
+    :return: Number of files exported.
+    """
+    tags = list(tags) if tags else None
+    if tags and unknown_keywords(tags):
+        raise ValueError(f"Unknown DICOM keywords: {', '.join(unknown_keywords(tags))}")
+    columns = ['path'] + tags + ['error'] if tags else LONG_COLUMNS
+    writer = open_writer(output_path, columns, file_format)
+    done = 0
+    try:
+        # Spawned workers do not inherit the GUI's threads and locks
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            for start in range(0, len(file_paths), chunk_size):
+                if should_stop is not None and should_stop():
+                    break
+                chunk = file_paths[start:start + chunk_size]
+                rows = []
+                for file_rows in executor.map(read_rows, chunk, [tags] * len(chunk),
+                                              chunksize=max(1, len(chunk) // (max_workers * 4))):
+                    rows.extend(file_rows)
+                writer.write(rows)
+                done += len(chunk)
+                if on_progress is not None:
+                    on_progress(done)
+    finally:
+        writer.close()
+    logging.info(f"Exported metadata of {done} files to {output_path}")
+    return done
@@ -0,0 +1,193 @@
+import logging
+import threading
+
+import numpy as np
+
+import perf
+import memory
+
+ORIENTATIONS = ('axial', 'coronal', 'sagittal')
+# Coarsest reformat built under memory pressure; anything coarser is no longer readable
+MAX_DOWNSAMPLE = 4
+
+
+def _first_item(sequence):
+    return sequence[0] if sequence else None
+
+
+def dataset_spacing(dicom_data):
+    """Return (slice, row, column) spacing in mm of a multi-frame dataset, defaulting to 1 mm."""
+    pixel_spacing = getattr(dicom_data, 'PixelSpacing', None)
+    slice_spacing = getattr(dicom_data, 'SpacingBetweenSlices', None) or getattr(dicom_data, 'SliceThickness', None)
+
+    # Enhanced multi-frame objects keep spacing in the shared functional groups
+    shared = _first_item(getattr(dicom_data, 'SharedFunctionalGroupsSequence', None))
+    measures = _first_item(getattr(shared, 'PixelMeasuresSequence', None)) if shared is not None else None
+    if measures is not None:
+        pixel_spacing = pixel_spacing or getattr(measures, 'PixelSpacing', None)
+        slice_spacing = (slice_spacing or getattr(measures, 'SpacingBetweenSlices', None)
+                         or getattr(measures, 'SliceThickness', None))
+
+    row_spacing, col_spacing = (float(pixel_spacing[0]), float(pixel_spacing[1])) if pixel_spacing else (1.0, 1.0)
+    return (float(slice_spacing or 1.0), row_spacing or 1.0, col_spacing or 1.0)
+
+
+def resample_axis(data, axis, new_length):
+    """Linearly resample data along one axis to new_length samples (same dtype)."""
+    old_length = data.shape[axis]
+    if new_length == old_length:
+        return data
+    positions = np.linspace(0, old_length - 1, new_length, dtype=np.float32)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, old_length - 1)
+    shape = [1] * data.ndim
+    shape[axis] = new_length
+    weight = (positions - lower).reshape(shape)
+    low_values = np.take(data, lower, axis=axis).astype(np.float32)
+    high_values = np.take(data, upper, axis=axis).astype(np.float32)
+    resampled = low_values + (high_values - low_values) * weight
+    if np.issubdtype(data.dtype, np.integer):
+        resampled = np.rint(resampled)
+    return resampled.astype(data.dtype)
+
+
+def trilinear_sample(volume, coords):
+    """
+    Sample volume at fractional voxel coordinates.
+
+    :param coords: Array of shape (3, ...) with (slice, row, column) indices.
+    :return: Samples with shape coords.shape[1:]; points outside the volume are 0.
+    """
+    limits = np.array(volume.shape, dtype=np.float32).reshape((3,) + (1,) * (coords.ndim - 1))
+    inside = np.all((coords >= 0) & (coords <= limits - 1), axis=0)
+    base = np.floor(coords).astype(np.intp)
+    frac = (coords - base).astype(np.float32)
+    result = np.zeros(coords.shape[1:], dtype=np.float32)
+    for dz in (0, 1):
+        z = np.clip(base[0] + dz, 0, volume.shape[0] - 1)
+        wz = frac[0] if dz else 1 - frac[0]
+        for dy in (0, 1):
+            y = np.clip(base[1] + dy, 0, volume.shape[1] - 1)
+            wy = frac[1] if dy else 1 - frac[1]
+            for dx in (0, 1):
+                x = np.clip(base[2] + dx, 0, volume.shape[2] - 1)
+                wx = frac[2] if dx else 1 - frac[2]
+                result += volume[z, y, x] * (wz * wy * wx)
+    result[~inside] = 0
+    return result
+
+
+class MPREngine:
+    """
+    Multi-planar reformatting of a (slice, row, column) volume.
+
+    Coronal and sagittal stacks are built once as contiguous arrays, with the
+    slice axis resampled so that pixels are square in millimetres, and cached
+    per orientation. Oblique planes are sampled on demand with trilinear
+    interpolation.
+    """
+
+    def __init__(self, volume, spacing=(1.0, 1.0, 1.0), chunk=8):
+        self.volume = volume
+        self.spacing = tuple(float(s) for s in spacing)
+        self.chunk = chunk
+        self._reformats = {'axial': volume}
+        self._lock = threading.Lock()
+
+    def cached(self, orientation):
+        with self._lock:
+            return self._reformats.get(orientation)
+
+    def reformats_nbytes(self):
+        """Memory held by the cached coronal and sagittal stacks."""
+        with self._lock:
+            return sum(memory.resident_nbytes(stack) for name, stack in self._reformats.items() if name != 'axial')
+
+    def drop_reformats(self, nbytes=None):
+        """Forget the cached coronal and sagittal stacks; they are rebuilt when next shown."""
+        with self._lock:
+            self._reformats = {'axial': self.volume}
+
+    def reformat(self, orientation, should_stop=None):
+        """Return the contiguous, aspect-corrected stack for orientation, building it if needed."""
+        if orientation not in ORIENTATIONS:
+            raise ValueError(f"Unknown orientation: {orientation}")
+        existing = self.cached(orientation)
+        if existing is not None:
+            return existing
+
+        slice_spacing, row_spacing, col_spacing = self.spacing
+        depth, rows, cols = self.volume.shape
+        if orientation == 'coronal':
+            # Slices along rows; each image is (slice, column)
+            stack_axis, in_plane_spacing, image_width = 1, col_spacing, cols
+        else:
+            # Sagittal: slices along columns; each image is (slice, row)
+            stack_axis, in_plane_spacing, image_width = 2, row_spacing, rows
+        image_height = max(1, int(round(depth * slice_spacing / in_plane_spacing)))
+        count = self.volume.shape[stack_axis]
+
+        # Downsample the stack in every direction when it does not fit in the memory limit
+        nbytes = count * image_height * image_width * np.dtype(self.volume.dtype).itemsize
+        step = 1
+        reservation = memory.accountant.reserve(nbytes, f"{orientation} reformat")
+        if not reservation:
+            step = int(np.ceil((nbytes / max(memory.accountant.available(), 1)) ** (1 / 3)))
+            step = max(1, min(step, MAX_DOWNSAMPLE))
+            logging.info(f"Building {orientation} reformat at 1/{step} resolution to stay within the memory limit")
+            reservation = memory.accountant.reserve(-(-nbytes // step ** 3), f"{orientation} reformat")
+        count, image_height, image_width = -(-count // step), max(1, image_height // step), -(-image_width // step)
+
+        with reservation:  # Held until the reformat cache accounts for the result
+            result = np.empty((count, image_height, image_width), dtype=self.volume.dtype)
+            with perf.span('reformat', orientation=orientation):
+                for start in range(0, count, self.chunk):
+                    if should_stop is not None and should_stop():
+                        raise InterruptedError("Reformat cancelled")
+                    stop = min(start + self.chunk, count)
+                    first, last = start * step, (stop - 1) * step + 1
+                    if stack_axis == 1:
+                        block = np.transpose(self.volume[:, first:last:step, ::step], (1, 0, 2))
+                    else:
+                        block = np.transpose(self.volume[:, ::step, first:last:step], (2, 0, 1))
+                    result[start:stop] = resample_axis(block, 1, image_height)
+
+            logging.info(f"Built {orientation} reformat {result.shape}")
+            with self._lock:
+                self._reformats[orientation] = result
+        return result
+
+    def oblique(self, angle_x=0.0, angle_y=0.0, offset=0.0, size=None):
+        """
+        Sample a plane through the volume centre, tilted from axial.
+
+        :param angle_x: Rotation about the left-right (column) axis, in degrees.
+        :param angle_y: Rotation about the anterior-posterior (row) axis, in degrees.
+        :param offset: Shift of the plane along its normal, in mm.
+        :param size: (height, width) of the output; defaults to the axial size.
+        :return: 2D image with square pixels of the finest in-plane spacing.
+        """
+        _, row_spacing, col_spacing = self.spacing
+        step = min(row_spacing, col_spacing)
+        height, width = size or self.volume.shape[1:]
+
+        ax, ay = np.radians(angle_x), np.radians(angle_y)
+        # Plane axes in (z, y, x) millimetres: start axial and rotate
+        rotate_x = np.array([[np.cos(ax), -np.sin(ax), 0], [np.sin(ax), np.cos(ax), 0], [0, 0, 1]])
+        rotate_y = np.array([[np.cos(ay), 0, -np.sin(ay)], [0, 1, 0], [np.sin(ay), 0, np.cos(ay)]])
+        rotation = rotate_y @ rotate_x
+        row_axis = rotation @ np.array([0.0, 1.0, 0.0])
+        col_axis = rotation @ np.array([0.0, 0.0, 1.0])
+        normal = rotation @ np.array([1.0, 0.0, 0.0])
+
+        spacing = np.array(self.spacing).reshape(3, 1, 1)
+        centre = (np.array(self.volume.shape) - 1) / 2 * np.array(self.spacing) + normal * offset
+        rows = (np.arange(height, dtype=np.float32) - (height - 1) / 2) * step
+        cols = (np.arange(width, dtype=np.float32) - (width - 1) / 2) * step
+        points = (centre.reshape(3, 1, 1)
+                  + row_axis.reshape(3, 1, 1) * rows.reshape(1, -1, 1)
+                  + col_axis.reshape(3, 1, 1) * cols.reshape(1, 1, -1))
+        samples = trilinear_sample(self.volume, (points / spacing).astype(np.float32))
+        if np.issubdtype(self.volume.dtype, np.integer):
+            samples = np.rint(samples)
+        return samples.astype(self.volume.dtype)
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from collections import deque
+
+# Spans kept for trace export; older ones are dropped first
+MAX_EVENTS = 200000
+# Frames (and their stage times) averaged in the overlay summary
+SUMMARY_FRAMES = 60
+
+logger = logging.getLogger('perf')
+
+
+class _NullSpan:
+    """Span returned while tracing is off: entering and leaving it does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+class Tracer:
+    """
+    Collects timing spans of the viewer's pipeline stages, from any thread.
+
+    While disabled, span() returns a shared no-op context manager, so
+    instrumented code costs one attribute check. While enabled, each span is
+    kept for Chrome trace export, added to the per-stage times shown by the
+    overlay and, when the 'perf' logger is at DEBUG, logged as a record with
+    perf_span and duration_ms attributes.
+    """
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.events = deque(maxlen=max_events)  # (name, start_ns, end_ns, thread id, args)
+        self._stage_times = {}  # name -> deque of recent durations in ms
+        self._frame_times = deque(maxlen=SUMMARY_FRAMES + 1)
+        self._thread_names = {}
+        self._lock = threading.Lock()
+        self.origin_ns = time.perf_counter_ns()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+            self._stage_times.clear()
+            self._frame_times.clear()
+
+    def span(self, name, **args):
+        """Return a context manager timing one stage, e.g. ``with perf.span('decode', frame=3):``."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def record(self, name, start_ns, end_ns, args=None):
+        thread = threading.current_thread()
+        duration_ms = (end_ns - start_ns) / 1e6
+        with self._lock:
+            self.events.append((name, start_ns, end_ns, thread.ident, args))
+            self._thread_names[thread.ident] = thread.name
+            times = self._stage_times.get(name)
+            if times is None:
+                times = self._stage_times[name] = deque(maxlen=SUMMARY_FRAMES)
+            times.append(duration_ms)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{name} took {duration_ms:.3f} ms",
+                         extra={'perf_span': name, 'duration_ms': duration_ms, 'perf_args': args or {}})
+
+    def frame_done(self):
+        """Mark that a frame reached the screen; the overlay's fps counts these."""
+        if self.enabled:
+            with self._lock:
+                self._frame_times.append(time.perf_counter())
+
+    def fps(self, window=1.0):
+        """Return the rate of frame_done() calls over the last window seconds."""
+        now = time.perf_counter()
+        with self._lock:
+            frame_times = [t for t in self._frame_times if now - t <= window]
+        if len(frame_times) < 2 or frame_times[-1] <= frame_times[0]:
+            return 0.0
+        return (len(frame_times) - 1) / (frame_times[-1] - frame_times[0])
+
+    def summary(self):
+        """Return {stage: (last ms, mean ms)} over the most recent spans of each stage."""
+        with self._lock:
+            return {name: (times[-1], sum(times) / len(times)) for name, times in self._stage_times.items() if times}
+
+    def chrome_trace(self):
+        """Return the recorded spans as a Chrome trace-event document (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            thread_names = dict(self._thread_names)
+        trace_events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in thread_names.items()
+        ]
+        for name, start_ns, end_ns, tid, args in events:
+            trace_events.append({
+                'name': name, 'cat': 'viewer', 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': (start_ns - self.origin_ns) / 1000, 'dur': (end_ns - start_ns) / 1000,
+                'args': {key: str(value) for key, value in (args or {}).items()},
+            })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        logging.info(f"Wrote {len(self.events)} trace events to {path}")
+
+
+tracer = Tracer()
+tracer.enable(os.environ.get('DICOM_VIEWER_PERF', '') not in ('', '0'))
+if os.environ.get('DICOM_VIEWER_PERF_LOG', '') not in ('', '0'):
+    logger.setLevel(logging.DEBUG)
+
+span = tracer.span
+frame_done = tracer.frame_done
+
+
+def traced(name):
+    """Decorator timing every call of a function as a span called name."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,155 @@
+import logging
+import threading
+
+import numpy as np
+
+
+class LutRenderer:
+    """
+    Renders brightness/contrast adjustments of one image through a lookup table.
+
+    The image statistics are computed once. Each slider change only rebuilds a
+    table with one entry per possible stored value (256 for uint8, up to 65536
+    for 16-bit data) and applies it with a single indexed gather.
+
+    uint8 images are used as-is (0..255); 16-bit images are stretched from
+    their min/max to 0..255 inside the table, so they never need a float copy.
+    """
+
+    def __init__(self, image):
+        image = np.ascontiguousarray(image)
+        if image.dtype == np.uint8:
+            values = np.arange(256)
+            low, high = 0, 255
+        elif image.dtype == np.uint16:
+            low, high = int(image.min()), int(image.max())
+            values = np.arange(high + 1)
+        elif image.dtype == np.int16:
+            low, high = int(image.min()), int(image.max())
+            # Entries in raw bit-pattern order; widened so value - low cannot wrap
+            values = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+        else:
+            raise TypeError(f"Lookup-table rendering needs 8 or 16-bit integer data, got {image.dtype}")
+
+        self.pyramid = ImagePyramid(image)
+        self.height, self.width = image.shape
+        scale = 255.0 / (high - low) if high > low else 0.0
+        self.normalized_values = ((values - low) * scale).astype(np.float32)
+        # Mean of the normalized image, derived once from the raw mean
+        self.mean = float((image.mean(dtype=np.float64) - low) * scale)
+        self._lut_key = None
+        self._lut = None
+
+    @property
+    def index(self):
+        return self._index_view(self.pyramid.level(0))
+
+    @staticmethod
+    def _index_view(image):
+        # Index int16 data by its raw bit pattern so negative values need no offsetting pass
+        return image.view(np.uint16) if image.dtype == np.int16 else image
+
+    @staticmethod
+    def supports(image):
+        return image.dtype in (np.uint8, np.uint16, np.int16)
+
+    def lut(self, contrast, brightness):
+        """Return the uint8 table for a contrast factor and brightness offset."""
+        key = (contrast, brightness)
+        if key != self._lut_key:
+            table = self.mean + contrast * (self.normalized_values - self.mean) + brightness
+            self._lut = np.clip(table, 0, 255).astype(np.uint8)
+            self._lut_key = key
+        return self._lut
+
+    def render(self, contrast, brightness, region=None, level=0):
+        """
+        Apply the table to a pyramid level, or only to a (row_slice, col_slice) region of it.
+
+        Every level shares the same table, so brightness stays consistent across zoom levels.
+        """
+        index = self._index_view(self.pyramid.level(level))
+        if region is not None:
+            index = index[region]
+        return np.take(self.lut(contrast, brightness), index)
+
+
+def downsample_block_mean(image, factor, rows_per_chunk=256):
+    """
+    Shrink a 2D image by an integer factor, averaging factor x factor blocks.
+
+    Works through the output in row chunks, so temporaries stay small even for
+    very large (or memory-mapped) inputs. Partial blocks at the edges are dropped.
+    """
+    out_height, out_width = image.shape[0] // factor, image.shape[1] // factor
+    out = np.empty((out_height, out_width), dtype=image.dtype)
+    integer = np.issubdtype(image.dtype, np.integer)
+    accumulator = np.int64 if integer else np.float64
+    for start in range(0, out_height, rows_per_chunk):
+        stop = min(start + rows_per_chunk, out_height)
+        block = image[start * factor:stop * factor, :out_width * factor]
+        total = np.zeros((stop - start, out_width), dtype=accumulator)
+        # Sum the factor x factor strided sub-grids instead of reducing over reshaped axes
+        for dy in range(factor):
+            for dx in range(factor):
+                total += block[dy::factor, dx::factor]
+        if integer:
+            out[start:stop] = (total + factor * factor // 2) // (factor * factor)
+        else:
+            out[start:stop] = total / (factor * factor)
+    return out
+
+
+class ImagePyramid:
+    """
+    Lazily built, cached 2x block-mean pyramid of a 2D image.
+
+    Level 0 is the image itself; level n is 2**n times smaller on each side.
+    Levels are only computed when first requested, each from the one above it.
+    Building may run in a background thread while other threads read the
+    levels already built (see built_level).
+    """
+
+    def __init__(self, image, min_size=256):
+        self.levels = [image]
+        self._lock = threading.Lock()
+        self.max_level = 0
+        size = min(image.shape)
+        while size // 2 >= min_size:
+            size //= 2
+            self.max_level += 1
+
+    def level(self, n):
+        """Return level n, first building it and any missing levels above it."""
+        if n < len(self.levels):
+            return self.levels[n]
+        with self._lock:
+            while len(self.levels) <= n:
+                previous = self.levels[-1]
+                self.levels.append(downsample_block_mean(previous, 2))
+                logging.info(f"Built pyramid level {len(self.levels) - 1}: {self.levels[-1].shape}")
+        return self.levels[n]
+
+    def built_level(self):
+        """Return the coarsest level built so far; every finer level is built too."""
+        return len(self.levels) - 1
+
+    def level_for_zoom(self, zoom):
+        """Return the coarsest level that still has at least zoom x level-0 resolution."""
+        if zoom >= 1.0:
+            return 0
+        return min(self.max_level, int(np.floor(np.log2(1.0 / zoom))))
+
+    def level_scale(self, n):
+        """Return (row_scale, col_scale) of level n relative to level 0."""
+        base, level = self.levels[0].shape, self.level(n).shape
+        return level[0] / base[0], level[1] / base[1]
+
+
+def to_uint8(image):
+    """Stretch an arbitrary numeric image to uint8 by its min/max."""
+    image_min, image_max = image.min(), image.max()
+    if image_max <= image_min:
+        logging.warning("Image has no range, likely constant value.")
+        return np.zeros(image.shape, dtype=np.uint8)
+    return ((image - image_min) / (image_max - image_min) * 255).astype(np.uint8)
@@ -0,0 +1,160 @@
+import re
+from collections import defaultdict
+
+# Header elements that can be searched, as indexed by dicom_index
+SEARCH_TAGS = [
+    'PatientName', 'PatientID', 'AccessionNumber', 'StudyDate', 'Modality',
+    'BodyPartExamined', 'ProtocolName', 'StudyDescription', 'SeriesDescription',
+    'StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID'
+]
+
+# Values matched whole (exactly) instead of being split into words
+WHOLE_VALUE_TAGS = {'StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID'}
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric words."""
+    return _WORD.findall(str(text).lower())
+
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """
+    Inverted index from header values to files, for search across a directory.
+
+    Values of SEARCH_TAGS are split into lowercase words; each word maps to
+    the files containing it, both for any tag and for its own tag. A trigram
+    index over the vocabulary finds words containing a fragment, so 'mprag'
+    matches 'T1_MPRAGE'. UIDs are matched whole. Files can be added again when
+    they change.
+    """
+
+    def __init__(self, tags=SEARCH_TAGS):
+        self.tags = list(tags)
+        self._tag_names = {tag.lower(): tag for tag in self.tags}
+        self.paths = []  # Document id -> path (None once removed)
+        self._ids = {}
+        self._doc_keys = {}  # Document id -> {(tag, word or whole value)}
+        self._postings = defaultdict(set)  # word -> document ids
+        self._tag_postings = defaultdict(set)  # (tag, word or whole value) -> document ids
+        self._trigrams = defaultdict(set)  # trigram -> words
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, record):
+        """Index (or re-index) one header record with a 'path' key."""
+        path = record['path']
+        if path in self._ids:
+            self.remove(path)
+        doc_id = len(self.paths)
+        self.paths.append(path)
+        self._ids[path] = doc_id
+
+        keys = set()
+        for tag in self.tags:
+            value = record.get(tag)
+            if value is None or value == '':
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                if tag in WHOLE_VALUE_TAGS:
+                    keys.add((tag, str(item).lower()))
+                else:
+                    keys.update((tag, word) for word in tokenize(item))
+        for key in keys:
+            self._tag_postings[key].add(doc_id)
+            tag, word = key
+            if tag in WHOLE_VALUE_TAGS:
+                continue
+            if word not in self._postings:
+                for trigram in _trigrams(word):
+                    self._trigrams[trigram].add(word)
+            self._postings[word].add(doc_id)
+        self._doc_keys[doc_id] = keys
+
+    def add_records(self, records):
+        for record in records:
+            self.add(record)
+
+    def remove(self, path):
+        doc_id = self._ids.pop(path, None)
+        if doc_id is None:
+            return
+        self.paths[doc_id] = None
+        for key in self._doc_keys.pop(doc_id):
+            tag_postings = self._tag_postings[key]
+            tag_postings.discard(doc_id)
+            if not tag_postings:
+                del self._tag_postings[key]
+            tag, word = key
+            postings = self._postings.get(word)
+            if tag in WHOLE_VALUE_TAGS or postings is None:
+                continue
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[word]
+                for trigram in _trigrams(word):
+                    self._trigrams[trigram].discard(word)
+
+    def _matching_words(self, fragment):
+        """Return the indexed words containing fragment."""
+        if len(fragment) < 3:
+            return [word for word in self._postings if fragment in word]
+        candidates = None
+        for trigram in _trigrams(fragment):
+            words = self._trigrams.get(trigram, set())
+            candidates = words if candidates is None else candidates & words
+            if not candidates:
+                return []
+        return [word for word in candidates if fragment in word]
+
+    def _term_ids(self, term):
+        """Document ids matching one query term ('fragment' or 'Tag:fragment')."""
+        tag = None
+        if ':' in term:
+            name, _, term = term.partition(':')
+            tag = self._tag_names.get(name.lower())
+            if tag is None:
+                return set()
+        if tag in WHOLE_VALUE_TAGS:
+            return set(self._tag_postings.get((tag, term.lower()), ()))
+        if tag is None:
+            # A pasted UID matches that UID only, not the numbers inside it
+            ids = set()
+            for whole_tag in WHOLE_VALUE_TAGS:
+                ids |= self._tag_postings.get((whole_tag, term.lower()), set())
+            if ids:
+                return ids
+
+        ids = None
+        for fragment in tokenize(term):
+            fragment_ids = set()
+            for word in self._matching_words(fragment):
+                fragment_ids |= self._tag_postings.get((tag, word), set()) if tag else self._postings[word]
+            ids = fragment_ids if ids is None else ids & fragment_ids
+            if not ids:
+                break
+        return ids or set()
+
+    def search(self, query):
+        """
+        Return the paths matching every term of query, in the order they were added.
+
+        Terms are whitespace-separated fragments matched anywhere inside a word
+        of any searchable tag (or a whole UID); 'Tag:fragment' limits a term to
+        one tag, e.g. 'ProtocolName:mprage AccessionNumber:1234'.
+        """
+        ids = None
+        for term in query.split():
+            term_ids = self._term_ids(term)
+            ids = term_ids if ids is None else ids & term_ids
+            if not ids:
+                return []
+        if ids is None:
+            return []
+        return [self.paths[doc_id] for doc_id in sorted(ids)]
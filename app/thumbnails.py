@@ -0,0 +1,183 @@
+import os
+import zlib
+import struct
+import logging
+import hashlib
+import threading
+
+import numpy as np
+
+import perf
+from dicom_index import default_cache_dir, touch_cache_file, prune_cache_dir
+from rendering import downsample_block_mean
+
+THUMBNAIL_SIZE = 128
+DEFAULT_WORKERS = max(2, min(8, os.cpu_count() or 1))
+# Part of every cache key; bump it whenever make_thumbnail's output changes
+THUMBNAIL_VERSION = 2
+DEFAULT_CACHE_BYTES = int(os.environ.get('DICOM_VIEWER_THUMBNAIL_CACHE_BYTES', 256 * 1024 ** 2))
+
+
+@perf.traced('thumbnail')
+def make_thumbnail(image, size=THUMBNAIL_SIZE):
+    """
+    Block-mean downsample an image so its longer side is at most size.
+
+    uint8 input is treated as display-ready and keeps its values; anything
+    else is stretched to uint8 by its own min/max.
+    """
+    image = np.asarray(image)
+    factor = max(1, -(-max(image.shape[:2]) // size))
+    if factor > 1:
+        if min(image.shape[:2]) < factor:
+            image = image[::factor, ::factor]  # Too thin for whole blocks
+        elif image.ndim == 3:
+            image = np.stack([downsample_block_mean(image[..., c], factor) for c in range(image.shape[2])], axis=-1)
+        else:
+            image = downsample_block_mean(image, factor)
+
+    if image.dtype == np.uint8:
+        return np.ascontiguousarray(image)
+
+    image = image.astype(np.float32)
+    image_min, image_max = image.min(), image.max()
+    if image_max <= image_min:
+        return np.zeros(image.shape, dtype=np.uint8)
+    return ((image - image_min) * (255.0 / (image_max - image_min))).astype(np.uint8)
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def write_png(path, image):
+    """Write an 8-bit grayscale (rows, cols) or RGB (rows, cols, 3) image as a PNG file."""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    color_type = 2 if image.ndim == 3 else 0
+    # Every scanline starts with filter type 0 (none)
+    scanlines = np.hstack([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, -1)])
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_png_chunk(b'IHDR', header))
+        f.write(_png_chunk(b'IDAT', zlib.compress(scanlines.tobytes(), 6)))
+        f.write(_png_chunk(b'IEND', b''))
+
+
+class ThumbnailCache:
+    """
+    Persistent thumbnail store keyed by source file (path, size, mtime), frame, variant and format version.
+
+    The store is kept within max_bytes by deleting the least recently used
+    thumbnails, down to nine tenths of the limit so pruning is not repeated
+    on every write.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory or default_cache_dir('thumbnails')
+        self.max_bytes = max_bytes
+        self._size = None  # Running total of the store, counted from disk on the first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(source_path, frame=0, variant='', size=THUMBNAIL_SIZE):
+        stat = os.stat(source_path)
+        text = (f"{THUMBNAIL_VERSION}|{os.path.abspath(source_path)}|{stat.st_size}|{stat.st_mtime_ns}|"
+                f"{frame}|{variant}|{size}")
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            thumbnail = np.load(path)
+        except (OSError, ValueError):
+            return None
+        touch_cache_file(path)
+        return thumbnail
+
+    def put(self, key, thumbnail):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, thumbnail)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None or self._size + os.path.getsize(path) > self.max_bytes:
+                self._size = prune_cache_dir(self.directory, self.max_bytes, '.npy',
+                                             target_bytes=self.max_bytes * 9 // 10)
+            else:
+                self._size += os.path.getsize(path)
+
+
+class ThumbnailPool:
+    """
+    Background thumbnail generation with a disk cache.
+
+    Requests are served newest first, so the items currently on screen are
+    produced before ones that were scrolled past. clear() drops every queued
+    request; results of requests made before it carry an older generation.
+    """
+
+    def __init__(self, callback, cache=None, max_workers=DEFAULT_WORKERS):
+        """
+        :param callback: Called from a worker thread as callback(token, generation, thumbnail).
+        """
+        self.callback = callback
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self.generation = 0
+        self._pending = {}  # token -> (source_path, frame, variant, loader)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True, name=f'thumbnails-{i}')
+            for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def request(self, token, source_path, frame, variant, loader):
+        """
+        Queue a thumbnail; loader() returns the full-size frame on a cache miss.
+        """
+        with self._condition:
+            self._pending.pop(token, None)
+            self._pending[token] = (source_path, frame, variant, loader)  # Re-insert as newest
+            self._condition.notify()
+
+    def clear(self):
+        with self._condition:
+            self._pending.clear()
+            self.generation += 1
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                token = next(reversed(self._pending))
+                source_path, frame, variant, loader = self._pending.pop(token)
+                generation = self.generation
+            try:
+                key = self.cache.key(source_path, frame, variant) if source_path else None
+                thumbnail = self.cache.get(key) if key else None
+                if thumbnail is None:
+                    thumbnail = make_thumbnail(loader())
+                    if key:
+                        self.cache.put(key, thumbnail)
+                self.callback(token, generation, thumbnail)
+            except Exception as e:
+                logging.warning(f"Failed to build thumbnail {token} of {source_path}: {e}")
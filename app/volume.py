@@ -0,0 +1,197 @@
+import os
+import logging
+import hashlib
+from collections import Counter
+
+import numpy as np
+import pydicom
+
+from dicom_index import default_cache_dir, touch_cache_file, prune_cache_dir
+
+DEFAULT_CACHE_BYTES = int(os.environ.get('DICOM_VIEWER_VOLUME_CACHE_BYTES', 4 * 1024 ** 3))
+
+
+def slice_position(record):
+    """Return the position of a slice along its normal, or None if unknown."""
+    position = record.get('ImagePositionPatient')
+    orientation = record.get('ImageOrientationPatient')
+    if not position or not orientation or len(position) != 3 or len(orientation) != 6:
+        return None
+    normal = np.cross(orientation[:3], orientation[3:])
+    return float(np.dot(normal, position))
+
+
+def sort_series_records(records):
+    """Sort the records of one series by slice position, falling back to InstanceNumber."""
+    positions = [slice_position(r) for r in records]
+    if all(p is not None for p in positions) and len(set(positions)) == len(positions):
+        order = np.argsort(positions, kind='stable')
+        return [records[i] for i in order]
+    return sorted(records, key=lambda r: (r.get('InstanceNumber') is None, r.get('InstanceNumber') or 0, r['path']))
+
+
+def group_series(records):
+    """Group header records by SeriesInstanceUID, each group sorted into slice order."""
+    series = {}
+    for record in records:
+        uid = record.get('SeriesInstanceUID')
+        if uid:
+            series.setdefault(uid, []).append(record)
+    return {uid: sort_series_records(group) for uid, group in series.items()}
+
+
+def volume_records(records):
+    """Keep only the single-frame slices sharing the series' most common in-plane size."""
+    single = [r for r in records if (r.get('NumberOfFrames') or 1) == 1 and r.get('Rows') and r.get('Columns')]
+    if not single:
+        return []
+    shape, _ = Counter((r['Rows'], r['Columns']) for r in single).most_common(1)[0]
+    return [r for r in single if (r['Rows'], r['Columns']) == shape]
+
+
+def series_spacing(records):
+    """Return (slice, row, column) spacing in mm for sorted series records."""
+    row_spacing, col_spacing = 1.0, 1.0
+    pixel_spacing = records[0].get('PixelSpacing')
+    if pixel_spacing and len(pixel_spacing) == 2:
+        row_spacing, col_spacing = float(pixel_spacing[0]), float(pixel_spacing[1])
+
+    positions = [slice_position(r) for r in records]
+    if len(records) > 1 and all(p is not None for p in positions):
+        slice_spacing = float(np.median(np.abs(np.diff(positions))))
+    else:
+        slice_spacing = float(records[0].get('SliceThickness') or 0)
+    return (slice_spacing or 1.0, row_spacing, col_spacing)
+
+
+class VolumeCache:
+    """
+    On-disk cache of stacked series volumes stored as .npy files.
+
+    Cached volumes are opened with ``mmap_mode='r'``, so reopening a series
+    only maps the file instead of decoding every slice again. Once the cache
+    holds more than max_bytes, the least recently used volumes are deleted.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory or default_cache_dir('volumes')
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(records):
+        """Build a cache key from the slice files, their sizes and modification times."""
+        digest = hashlib.sha1()
+        for record in records:
+            stat = os.stat(record['path'])
+            digest.update(f"{record['path']}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def load(self, key):
+        """Return the cached volume for key as a read-only memmap, or None."""
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            volume = np.load(path, mmap_mode='r')
+            touch_cache_file(path)
+            return volume
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable cached volume {path}: {e}")
+            os.remove(path)
+            return None
+
+    def get_or_build(self, records, should_stop=None):
+        """
+        Return the stacked volume for sorted series records, building it on a cache miss.
+
+        Slices are decoded one at a time and written straight into the cache file,
+        so building never holds more than one decoded slice besides the output.
+        A slice whose size differs from the first raises ValueError and nothing is cached.
+        """
+        key = self.key(records)
+        volume = self.load(key)
+        if volume is not None:
+            logging.info(f"Loaded cached series volume {volume.shape}")
+            return volume
+
+        first = pydicom.dcmread(records[0]['path']).pixel_array
+        shape = (len(records),) + first.shape
+        tmp_path = self.path_for(key) + '.tmp'
+        volume = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=first.dtype, shape=shape)
+        try:
+            volume[0] = first
+            for i, record in enumerate(records[1:], start=1):
+                if should_stop is not None and should_stop():
+                    raise InterruptedError("Volume build cancelled")
+                pixels = pydicom.dcmread(record['path']).pixel_array
+                if pixels.shape != first.shape:
+                    # volume_records already dropped slices indexed with another size, so the
+                    # index disagrees with the file; never cache a volume with a blank slice
+                    raise ValueError(f"Slice {record['path']} has shape {pixels.shape}, expected {first.shape}")
+                volume[i] = pixels
+            volume.flush()
+            del volume
+            os.replace(tmp_path, self.path_for(key))
+        except BaseException:
+            del volume
+            os.remove(tmp_path)
+            raise
+        logging.info(f"Built series volume {shape} from {len(records)} slices")
+        prune_cache_dir(self.directory, self.max_bytes, '.npy', keep={self.path_for(key)})
+        return self.load(key)
+
+
+def _first_value(value):
+    if isinstance(value, (list, tuple, pydicom.multival.MultiValue)):
+        return value[0] if len(value) else None
+    return value
+
+
+def display_window(image_data, dicom_data=None, chunk_slices=32):
+    """
+    Return the (low, high) stored-value range that maps to black and white.
+
+    Uses the dataset's first WindowCenter/WindowWidth (converted to stored
+    values through RescaleSlope/RescaleIntercept) when present, otherwise the
+    global min/max of the whole volume, computed chunk by chunk.
+    """
+    if dicom_data is not None:
+        center = _first_value(getattr(dicom_data, 'WindowCenter', None))
+        width = _first_value(getattr(dicom_data, 'WindowWidth', None))
+        if center is not None and width is not None and float(width) > 0:
+            slope = float(getattr(dicom_data, 'RescaleSlope', 1) or 1)
+            intercept = float(getattr(dicom_data, 'RescaleIntercept', 0) or 0)
+            center = (float(center) - intercept) / slope
+            width = float(width) / abs(slope)
+            return center - width / 2, center + width / 2
+
+    low, high = np.inf, -np.inf
+    for start in range(0, image_data.shape[0], chunk_slices):
+        chunk = image_data[start:start + chunk_slices]
+        low, high = min(low, float(chunk.min())), max(high, float(chunk.max()))
+    return low, high
+
+
+def build_display_volume(image_data, low, high, chunk_slices=16, should_stop=None, out=None):
+    """
+    Map a whole volume to a contiguous uint8 volume with one shared window.
+
+    Every slice uses the same (low, high) range, so brightness does not jump
+    between frames. Conversion runs chunk by chunk to bound float temporaries.
+
+    :param out: Optional uint8 array of the same shape to write into (e.g. a memmap).
+    """
+    display_data = np.empty(image_data.shape, dtype=np.uint8) if out is None else out
+    scale = 255.0 / (high - low) if high > low else 0.0
+    for start in range(0, image_data.shape[0], chunk_slices):
+        if should_stop is not None and should_stop():
+            raise InterruptedError("Display volume build cancelled")
+        chunk = image_data[start:start + chunk_slices].astype(np.float32)
+        chunk -= low
+        chunk *= scale
+        np.clip(chunk, 0, 255, out=chunk)
+        display_data[start:start + chunk_slices] = chunk
+    return display_data
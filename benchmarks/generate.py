@@ -0,0 +1,241 @@
+import os
+import sys
+import zlib
+import json
+import logging
+import argparse
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.pixels import get_encoder
+from pydicom.uid import (
+    ExplicitVRLittleEndian, RLELossless, JPEGLSLossless, JPEG2000Lossless, PYDICOM_IMPLEMENTATION_UID,
+    CTImageStorage, MultiFrameGrayscaleByteSecondaryCaptureImageStorage, DigitalXRayImageStorageForPresentation,
+    generate_uid
+)
+
+# Dataset sizes per scale; 'small' runs in a minute or two, 'full' matches our large studies
+SCALES = {
+    'small': {
+        'ct_slices': 64, 'ct_size': 256,
+        'cine_frames': 300, 'cine_size': 256,
+        'radiographs': 4, 'radiograph_size': 2048,
+        'compressed_slices': 16,
+        'tree_files': 10000, 'tree_size': 16,
+    },
+    'full': {
+        'ct_slices': 512, 'ct_size': 512,
+        'cine_frames': 2000, 'cine_size': 512,
+        'radiographs': 16, 'radiograph_size': 3000,
+        'compressed_slices': 64,
+        'tree_files': 20000, 'tree_size': 32,
+    },
+}
+
+# Compressed variants are written for every transfer syntax pydicom can encode here
+COMPRESSED_SYNTAXES = {'rle': RLELossless, 'jpegls': JPEGLSLossless, 'j2k': JPEG2000Lossless}
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def make_uid(seed, *parts):
+    """Return a UID derived only from seed and parts, so regenerated data is identical."""
+    return generate_uid(entropy_srcs=[str(seed)] + [str(part) for part in parts])
+
+
+def dataset_rng(seed, name):
+    """Return a random generator for one dataset, independent of which other datasets are written."""
+    return np.random.default_rng([seed, zlib.crc32(name.encode())])
+
+
+def base_dataset(sop_class, seed, *parts, modality='OT'):
+    """Return a dataset with the patient, study and instance elements our workloads touch."""
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.MediaStorageSOPClassUID = sop_class
+    ds.file_meta.MediaStorageSOPInstanceUID = make_uid(seed, 'sop', *parts)
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.file_meta.ImplementationClassUID = PYDICOM_IMPLEMENTATION_UID
+    ds.SOPClassUID = sop_class
+    ds.SOPInstanceUID = ds.file_meta.MediaStorageSOPInstanceUID
+    ds.PatientName = f"Bench^{parts[0]}"
+    ds.PatientID = f"BENCH{seed:04d}"
+    ds.PatientBirthDate = '19700101'
+    ds.PatientAddress = 'Synthetic Street 1'
+    ds.ReferringPhysicianName = 'Synthetic^Physician'
+    ds.InstitutionName = 'Synthetic Institution'
+    ds.AccessionNumber = f"A{seed:06d}"
+    ds.StudyDate = ds.SeriesDate = ds.ContentDate = '20240101'
+    ds.StudyInstanceUID = make_uid(seed, 'study')
+    ds.SeriesInstanceUID = make_uid(seed, 'series', parts[0])
+    ds.StudyDescription = 'Synthetic benchmark study'
+    ds.SeriesDescription = str(parts[0])
+    ds.Modality = modality
+    return ds
+
+
+def set_pixels(ds, pixels, signed=False, photometric='MONOCHROME2'):
+    """Attach a (frames,) rows x columns [x samples] array as native pixel data."""
+    ds.Rows, ds.Columns = pixels.shape[-3:-1] if photometric == 'RGB' else pixels.shape[-2:]
+    ds.SamplesPerPixel = 3 if photometric == 'RGB' else 1
+    ds.PhotometricInterpretation = photometric
+    if photometric == 'RGB':
+        ds.PlanarConfiguration = 0
+    ds.BitsAllocated = pixels.dtype.itemsize * 8
+    ds.BitsStored = ds.BitsAllocated
+    ds.HighBit = ds.BitsStored - 1
+    ds.PixelRepresentation = 1 if signed else 0
+    ds.PixelData = pixels.tobytes()
+
+
+def ct_phantom(rng, size, position, slices):
+    """Return one int16 CT slice: an elliptical body with two organs, air outside, plus noise."""
+    y, x = np.ogrid[-1:1:size * 1j, -1:1:size * 1j]
+    z = position / max(1, slices - 1) * 2 - 1
+    image = np.full((size, size), -1000, dtype=np.float32)
+    image[(x / 0.8) ** 2 + (y / 0.6) ** 2 <= 1 - 0.3 * z ** 2] = 40
+    image[((x + 0.3) / 0.2) ** 2 + (y / 0.3) ** 2 <= 1 - z ** 2] = -800  # Lung
+    image[((x - 0.35) / 0.15) ** 2 + ((y + 0.1) / 0.15) ** 2 <= 1] = 700  # Bone
+    image += rng.normal(0, 15, image.shape).astype(np.float32)
+    return (image + 1024).clip(0, 4095).astype(np.int16)  # Stored values; RescaleIntercept -1024
+
+
+def write_ct_series(directory, seed, slices, size, name='ct', transfer_syntax=None):
+    """Write a single-slice-per-file CT series; returns the written paths."""
+    rng = dataset_rng(seed, name)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(slices):
+        ds = base_dataset(CTImageStorage, seed, name, i, modality='CT')
+        ds.InstanceNumber = i + 1
+        ds.ImagePositionPatient = [0.0, 0.0, float(i) * 1.25]
+        ds.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        ds.PixelSpacing = [0.7, 0.7]
+        ds.SliceThickness = 1.25
+        ds.RescaleIntercept, ds.RescaleSlope = -1024, 1
+        ds.WindowCenter, ds.WindowWidth = 40, 400
+        set_pixels(ds, ct_phantom(rng, size, i, slices), signed=True)
+        ds.BitsStored, ds.HighBit = 16, 15
+        if transfer_syntax is not None:
+            ds.compress(transfer_syntax, generate_instance_uid=False)
+        path = os.path.join(directory, f"{name}_{i:04d}.dcm")
+        ds.save_as(path, enforce_file_format=True)
+        paths.append(path)
+    return paths
+
+
+def write_cine(path, seed, frames, size, name='cine', transfer_syntax=None):
+    """Write a uint8 multi-frame cine loop of a blob moving over a noisy background."""
+    rng = dataset_rng(seed, name)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32)
+    pixels = np.empty((frames, size, size), dtype=np.uint8)
+    for i in range(frames):
+        angle = 2 * np.pi * i / 60
+        cy, cx = size / 2 + size / 4 * np.sin(angle), size / 2 + size / 4 * np.cos(angle)
+        frame = 200 * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * (size / 10) ** 2))
+        pixels[i] = (frame + rng.integers(0, 30, frame.shape)).clip(0, 255)
+
+    ds = base_dataset(MultiFrameGrayscaleByteSecondaryCaptureImageStorage, seed, name, modality='US')
+    ds.NumberOfFrames = frames
+    ds.FrameTime = 33.3
+    ds.CineRate = 30
+    set_pixels(ds, pixels)
+    if transfer_syntax is not None:
+        ds.compress(transfer_syntax, generate_instance_uid=False)
+    ds.save_as(path, enforce_file_format=True)
+    return path
+
+
+def write_radiographs(directory, seed, count, size):
+    """Write 16-bit (12 bits used) radiographs with a smooth anatomy-like gradient."""
+    rng = dataset_rng(seed, 'radiograph')
+    os.makedirs(directory, exist_ok=True)
+    y, x = np.ogrid[-1:1:size * 1j, -1:1:size * 1j]
+    body = 3000 * np.exp(-(x ** 2 / 0.3 + y ** 2 / 0.8))
+    paths = []
+    for i in range(count):
+        ds = base_dataset(DigitalXRayImageStorageForPresentation, seed, 'radiograph', i, modality='DX')
+        ds.InstanceNumber = i + 1
+        ds.PixelSpacing = [0.14, 0.14]
+        pixels = (body + rng.normal(0, 40, (size, size))).clip(0, 4095).astype(np.uint16)
+        set_pixels(ds, pixels)
+        ds.BitsStored, ds.HighBit = 12, 11
+        path = os.path.join(directory, f"radiograph_{i:03d}.dcm")
+        ds.save_as(path, enforce_file_format=True)
+        paths.append(path)
+    return paths
+
+
+def write_tree(directory, seed, count, size, files_per_directory=100):
+    """Write count small files spread over patient/study/series subdirectories."""
+    rng = dataset_rng(seed, 'tree')
+    for i in range(count):
+        patient, series = divmod(i // files_per_directory, 10)
+        subdirectory = os.path.join(directory, f"patient_{patient:03d}", f"series_{series:02d}")
+        os.makedirs(subdirectory, exist_ok=True)
+        ds = base_dataset(CTImageStorage, seed, f"tree{patient}_{series}", i, modality='CT')
+        ds.PatientID = f"TREE{patient:04d}"
+        ds.InstanceNumber = i % files_per_directory + 1
+        ds.ImagePositionPatient = [0.0, 0.0, float(ds.InstanceNumber)]
+        set_pixels(ds, rng.integers(0, 4096, (size, size), dtype=np.uint16))
+        ds.save_as(os.path.join(subdirectory, f"{i:06d}.dcm"), enforce_file_format=True)
+
+
+def encodable_syntaxes():
+    """Return {name: transfer syntax} for the compressed variants pydicom can write in this environment."""
+    return {name: uid for name, uid in COMPRESSED_SYNTAXES.items() if get_encoder(uid).is_available}
+
+
+def generate(output_dir, scale='small', seed=0):
+    """
+    Write every synthetic dataset under output_dir and a manifest describing them.
+
+    The same scale and seed always produce the same pixel values and UIDs.
+    """
+    sizes = SCALES[scale]
+    os.makedirs(output_dir, exist_ok=True)
+
+    logging.info(f"Writing CT series ({sizes['ct_slices']} slices)")
+    write_ct_series(os.path.join(output_dir, 'ct'), seed, sizes['ct_slices'], sizes['ct_size'])
+    logging.info(f"Writing cine ({sizes['cine_frames']} frames)")
+    write_cine(os.path.join(output_dir, 'cine.dcm'), seed, sizes['cine_frames'], sizes['cine_size'])
+    logging.info(f"Writing radiographs ({sizes['radiographs']})")
+    write_radiographs(os.path.join(output_dir, 'radiographs'), seed, sizes['radiographs'],
+                      sizes['radiograph_size'])
+
+    compressed = encodable_syntaxes()
+    for name, transfer_syntax in compressed.items():
+        logging.info(f"Writing {name} compressed variants")
+        write_ct_series(os.path.join(output_dir, f"ct_{name}"), seed, sizes['compressed_slices'],
+                        sizes['ct_size'], name=f"ct_{name}", transfer_syntax=transfer_syntax)
+        write_cine(os.path.join(output_dir, f"cine_{name}.dcm"), seed, sizes['compressed_slices'],
+                   sizes['cine_size'], name=f"cine_{name}", transfer_syntax=transfer_syntax)
+
+    logging.info(f"Writing directory tree ({sizes['tree_files']} files)")
+    write_tree(os.path.join(output_dir, 'tree'), seed, sizes['tree_files'], sizes['tree_size'])
+
+    manifest = {'scale': scale, 'seed': seed, 'sizes': sizes, 'compressed': sorted(compressed),
+                'pydicom': pydicom.__version__, 'numpy': np.__version__}
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate synthetic DICOM datasets for the benchmarks.")
+    parser.add_argument('output', help="Directory to write the datasets to")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = build_parser().parse_args(argv)
+    generate(args.output, args.scale, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
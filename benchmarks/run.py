@@ -0,0 +1,452 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import importlib.util
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, 'app')
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pydicom
+
+import generate
+
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10
+
+# name -> (unit, function(data, repeat) returning (items, run times in seconds, bytes processed or None))
+BENCHMARKS = {}
+# name -> compressed variant (generate.COMPRESSED_SYNTAXES) the benchmark reads
+COMPRESSED_BENCHMARKS = {}
+
+
+def benchmark(name, unit):
+    def register(func):
+        BENCHMARKS[name] = (unit, func)
+        return func
+    return register
+
+
+def measure(run, repeat, setup=None, warmup=1):
+    """Time run() repeat times after warmup untimed runs, calling setup() (untimed) before each run."""
+    times = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        if i >= warmup:
+            times.append(time.perf_counter() - start)
+    return times
+
+
+class BenchData:
+    """Paths of a generated data directory, plus a scratch directory and the offscreen viewer."""
+
+    def __init__(self, data_dir, scratch_dir, workers):
+        self.data_dir = data_dir
+        self.scratch_dir = scratch_dir
+        self.workers = workers
+        with open(os.path.join(data_dir, generate.MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        self.ct = sorted(glob.glob(os.path.join(data_dir, 'ct', '*.dcm')))
+        self.cine = os.path.join(data_dir, 'cine.dcm')
+        self.radiographs = sorted(glob.glob(os.path.join(data_dir, 'radiographs', '*.dcm')))
+        self.tree = os.path.join(data_dir, 'tree')
+        self._viewer = None
+
+    def compressed(self, name):
+        return (sorted(glob.glob(os.path.join(self.data_dir, f"ct_{name}", '*.dcm'))),
+                os.path.join(self.data_dir, f"cine_{name}.dcm"))
+
+    def scratch(self, name):
+        """Return an empty scratch directory for one benchmark run."""
+        path = os.path.join(self.scratch_dir, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        return path
+
+    @property
+    def viewer(self):
+        """The main window on Qt's offscreen platform, created on first use."""
+        if self._viewer is None:
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            spec = importlib.util.spec_from_file_location('dicom_viewer', os.path.join(APP_DIR, 'Dicom Viewer.py'))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            from PyQt6.QtWidgets import QApplication
+            self.app = QApplication.instance() or QApplication([])
+            self.viewer_module = module
+            self._viewer = module.DICOMMetadataViewer()
+            self._viewer.resize(1300, 900)
+            # Show the Images tab, so rendering benchmarks reach paintEvent and the thumbnail strip
+            self._viewer.tab_widget.setCurrentWidget(self._viewer.image_tab)
+            self._viewer.show()
+            self.app.processEvents()
+        return self._viewer
+
+    def close(self):
+        if self._viewer is not None:
+            self._viewer.close()
+
+
+def file_bytes(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+@benchmark('scan.cold', 'files')
+def bench_scan_cold(data, repeat):
+    import dicom_index
+    state = {}
+
+    def setup():
+        state['catalog'] = dicom_index.DicomCatalog(os.path.join(data.scratch('catalog'), 'catalog.sqlite'))
+
+    def run():
+        state['count'] = sum(len(batch) for batch in state['catalog'].scan(data.tree))
+
+    times = measure(run, repeat, setup)
+    return state['count'], times, None
+
+
+@benchmark('scan.warm', 'files')
+def bench_scan_warm(data, repeat):
+    import dicom_index
+    catalog = dicom_index.DicomCatalog(os.path.join(data.scratch('catalog'), 'catalog.sqlite'))
+    count = sum(len(batch) for batch in catalog.scan(data.tree))
+    times = measure(lambda: sum(len(batch) for batch in catalog.scan(data.tree)), repeat)
+    return count, times, None
+
+
+@benchmark('load.ct_series', 'files')
+def bench_load_ct(data, repeat):
+    import dataset_cache
+    times = measure(lambda: [dataset_cache.load_dataset(path) for path in data.ct], repeat)
+    return len(data.ct), times, file_bytes(data.ct)
+
+
+@benchmark('load.radiographs', 'files')
+def bench_load_radiographs(data, repeat):
+    import dataset_cache
+    times = measure(lambda: [dataset_cache.load_dataset(path) for path in data.radiographs], repeat)
+    return len(data.radiographs), times, file_bytes(data.radiographs)
+
+
+def first_frame(path):
+    """Load path through the viewer's dataset loader and return its first frame, as the viewer does."""
+    import dataset_cache
+    import frames
+    dicom_data = dataset_cache.load_dataset(path)
+    mapped_pixels = getattr(dicom_data, 'mapped_pixels', None)
+    return mapped_pixels[0] if mapped_pixels is not None else frames.FrameAccessor(dicom_data)[0]
+
+
+@benchmark('load.cine_first_frame', 'files')
+def bench_load_cine_first_frame(data, repeat):
+    times = measure(lambda: first_frame(data.cine), repeat)
+    return 1, times, None
+
+
+def bench_compressed_first_frame(name):
+    def bench(data, repeat):
+        _, cine_path = data.compressed(name)
+        times = measure(lambda: first_frame(cine_path), repeat)
+        return 1, times, None
+    return bench
+
+
+@benchmark('load.cine_all_frames', 'frames')
+def bench_load_cine(data, repeat):
+    count = data.manifest['sizes']['cine_frames']
+    times = measure(lambda: pydicom.dcmread(data.cine).pixel_array, repeat)
+    return count, times, os.path.getsize(data.cine)
+
+
+def bench_decode_compressed(name):
+    def bench(data, repeat):
+        ct_paths, cine_path = data.compressed(name)
+        count = len(ct_paths) + data.manifest['sizes']['compressed_slices']
+
+        def run():
+            for path in ct_paths:
+                pydicom.dcmread(path).pixel_array
+            pydicom.dcmread(cine_path).pixel_array
+
+        times = measure(run, repeat)
+        return count, times, file_bytes(ct_paths + [cine_path])
+    return bench
+
+
+@benchmark('normalize.ct_slices', 'images')
+def bench_normalize_ct(data, repeat):
+    normalize = data.viewer.normalize_image
+    images = [pydicom.dcmread(path).pixel_array for path in data.ct]
+    times = measure(lambda: [normalize(image) for image in images], repeat)
+    return len(images), times, sum(image.nbytes for image in images)
+
+
+@benchmark('normalize.radiographs', 'images')
+def bench_normalize_radiographs(data, repeat):
+    normalize = data.viewer.normalize_image
+    images = [pydicom.dcmread(path).pixel_array for path in data.radiographs]
+    times = measure(lambda: [normalize(image) for image in images], repeat)
+    return len(images), times, sum(image.nbytes for image in images)
+
+
+@benchmark('normalize.cine_display_volume', 'frames')
+def bench_display_volume(data, repeat):
+    import volume
+    pixels = pydicom.dcmread(data.cine).pixel_array
+    low, high = volume.display_window(pixels)
+    times = measure(lambda: volume.build_display_volume(pixels, low, high), repeat)
+    return pixels.shape[0], times, pixels.nbytes
+
+
+@benchmark('render.radiographs', 'images')
+def bench_render_radiographs(data, repeat):
+    viewer = data.viewer
+    images = [pydicom.dcmread(path).pixel_array for path in data.radiographs]
+
+    def run():
+        for image in images:
+            viewer.display_single_image(image)
+            data.app.processEvents()
+
+    times = measure(run, repeat)
+    return len(images), times, None
+
+
+@benchmark('render.ct_slices', 'images')
+def bench_render_ct_slices(data, repeat):
+    viewer = data.viewer
+    stack = np.stack([pydicom.dcmread(path).pixel_array for path in data.ct])
+    viewer.display_m2d_images(stack)
+    data.app.processEvents()
+
+    def run():
+        for index in range(stack.shape[0]):
+            viewer.show_slice(index)
+            data.app.processEvents()
+
+    times = measure(run, repeat)
+    return stack.shape[0], times, None
+
+
+@benchmark('render.update_tiles', 'tiles')
+def bench_update_tiles(data, repeat, timeout=60.0):
+    """Time from pointing the strip at every cine frame until each visible thumbnail has been drawn."""
+    viewer = data.viewer
+    viewer.current_dicom_data = pydicom.dcmread(data.cine)
+    viewer.current_image_data = viewer.current_dicom_data.pixel_array
+    strip = viewer.thumbnail_strip
+    model = strip.thumbnail_model
+    state = {}
+
+    def setup():
+        shutil.rmtree(model.pool.cache.directory, ignore_errors=True)  # Generate, don't reload, thumbnails
+
+    def run():
+        viewer.update_tiles()
+        data.app.processEvents()
+        viewport = strip.viewport().rect()
+        visible = [row for row in range(model.rowCount())
+                   if strip.visualRect(model.index(row)).intersects(viewport)]
+        deadline = time.perf_counter() + timeout
+        while not all(row in model.pixmaps for row in visible):
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"Thumbnails not delivered within {timeout:.0f} s")
+            data.app.processEvents()
+            time.sleep(0.001)
+        state['visible'] = len(visible)
+
+    times = measure(run, repeat, setup)
+    return state['visible'], times, None
+
+
+def bench_anonymize(paths_for):
+    def bench(data, repeat):
+        import anonymize
+        paths = paths_for(data)
+        state = {}
+
+        def setup():
+            state['output'] = data.scratch('anonymized')
+
+        def run():
+            for result in anonymize.anonymize_files(paths, state['output'], 'BENCH', max_workers=data.workers):
+                if result['status'] == 'error':
+                    raise RuntimeError(f"Anonymizing {result['path']} failed: {result['error']}")
+
+        times = measure(run, repeat, setup)
+        return len(paths), times, file_bytes(paths)
+    return bench
+
+
+for syntax_name in generate.COMPRESSED_SYNTAXES:
+    BENCHMARKS[f"load.decode_{syntax_name}"] = ('frames', bench_decode_compressed(syntax_name))
+    BENCHMARKS[f"load.cine_first_frame_{syntax_name}"] = ('files', bench_compressed_first_frame(syntax_name))
+    COMPRESSED_BENCHMARKS[f"load.decode_{syntax_name}"] = syntax_name
+    COMPRESSED_BENCHMARKS[f"load.cine_first_frame_{syntax_name}"] = syntax_name
+BENCHMARKS['anonymize.ct_series'] = ('files', bench_anonymize(lambda data: data.ct))
+BENCHMARKS['anonymize.tree'] = ('files', bench_anonymize(
+    lambda data: sorted(glob.glob(os.path.join(data.tree, '**', '*.dcm'), recursive=True))))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    try:
+        from PyQt6.QtCore import PYQT_VERSION_STR
+    except ImportError:
+        PYQT_VERSION_STR = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pydicom': pydicom.__version__,
+        'pyqt6': PYQT_VERSION_STR,
+    }
+
+
+def run_benchmarks(data_dir, names, repeat=DEFAULT_REPEAT, workers=None):
+    """Run the named benchmarks against a generated data directory and return the results document."""
+    scratch_dir = tempfile.mkdtemp(prefix='dicom-bench-')
+    # Keep the viewer's catalog, thumbnail and volume caches out of the user's cache
+    os.environ['DICOM_VIEWER_CACHE_DIR'] = os.path.join(scratch_dir, 'cache')
+    data = BenchData(data_dir, scratch_dir, workers or max(1, os.cpu_count() or 1))
+    results = {}
+    try:
+        for name in names:
+            unit, func = BENCHMARKS[name]
+            logging.info(f"Running {name}")
+            items, times, nbytes = func(data, repeat)
+            median = statistics.median(times)
+            results[name] = {
+                'unit': unit,
+                'items': items,
+                'runs': times,
+                'median_seconds': median,
+                'min_seconds': min(times),
+                'items_per_second': items / median if median > 0 else None,
+            }
+            if nbytes:
+                results[name]['mb_per_second'] = nbytes / 1024 ** 2 / median if median > 0 else None
+            logging.info(f"{name}: {median * 1000:.1f} ms median, {results[name]['items_per_second']:.1f} {unit}/s")
+    finally:
+        data.close()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'environment': environment(),
+        'dataset': {key: data.manifest[key] for key in ('scale', 'seed', 'sizes', 'compressed')},
+        'repeat': repeat,
+        'workers': data.workers,
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Return (lines, regressions) comparing the median times of two results documents.
+
+    A benchmark regresses when its median is more than threshold (a fraction) slower.
+    """
+    lines, regressions = [], []
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            lines.append(f"{name:32} {result['median_seconds'] * 1000:10.1f} ms  (new)")
+            continue
+        ratio = result['median_seconds'] / old['median_seconds'] if old['median_seconds'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        lines.append(f"{name:32} {old['median_seconds'] * 1000:10.1f} ms -> "
+                     f"{result['median_seconds'] * 1000:10.1f} ms  x{ratio:.2f}{flag}")
+    if baseline.get('dataset') != current.get('dataset'):
+        lines.append("Warning: the two runs used different datasets")
+    return lines, regressions
+
+
+def select(patterns):
+    """Return the benchmark names starting with any of the comma-separated prefixes (all if none)."""
+    if not patterns:
+        return list(BENCHMARKS)
+    prefixes = [prefix.strip() for prefix in patterns.split(',') if prefix.strip()]
+    return [name for name in BENCHMARKS if any(name.startswith(prefix) for prefix in prefixes)]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time the viewer's workloads on synthetic data and save JSON results.")
+    parser.add_argument('data', help="Directory written by benchmarks/generate.py (generated if missing)")
+    parser.add_argument('-o', '--output', default='benchmark-results.json', help="Results JSON file")
+    parser.add_argument('--only', help="Comma-separated benchmark name prefixes, e.g. scan,load.ct")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--workers', type=int, help="Process pool size for anonymization")
+    parser.add_argument('--scale', choices=sorted(generate.SCALES), default='small',
+                        help="Scale used when the data directory has to be generated")
+    parser.add_argument('--compare', metavar='BASELINE', help="Results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown fraction reported as a regression (default 0.10)")
+    parser.add_argument('--list', action='store_true', help="List the benchmarks and exit")
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.list:
+        for name, (unit, _) in BENCHMARKS.items():
+            print(f"{name:32} {unit}")
+        return 0
+
+    if not os.path.exists(os.path.join(args.data, generate.MANIFEST_NAME)):
+        generate.generate(args.data, args.scale)
+    with open(os.path.join(args.data, generate.MANIFEST_NAME)) as f:
+        compressed = json.load(f)['compressed']
+    # Compressed variants only exist for the syntaxes pydicom could encode when the data was generated
+    names = [name for name in select(args.only)
+             if name not in COMPRESSED_BENCHMARKS or COMPRESSED_BENCHMARKS[name] in compressed]
+    document = run_benchmarks(args.data, names, args.repeat, args.workers)
+    logging.getLogger().setLevel(args.log_level)  # The viewer module configures logging on import
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    logging.info(f"Wrote {len(document['results'])} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(baseline, document, args.threshold)
+        print("\n".join(lines))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'app'))
+
+import anonymize  # noqa: E402
+
+
+def write_dicom(path, patient_name):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_meta = FileMetaDataset()
+    file_meta.MediaStorageSOPClassUID = pydicom.uid.SecondaryCaptureImageStorage
+    file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = file_meta
+    ds.SOPClassUID = file_meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+    ds.PatientName = patient_name
+    ds.PatientID = patient_name
+    ds.Rows = ds.Columns = 4
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = 'MONOCHROME2'
+    ds.BitsAllocated = ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.PixelData = np.arange(16, dtype=np.uint16).tobytes()
+    ds.save_as(path, enforce_file_format=True)
+
+
+def test_same_named_files_in_different_folders_get_separate_outputs(tmp_path):
+    source = tmp_path / 'source'
+    first = str(source / 's1' / 'IM0001.dcm')
+    second = str(source / 's2' / 'IM0001.dcm')
+    write_dicom(first, 'First^Patient')
+    write_dicom(second, 'Second^Patient')
+    output_dir = str(tmp_path / 'anon')
+
+    results = list(anonymize.anonymize_files([first, second], output_dir, 'TEST', max_workers=1,
+                                             root=str(source)))
+
+    assert sorted(result['status'] for result in results) == ['done', 'done']
+    outputs = {result['path']: result['output'] for result in results}
+    assert outputs[first] == os.path.join(output_dir, 's1', 'ANON_IM0001.dcm')
+    assert outputs[second] == os.path.join(output_dir, 's2', 'ANON_IM0001.dcm')
+    for path in outputs.values():
+        assert str(pydicom.dcmread(path).PatientName).startswith('TEST_Patient_')
+
+    # Resuming skips both files instead of mistaking one output for the other's
+    results = list(anonymize.anonymize_files([first, second], output_dir, 'TEST', max_workers=1))
+    assert sorted(result['status'] for result in results) == ['skipped', 'skipped']